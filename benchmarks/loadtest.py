@@ -0,0 +1,451 @@
+"""Offline load test for the HTTP API: throughput and latency percentiles per route.
+
+Boots the app with uvicorn on a local port, against a synthetic catalog
+served by a local stand-in for CelesTrak (``gp.php`` and the legacy
+``<group>.txt``) and for NASA DONKI, then replays a weighted mix of
+requests at a fixed concurrency. Nothing leaves the machine.
+
+Usage (from the repository root)::
+
+    python benchmarks/loadtest.py                               # 1 worker, concurrency 8, 30 s
+    python benchmarks/loadtest.py --sweep 1,4,16,32 --duration 20 --slo-p99-ms 500
+    python benchmarks/loadtest.py --workers 4 --catalog 5000
+    python benchmarks/loadtest.py --mix propagate=5,objects=2,detect=1
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000    # an already running server
+
+The JSON report (``benchmarks/results/loadtest.json`` by default) has, for
+every concurrency level, the overall and per-route request count, error
+rate, throughput and p50/p95/p99 latency. With ``--sweep`` it also reports
+the capacity: the highest throughput whose overall p99 stays under
+``--slo-p99-ms`` with at most ``--max-error-rate`` errors, and that figure
+divided by the number of workers.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+SERVER_DIR = os.path.join(REPO_DIR, "server")
+sys.path.insert(0, BENCH_DIR)
+
+import synthetic  # noqa: E402
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Ponderile implicite: trafic dominat de vizualizare (propagare, listă), analizele mai rare
+DEFAULT_MIX = {
+    "propagate": 30,
+    "objects": 15,
+    "risk_ordem": 15,
+    "debris_nasa": 10,
+    "debris_real": 10,
+    "debris_simulate": 10,
+    "detect": 5,
+    "spaceweather": 5,
+}
+
+
+# ---------------------------------------------------------------------------
+# Surse externe simulate (CelesTrak, DONKI)
+# ---------------------------------------------------------------------------
+
+def _donki_events(count: int = 5) -> List[Dict]:
+    now = time.gmtime()
+    day = time.strftime("%Y-%m-%d", now)
+    return [
+        {
+            "gstID": f"{day}T{3 * i:02d}:00:00-GST-001",
+            "startTime": f"{day}T{3 * i:02d}:00Z",
+            "allKpIndex": [{"observedTime": f"{day}T{3 * i:02d}:00Z", "kpIndex": 5.0 + i % 3, "source": "NOAA"}],
+            "link": "",
+        }
+        for i in range(count)
+    ]
+
+
+class StubUpstream:
+    """CelesTrak + DONKI stand-in on ``127.0.0.1``, served from a background thread."""
+
+    def __init__(self, tle_text: str):
+        tle_body = tle_text.encode("utf-8")
+        donki_body = json.dumps(_donki_events()).encode("utf-8")
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):  # noqa: N802 (numele cerut de http.server)
+                path = urlparse(self.path).path
+                if path == "/NORAD/elements/gp.php" or (path.startswith("/NORAD/elements/") and path.endswith(".txt")):
+                    body, ctype = tle_body, "text/plain"
+                elif path == "/DONKI/GST":
+                    body, ctype = donki_body, "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "StubUpstream":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# ---------------------------------------------------------------------------
+# Pornirea aplicației
+# ---------------------------------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LocalServer:
+    """``uvicorn main:app`` in a subprocess, wired to the stub upstream and a throwaway data dir."""
+
+    def __init__(self, upstream_url: str, workers: int = 1, port: Optional[int] = None):
+        self.workers = workers
+        self.port = port or _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._tmp = tempfile.mkdtemp(prefix="nasa-loadtest-")
+        self._upstream_url = upstream_url
+        self._proc: Optional[subprocess.Popen] = None
+        self._log = None
+        self._shared_prefix: Optional[str] = None
+
+    def __enter__(self) -> "LocalServer":
+        env = dict(os.environ)
+        env.update({
+            "CELESTRAK_BASE_URL": self._upstream_url,
+            "DONKI_GST_URL": f"{self._upstream_url}/DONKI/GST",
+            "ORDEM_FLUX_FILE": synthetic.write_synthetic_flux_table(os.path.join(self._tmp, "flux.csv")),
+            "TLE_HISTORY_DIR": os.path.join(self._tmp, "tle_history"),
+            "JOBS_DIR": os.path.join(self._tmp, "jobs"),
+            "WATCHLIST_FILE": os.path.join(self._tmp, "watchlist.json"),
+        })
+        if self.workers > 1:
+            # Un singur /api/tle/load trebuie să fie vizibil în toți worker-ii
+            self._shared_prefix = f"loadtest-{os.getpid()}"
+            env["TLE_SHARED_MEMORY"] = self._shared_prefix
+        self._log = open(os.path.join(self._tmp, "server.log"), "wb")
+        self._proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", SERVER_DIR,
+             "--host", "127.0.0.1", "--port", str(self.port), "--workers", str(self.workers),
+             "--log-level", "warning", "--no-access-log"],
+            cwd=REPO_DIR, env=env, stdout=self._log, stderr=subprocess.STDOUT,
+        )
+        return self
+
+    def wait_ready(self, timeout_s: float = 60.0) -> None:
+        import httpx
+
+        deadline = time.monotonic() + timeout_s
+        while time.monotonic() < deadline:
+            if self._proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {self._proc.returncode}:\n{self.log_tail()}")
+            try:
+                if httpx.get(f"{self.url}/api/health", timeout=1.0).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"Server did not become ready within {timeout_s:.0f} s:\n{self.log_tail()}")
+
+    def log_tail(self, lines: int = 20) -> str:
+        self._log.flush()
+        with open(self._log.name, "rb") as f:
+            return b"\n".join(f.read().splitlines()[-lines:]).decode("utf-8", errors="replace")
+
+    def __exit__(self, *exc) -> None:
+        if self._proc is not None and self._proc.poll() is None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+                self._proc.wait()
+        if self._shared_prefix is not None:
+            # Segmentele partajate supraviețuiesc worker-ilor opriți (POSIX): le ștergem aici
+            if SERVER_DIR not in sys.path:
+                sys.path.insert(0, SERVER_DIR)
+            from shared_catalog import SharedCatalog
+
+            try:
+                SharedCatalog(self._shared_prefix).destroy()
+            except OSError as exc:
+                print(f"warning: shared catalog {self._shared_prefix!r} not cleaned up: {exc}", file=sys.stderr)
+            self._shared_prefix = None
+        if self._log is not None:
+            self._log.close()
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+
+# ---------------------------------------------------------------------------
+# Rutele din mix
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Workload:
+    norad_ids: List[int]
+    image_png: bytes
+    rng: random.Random = field(default_factory=lambda: random.Random(0))
+
+    def norad(self) -> int:
+        return self.rng.choice(self.norad_ids)
+
+
+# nume -> (metodă, cale, parametri, fișiere)
+RequestSpec = Tuple[str, str, Optional[Dict], Optional[Dict]]
+
+ROUTES: Dict[str, Callable[[Workload], RequestSpec]] = {
+    "propagate": lambda w: ("GET", "/api/propagate", {"norad_id": w.norad(), "minutes": 120, "step_s": 60}, None),
+    "objects": lambda w: ("GET", "/api/objects", {"limit": 100}, None),
+    "risk_ordem": lambda w: ("GET", "/api/risk/ordem", {
+        "norad_id": w.norad(), "alt_km": round(w.rng.uniform(400, 1200)), "duration_days": 365}, None),
+    "debris_nasa": lambda w: ("GET", "/api/debris/nasa", {"norad_id": w.norad(), "limit": 200}, None),
+    "debris_real": lambda w: ("GET", "/api/debris/real", {"norad_id": w.norad(), "limit": 100}, None),
+    "debris_simulate": lambda w: ("GET", "/api/debris/simulate", {"norad_id": w.norad(), "debris_count": 50}, None),
+    "detect": lambda w: ("POST", "/api/detect", None, {"file": ("frame.png", w.image_png, "image/png")}),
+    "spaceweather": lambda w: ("GET", "/api/spaceweather/donki", None, None),
+}
+
+
+def parse_mix(text: Optional[str]) -> Dict[str, float]:
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in ROUTES:
+            raise ValueError(f"Unknown route '{name}' (choose from {', '.join(ROUTES)}).")
+        mix[name] = float(weight or 1)
+    if not any(w > 0 for w in mix.values()):
+        raise ValueError("The mix needs at least one route with a positive weight.")
+    return mix
+
+
+# ---------------------------------------------------------------------------
+# Generatorul de încărcare și statistici
+# ---------------------------------------------------------------------------
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def _summary(latencies_s: List[float], errors: int, elapsed_s: float) -> Dict:
+    lat = sorted(x * 1000.0 for x in latencies_s)
+    n = len(lat)
+    return {
+        "requests": n,
+        "errors": errors,
+        "error_rate": errors / n if n else 0.0,
+        "rps": n / elapsed_s if elapsed_s > 0 else 0.0,
+        "p50_ms": _percentile(lat, 50),
+        "p95_ms": _percentile(lat, 95),
+        "p99_ms": _percentile(lat, 99),
+        "mean_ms": sum(lat) / n if n else 0.0,
+        "max_ms": lat[-1] if lat else 0.0,
+    }
+
+
+async def _run_level(base_url: str, workload: Workload, mix: Dict[str, float], concurrency: int,
+                     duration_s: float, max_requests: Optional[int], timeout_s: float) -> Dict:
+    import httpx
+
+    names = [n for n, w in mix.items() if w > 0]
+    weights = [mix[n] for n in names]
+    latencies: Dict[str, List[float]] = {n: [] for n in names}
+    errors: Dict[str, int] = {n: 0 for n in names}
+    statuses: Dict[str, Dict[str, int]] = {n: {} for n in names}
+    issued = 0
+    deadline = time.perf_counter() + duration_s
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout_s, limits=limits) as client:
+
+        async def user() -> None:
+            nonlocal issued
+            while time.perf_counter() < deadline and (max_requests is None or issued < max_requests):
+                issued += 1
+                name = workload.rng.choices(names, weights)[0]
+                method, path, params, files = ROUTES[name](workload)
+                t0 = time.perf_counter()
+                try:
+                    r = await client.request(method, path, params=params, files=files)
+                    status = str(r.status_code)
+                    ok = r.status_code < 400
+                except httpx.HTTPError as exc:
+                    status = type(exc).__name__
+                    ok = False
+                latencies[name].append(time.perf_counter() - t0)
+                statuses[name][status] = statuses[name].get(status, 0) + 1
+                if not ok:
+                    errors[name] += 1
+
+        t_start = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t_start
+
+    routes = {}
+    for n in names:
+        routes[n] = _summary(latencies[n], errors[n], elapsed)
+        routes[n]["status"] = statuses[n]
+    return {
+        "concurrency": concurrency,
+        "duration_s": elapsed,
+        "overall": _summary([x for n in names for x in latencies[n]], sum(errors.values()), elapsed),
+        "routes": routes,
+    }
+
+
+def _prepare_workload(base_url: str, load_catalog: bool, seed: int, image_size: int) -> Workload:
+    import httpx
+
+    if load_catalog:
+        r = httpx.post(f"{base_url}/api/tle/load", json={"source": "celestrak", "group": "active"}, timeout=120)
+        r.raise_for_status()
+    r = httpx.get(f"{base_url}/api/objects", params={"limit": 100000}, timeout=60)
+    r.raise_for_status()
+    norad_ids = [o["norad_id"] for o in r.json()["objects"]]
+    if not norad_ids:
+        raise RuntimeError("The TLE catalog is empty; load one first (POST /api/tle/load).")
+    return Workload(norad_ids=norad_ids, image_png=synthetic.synthetic_image_png(image_size),
+                    rng=random.Random(seed))
+
+
+def capacity(levels: List[Dict], slo_p99_ms: float, max_error_rate: float, workers: int) -> Dict:
+    """Highest throughput among the levels that meet the SLO (p99 and error rate)."""
+    ok = [lv for lv in levels
+          if lv["overall"]["p99_ms"] <= slo_p99_ms and lv["overall"]["error_rate"] <= max_error_rate]
+    best = max(ok, key=lambda lv: lv["overall"]["rps"]) if ok else None
+    return {
+        "slo_p99_ms": slo_p99_ms,
+        "max_error_rate": max_error_rate,
+        "workers": workers,
+        "concurrency": best["concurrency"] if best else None,
+        "rps": best["overall"]["rps"] if best else 0.0,
+        "rps_per_worker": best["overall"]["rps"] / workers if best else 0.0,
+    }
+
+
+def _print_level(level: Dict) -> None:
+    o = level["overall"]
+    print(f"concurrency {level['concurrency']:>4}: {o['requests']:>6} req  {o['rps']:8.1f} req/s  "
+          f"err {o['error_rate']:6.2%}  p50 {o['p50_ms']:7.1f}  p95 {o['p95_ms']:7.1f}  p99 {o['p99_ms']:7.1f} ms")
+    for name, s in sorted(level["routes"].items()):
+        print(f"    {name:<16} {s['requests']:>6}  {s['rps']:8.1f} req/s  err {s['error_rate']:6.2%}  "
+              f"p50 {s['p50_ms']:7.1f}  p95 {s['p95_ms']:7.1f}  p99 {s['p99_ms']:7.1f} ms")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", help="Load-test a running server instead of booting one (catalog must be loaded)")
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn workers for the local server")
+    ap.add_argument("--catalog", type=int, default=2000, help="Objects in the synthetic CelesTrak catalog")
+    ap.add_argument("--concurrency", type=int, default=8, help="Concurrent clients (ignored with --sweep)")
+    ap.add_argument("--sweep", help="Comma-separated concurrency levels, e.g. 1,4,16,32")
+    ap.add_argument("--duration", type=float, default=30.0, help="Seconds per concurrency level")
+    ap.add_argument("--requests", type=int, help="Stop a level after this many requests")
+    ap.add_argument("--warmup", type=float, default=3.0, help="Seconds of unrecorded traffic before measuring")
+    ap.add_argument("--mix", help="Weighted route mix, e.g. propagate=5,objects=2 "
+                                  f"(routes: {', '.join(ROUTES)})")
+    ap.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout [s]")
+    ap.add_argument("--image-size", type=int, default=256, help="Side of the /api/detect test image [px]")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--slo-p99-ms", type=float, default=1000.0, help="p99 latency target for the capacity figure")
+    ap.add_argument("--max-error-rate", type=float, default=0.01, help="Error rate allowed for the capacity figure")
+    ap.add_argument("--out", default=os.path.join(RESULTS_DIR, "loadtest.json"))
+    args = ap.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as exc:
+        ap.error(str(exc))
+    levels_c = [int(c) for c in args.sweep.split(",")] if args.sweep else [args.concurrency]
+
+    def run(base_url: str, load_catalog: bool) -> List[Dict]:
+        workload = _prepare_workload(base_url, load_catalog, args.seed, args.image_size)
+        print(f"{len(workload.norad_ids)} objects, mix {mix}")
+        if args.warmup > 0:
+            asyncio.run(_run_level(base_url, workload, mix, max(levels_c), args.warmup, None, args.timeout))
+        levels = []
+        for c in levels_c:
+            level = asyncio.run(_run_level(base_url, workload, mix, c, args.duration, args.requests, args.timeout))
+            _print_level(level)
+            levels.append(level)
+        return levels
+
+    if args.url:
+        levels = run(args.url.rstrip("/"), load_catalog=False)
+    else:
+        with StubUpstream(synthetic.synthetic_tle_text(args.catalog)) as upstream, \
+                LocalServer(upstream.base_url, workers=args.workers) as server:
+            server.wait_ready()
+            levels = run(server.url, load_catalog=True)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "target": args.url or "local",
+        "workers": args.workers,
+        "catalog": None if args.url else args.catalog,
+        "mix": mix,
+        "levels": levels,
+        "capacity": capacity(levels, args.slo_p99_ms, args.max_error_rate, args.workers),
+    }
+    cap = report["capacity"]
+    if cap["concurrency"] is None:
+        print(f"capacity: no level met p99 <= {args.slo_p99_ms:.0f} ms with <= {args.max_error_rate:.0%} errors")
+    else:
+        print(f"capacity: {cap['rps']:.1f} req/s at concurrency {cap['concurrency']} "
+              f"({cap['rps_per_worker']:.1f} req/s per worker)")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"report: {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+"""Offline benchmark suite for the server's hot paths.
+
+Usage (from the repository root)::
+
+    python benchmarks/run.py                       # full run, writes benchmarks/results/latest.json
+    python benchmarks/run.py --quick               # 1k catalog only, fewer windows
+    python benchmarks/run.py --save-baseline       # also store the run as benchmarks/baseline.json
+    python benchmarks/run.py --compare benchmarks/baseline.json --threshold 0.25
+    python benchmarks/startup.py                   # cold-start budget check
+
+Everything runs on synthetic inputs (TLE catalogs, images, flux table), so
+results are reproducible without network access. ``--compare`` exits with
+status 1 when any case is slower than the baseline by more than
+``--threshold`` (relative, on the median).
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.abspath(os.path.join(BENCH_DIR, "..", "server"))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, SERVER_DIR)
+
+import synthetic  # noqa: E402
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+Case = Tuple[str, Callable[[], object], int]
+
+
+def _measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    fn()  # warm-up: caches, lazy imports, JIT-ish first-call costs
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "max_s": max(times),
+        "repeat": repeat,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Cazuri de benchmark
+# ---------------------------------------------------------------------------
+
+def cases_propagate(quick: bool) -> Iterator[Case]:
+    from propagate import propagate_positions
+    from tle_store import TLEStore
+
+    store = TLEStore()
+    store.load_from_text(synthetic.synthetic_tle_text(1, seed=1))
+    rec = store.records()[0]
+    start = dt.datetime.now(dt.timezone.utc)
+
+    windows = [(120, 60), (1440, 60)] if quick else [(120, 10), (120, 60), (1440, 60), (1440, 300)]
+    for minutes, step in windows:
+        yield (f"propagate_positions[{minutes}min/{step}s]",
+               lambda m=minutes, s=step: propagate_positions(rec, start, minutes=m, step_seconds=s), 5)
+
+    from ephemeris import EphemerisCache
+
+    cache = EphemerisCache()
+    for minutes, step in windows:
+        if minutes * 60 > cache.window_s:
+            continue
+        yield (f"ephemeris.geodetic_samples[{minutes}min/{step}s]",
+               lambda m=minutes, s=step: cache.geodetic_samples(rec, start, minutes=m, step_seconds=s), 5)
+
+
+def cases_startup() -> Iterator[Case]:
+    import startup
+
+    yield "cold import server/main.py", startup.measure_once, 5
+
+
+def cases_tle_load(sizes: List[int]) -> Iterator[Case]:
+    from tle_store import TLEStore
+
+    for n in sizes:
+        text = synthetic.synthetic_tle_text(n)
+        yield f"TLEStore.load_from_text[{n}]", lambda t=text: TLEStore().load_from_text(t), 5
+
+
+def cases_risk(quick: bool) -> Iterator[Case]:
+    import random
+    import risk
+
+    tmp = tempfile.mkdtemp(prefix="bench_flux_")
+    risk.SAMPLE_FILE = synthetic.write_synthetic_flux_table(os.path.join(tmp, "ordem_flux_sample.csv"))
+    risk._load_flux_table.cache_clear()
+
+    rng = random.Random(11)
+    n = 200 if quick else 1000
+    points = [(rng.uniform(250, 1900), rng.uniform(0, 170)) for _ in range(n)]
+
+    def flux_batch():
+        for alt, inc in points:
+            risk.flux_ordem_like(alt, inc, 1.0, 10.0)
+
+    def prob_batch():
+        for alt, inc in points:
+            risk.annual_collision_probability(10.0, 1.0, 1e-4 * (alt / 1000.0))
+
+    yield f"flux_ordem_like[x{n}]", flux_batch, 5
+    yield f"annual_collision_probability[x{n}]", prob_batch, 5
+
+
+def _circular_states(lat_deg, lon_deg, alt_km, seed: int = 5):
+    """Position (km) and circular-orbit velocity (km/s, random direction in the local horizontal plane)."""
+    import numpy as np
+    from frames import geodetic_to_itrf
+
+    r = geodetic_to_itrf(lat_deg, lon_deg, alt_km).reshape(-1, 3)
+    norm = np.linalg.norm(r, axis=1, keepdims=True)
+    u = np.cross(r, np.random.default_rng(seed).normal(size=r.shape))
+    u /= np.linalg.norm(u, axis=1, keepdims=True)
+    return r, u * np.sqrt(synthetic.MU_KM3_S2 / norm)
+
+
+def cases_proximity(sizes: List[int]) -> Iterator[Case]:
+    import main
+
+    sat_r, sat_v = _circular_states([20.0], [45.0], [550.0])
+    for n in sizes:
+        debris = synthetic.synthetic_debris_dicts(n)
+        debris_r, debris_v = _circular_states([d["latitude"] for d in debris], [d["longitude"] for d in debris],
+                                              [d["altitude"] for d in debris])
+        yield (f"filter_debris_by_proximity[{n}]",
+               lambda d=debris, r=debris_r, v=debris_v: main.filter_debris_by_proximity(
+                   sat_r[0], sat_v[0], d, r, v, 1000.0), 5)
+
+
+def cases_passes(sizes: List[int]) -> Iterator[Case]:
+    from passes import Observer, predict_passes
+    from propagate import satrec_from_record, time_grid
+    from tle_store import TLEStore
+
+    observer = Observer(44.43, 26.10, 0.08)
+    jd, fr = time_grid(dt.datetime.now(dt.timezone.utc), minutes=1440, step_seconds=60)
+    for n in sizes:
+        store = TLEStore()
+        store.load_from_text(synthetic.synthetic_tle_text(n))
+        sats = [satrec_from_record(r) for r in store.records()]
+        yield f"predict_passes[{n} objects,24h]", lambda s=sats: predict_passes(s, observer, jd, fr), 3
+
+
+def cases_collision(quick: bool) -> Iterator[Case]:
+    import numpy as np
+    from collision import probability_of_collision, tle_covariance
+
+    rng = np.random.default_rng(5)
+    for n in ([1000] if quick else [1000, 10000]):
+        r1 = rng.normal(size=(n, 3))
+        r1 *= 7000.0 / np.linalg.norm(r1, axis=1)[:, None]
+        v1 = np.cross(r1, rng.normal(size=(n, 3)))
+        v1 *= 7.5 / np.linalg.norm(v1, axis=1)[:, None]
+        r2 = r1 + rng.normal(scale=2.0, size=(n, 3))
+        v2 = v1 + rng.normal(scale=5.0, size=(n, 3))
+        ages = rng.uniform(0.0, 3.0, size=n)
+        for method in ("foster", "chan"):
+            def pc_batch(m=method, a=(r1, v1, r2, v2, ages)):
+                c1 = tle_covariance(a[0], a[1], a[4])
+                c2 = tle_covariance(a[2], a[3], a[4])
+                probability_of_collision(a[0], a[1], c1, a[2], a[3], c2, 0.01, method=m)
+            yield f"probability_of_collision[{method},{n} conjunctions]", pc_batch, 5
+
+
+def cases_classifier(quick: bool) -> Iterator[Case]:
+    from classifier import classify_image
+
+    for size in ([256, 1024] if quick else [256, 1024, 2048]):
+        png = synthetic.synthetic_image_png(size)
+        yield f"classify_image[{size}px]", lambda b=png: classify_image(io.BytesIO(b)), 5
+
+
+def cases_endpoints(sizes: List[int], quick: bool) -> Iterator[Case]:
+    from fastapi.testclient import TestClient
+    import main
+
+    client = TestClient(main.app)
+    for n in sizes:
+        main.tle_store.clear()
+        main.tle_store.load_from_text(synthetic.synthetic_tle_text(n))
+        norad = main.tle_store.records()[0].norad_id
+
+        def call(path: str, params: Dict) -> None:
+            r = client.get(path, params=params)
+            if r.status_code != 200:
+                raise RuntimeError(f"{path} -> {r.status_code}: {r.text[:200]}")
+
+        real = [(500, 120)] if quick else [(500, 120), (2000, 1440)]
+        for limit, minutes in real:
+            params = {"norad_id": norad, "limit": limit, "minutes": minutes}
+            yield (f"GET /api/debris/real[catalog={n},limit={limit},{minutes}min]",
+                   lambda p=params: call("/api/debris/real", p), 3)
+        sim = [(200, 120)] if quick else [(200, 120), (2000, 1440)]
+        for count, minutes in sim:
+            params = {"norad_id": norad, "debris_count": count, "minutes": minutes}
+            yield (f"GET /api/debris/simulate[catalog={n},debris={count},{minutes}min]",
+                   lambda p=params: call("/api/debris/simulate", p), 3)
+
+
+GROUPS = ["startup", "propagate", "tle_load", "risk", "proximity", "passes", "collision", "classifier", "endpoints"]
+
+
+def collect_cases(groups: List[str], sizes: List[int], quick: bool) -> Iterator[Case]:
+    factories = {
+        "startup": cases_startup,
+        "propagate": lambda: cases_propagate(quick),
+        "tle_load": lambda: cases_tle_load(sizes),
+        "risk": lambda: cases_risk(quick),
+        "proximity": lambda: cases_proximity(sizes),
+        # Trecerile sunt cerute pentru sute/mii de obiecte, nu pentru tot catalogul
+        "passes": lambda: cases_passes([s for s in sizes if s <= 5000] or [1000]),
+        "collision": lambda: cases_collision(quick),
+        "classifier": lambda: cases_classifier(quick),
+        # Endpoint-urile folosesc catalogul doar pentru căutarea părinților; 10k e suficient
+        "endpoints": lambda: cases_endpoints([s for s in sizes if s <= 10000] or sizes[:1], quick),
+    }
+    for g in groups:
+        yield from factories[g]()
+
+
+# ---------------------------------------------------------------------------
+# Rezultate și comparație cu baseline
+# ---------------------------------------------------------------------------
+
+def run(groups: List[str], sizes: List[int], quick: bool, repeat: Optional[int]) -> Dict:
+    results: Dict[str, Dict] = {}
+    for name, fn, default_repeat in collect_cases(groups, sizes, quick):
+        res = _measure(fn, repeat or default_repeat)
+        results[name] = res
+        print(f"  {name:<70} median {res['median_s'] * 1000:10.2f} ms   min {res['min_s'] * 1000:10.2f} ms", flush=True)
+
+    import numpy
+    return {
+        "meta": {
+            "timestamp": dt.datetime.now(dt.timezone.utc).isoformat().replace("+00:00", "Z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "numpy": numpy.__version__,
+            "sizes": sizes,
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Print a baseline comparison table and return the names of regressed cases."""
+    regressions = []
+    base = baseline.get("results", {})
+    print(f"\n{'case':<70} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}")
+    for name, res in current["results"].items():
+        if name not in base:
+            print(f"{name:<70} {'-':>12} {res['median_s'] * 1000:12.2f} {'new':>7}")
+            continue
+        b = base[name]["median_s"]
+        ratio = res["median_s"] / b if b > 0 else float("inf")
+        flag = ""
+        if ratio > 1.0 + threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<70} {b * 1000:12.2f} {res['median_s'] * 1000:12.2f} {ratio:7.2f}{flag}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the server's hot paths on synthetic data.")
+    parser.add_argument("--quick", action="store_true", help="1k catalog and fewer windows")
+    parser.add_argument("--sizes", type=int, nargs="+", default=None, help="catalog sizes (default 1000 10000 30000)")
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=None, help="run only these groups")
+    parser.add_argument("--repeat", type=int, default=None, help="override repetitions per case")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, default=None,
+                        help=f"also write results as baseline (default {os.path.relpath(DEFAULT_BASELINE)})")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, default=None,
+                        help="compare against a baseline JSON and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown (default 0.25)")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or ([1000] if args.quick else [1000, 10000, 30000])
+    groups = args.only or GROUPS
+
+    print(f"Running benchmarks: groups={groups} sizes={sizes}")
+    current = run(groups, sizes, args.quick, args.repeat)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            return 1
+        print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
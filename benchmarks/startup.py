@@ -0,0 +1,101 @@
+"""Cold-start check for the API module.
+
+Imports ``server/main.py`` in fresh interpreters and verifies that
+
+* the median import time stays under ``--budget-ms``;
+* none of the heavy, feature-specific dependencies are loaded at import
+  time (they must be imported lazily by the code paths that need them).
+
+Usage (from the repository root)::
+
+    python benchmarks/startup.py                 # default budget
+    python benchmarks/startup.py --budget-ms 1200 --runs 7
+    python benchmarks/startup.py --importtime    # also print the slowest imports
+
+Exits with status 1 when the budget or the lazy-import rule is violated.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "server"))
+
+# Module care nu au voie să fie încărcate doar prin `import main`
+HEAVY_MODULES = ("numpy", "cv2", "PIL", "skyfield", "sgp4", "requests", "uvicorn")
+
+DEFAULT_BUDGET_MS = 1500.0
+
+_PROBE = (
+    "import json, sys, time\n"
+    "t0 = time.perf_counter()\n"
+    "import main\n"
+    "elapsed = time.perf_counter() - t0\n"
+    "heavy = sorted(m for m in {heavy!r} if m in sys.modules)\n"
+    "print(json.dumps({{'import_s': elapsed, 'heavy_loaded': heavy}}))\n"
+)
+
+
+def measure_once(extra_env: Optional[Dict[str, str]] = None) -> Dict:
+    env = dict(os.environ, **(extra_env or {}))
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(heavy=HEAVY_MODULES)],
+        cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(limit: int = 15) -> List[str]:
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=SERVER_DIR, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        rows.append((int(parts[1]), parts[2].rstrip()))
+    rows.sort(reverse=True)
+    return [f"{us / 1000:9.1f} ms  {name}" for us, name in rows[:limit]]
+
+
+def check(runs: int, budget_ms: float) -> Dict:
+    samples = [measure_once() for _ in range(runs)]
+    median_ms = statistics.median(s["import_s"] for s in samples) * 1000
+    heavy = sorted({m for s in samples for m in s["heavy_loaded"]})
+    return {
+        "median_ms": median_ms,
+        "min_ms": min(s["import_s"] for s in samples) * 1000,
+        "runs": runs,
+        "budget_ms": budget_ms,
+        "heavy_loaded": heavy,
+        "ok": median_ms <= budget_ms and not heavy,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check cold import time of server/main.py.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", DEFAULT_BUDGET_MS)))
+    parser.add_argument("--importtime", action="store_true", help="print the slowest imports (-X importtime)")
+    args = parser.parse_args(argv)
+
+    result = check(args.runs, args.budget_ms)
+    print(f"import main: median {result['median_ms']:.0f} ms, min {result['min_ms']:.0f} ms "
+          f"over {result['runs']} runs (budget {result['budget_ms']:.0f} ms)")
+    if result["heavy_loaded"]:
+        print(f"Eager heavy imports detected: {', '.join(result['heavy_loaded'])}")
+    if args.importtime:
+        print("\nSlowest imports (cumulative):")
+        print("\n".join(slowest_imports()))
+    return 0 if result["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Deterministic synthetic inputs for the benchmark suite (no network needed)."""
+from __future__ import annotations
+
+import csv
+import datetime as dt
+import io
+import math
+import os
+import random
+import sys
+from typing import Dict, List
+
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "server"))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+from tle_store import format_tle_lines  # noqa: E402
+
+MU_KM3_S2 = 398600.4418
+EARTH_RADIUS_KM = 6378.137
+
+# Nume de obiecte reale, folosite doar ca etichete pentru catalogul sintetic
+_NAME_POOL = [
+    "STARLINK", "ONEWEB", "IRIDIUM", "COSMOS", "FENGYUN 1C DEB",
+    "COSMOS 2251 DEB", "IRIDIUM 33 DEB", "SL-16 R/B", "CZ-4 DEB", "NOAA",
+]
+
+
+def _mean_motion_rev_day(alt_km: float) -> float:
+    a = EARTH_RADIUS_KM + alt_km
+    return math.sqrt(MU_KM3_S2 / a ** 3) * 86400.0 / (2 * math.pi)
+
+
+def synthetic_tle_text(count: int, seed: int = 42, epoch: dt.datetime = None) -> str:
+    """
+    Build a 3-line TLE catalog of ``count`` LEO objects.
+
+    Altitudes, inclinations and eccentricities are drawn from bands that
+    resemble the public catalog. The epoch defaults to today (UTC midnight)
+    so the elements stay well inside SGP4's useful range when propagated "now".
+    """
+    rng = random.Random(seed)
+    epoch = epoch or dt.datetime.now(dt.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    epoch_day = epoch.timetuple().tm_yday + (epoch.hour * 3600 + epoch.minute * 60 + epoch.second) / 86400.0
+
+    out = io.StringIO()
+    for i in range(count):
+        norad = 10000 + i
+        alt = rng.choice([rng.uniform(350, 600), rng.uniform(600, 900), rng.uniform(900, 1400)])
+        inc = rng.choice([rng.uniform(50, 56), rng.uniform(70, 75), rng.uniform(96, 100), rng.uniform(0, 110)])
+        ecc = min(0.05, abs(rng.gauss(0.0, 0.01)))
+        l1, l2 = format_tle_lines(
+            norad_id=norad,
+            epoch_year=epoch.year,
+            epoch_day=epoch_day,
+            inclination_deg=inc,
+            raan_deg=rng.uniform(0, 360),
+            eccentricity=ecc,
+            arg_perigee_deg=rng.uniform(0, 360),
+            mean_anomaly_deg=rng.uniform(0, 360),
+            mean_motion_rev_day=_mean_motion_rev_day(alt),
+            bstar=rng.uniform(1e-5, 2e-4),
+            intl_designator=f"{epoch.year % 100:02d}{i % 999 + 1:03d}A",
+        )
+        name = f"{rng.choice(_NAME_POOL)} {i}"
+        out.write(f"{name}\n{l1}\n{l2}\n")
+    return out.getvalue()
+
+
+def synthetic_debris_dicts(count: int, seed: int = 7) -> List[Dict]:
+    """Debris entries shaped like ``main.fetch_nasa_debris`` output."""
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        inc = rng.uniform(50, 100)
+        items.append({
+            "norad_id": 30000 + i,
+            "name": f"SYNTHETIC DEB #{i + 1:05d}",
+            "object_type": "DEBRIS",
+            "inclination": inc,
+            "latitude": rng.uniform(-inc if inc <= 90 else -(180 - inc), inc if inc <= 90 else 180 - inc),
+            "longitude": rng.uniform(-180, 180),
+            "altitude": rng.uniform(300, 1500),
+            "rcs_size": rng.choice(["SMALL", "MEDIUM", "LARGE"]),
+        })
+    return items
+
+
+def synthetic_image_png(size: int, seed: int = 3) -> bytes:
+    """Grey background with a few bright rectangles and noise, encoded as PNG."""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    img = rng.normal(40, 12, size=(size, size, 3)).clip(0, 255)
+    for _ in range(6):
+        w, h = rng.integers(size // 16, size // 3, size=2)
+        x, y = rng.integers(0, size - w), rng.integers(0, size - h)
+        img[y:y + h, x:x + w] = rng.uniform(120, 240)
+    buf = io.BytesIO()
+    Image.fromarray(img.astype("uint8")).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def write_synthetic_flux_table(path: str) -> str:
+    """Write a small ORDEM-like flux grid in the format ``risk._load_flux_table`` expects."""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["altitude_km", "inclination_deg", "size_min_cm", "size_max_cm", "flux_per_m2_per_year"])
+        for alt in range(200, 2001, 100):
+            for inc in range(0, 181, 15):
+                for smin, smax in ((0.1, 1.0), (1.0, 10.0), (10.0, 100.0)):
+                    base = 1e-3 / smin * math.exp(-abs(alt - 850) / 400.0)
+                    flux = base * (1.0 + 0.3 * math.sin(math.radians(inc)))
+                    w.writerow([alt, inc, smin, smax, f"{flux:.6e}"])
+    return path
@@ -4,7 +4,6 @@ class APIManager {
     this.baseUrl = baseUrl || CONFIG.API_BASE_URL;
     this.errorHandler = errorHandler || ErrorManager;
     this.dom = domCache || DOM;
-    this.cache = new Map(); // Simple response caching
     this.requestQueue = new Map(); // Prevent duplicate requests
   }
 
@@ -48,33 +47,10 @@ class APIManager {
       ...options
     };
 
-    try {
-      const response = await this.errorHandler.fetchWithErrorHandling(url, defaultOptions, context);
-      const data = await response.json();
-      
-      // Cache successful GET requests
-      if (!options.method || options.method === 'GET') {
-        this.cache.set(url, { data, timestamp: Date.now() });
-      }
-      
-      return data;
-    } catch (error) {
-      throw error;
-    }
-  }
-
-  // Get cached response if available and not expired
-  getCached(url, maxAgeMs = 300000) { // 5 minutes default
-    const cached = this.cache.get(url);
-    if (cached && (Date.now() - cached.timestamp) < maxAgeMs) {
-      return cached.data;
-    }
-    return null;
-  }
-
-  // Clear cache
-  clearCache() {
-    this.cache.clear();
+    // GET-urile folosesc cache-ul HTTP al browserului: serverul trimite ETag/Cache-Control,
+    // iar browserul revalidează cu If-None-Match și primește 304 dacă datele nu s-au schimbat
+    const response = await this.errorHandler.fetchWithErrorHandling(url, defaultOptions, context);
+    return response.json();
   }
 
   // TLE Operations
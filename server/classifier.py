@@ -1,23 +1,47 @@
-import numpy as np
-try:
-    import cv2
-    CV2_AVAILABLE = True
-except ImportError:
-    CV2_AVAILABLE = False
-    print("Warning: OpenCV not available. Image classification will use fallback method.")
-
-from typing import Tuple, Dict, Any
-from PIL import Image
 import io
+import logging
+import time
+from functools import lru_cache
+from typing import Tuple, Dict, Any, Optional
+
+from metrics import CLASSIFIER_DURATION
+
+logger = logging.getLogger(__name__)
 
 CATEGORIES = ["panel_solar", "fragment_metalic", "fragment_compozit", "adaptor_structural", "unknown"]
 
+
+@lru_cache(maxsize=1)
+def _cv2() -> Optional[Any]:
+    """
+    OpenCV, importat la prima clasificare (nu la pornirea serverului).
+    Returnează None dacă nu este instalat.
+    """
+    try:
+        import cv2
+        return cv2
+    except ImportError:
+        logger.warning("OpenCV not available. Image classification will use fallback method.")
+        return None
+
+
 def classify_image(img_bytes: io.BytesIO) -> Tuple[str, float, Dict[str, Any]]:
     """
     Clasifică o imagine de deșeu spațial în categorii.
     Fallback simplu dacă OpenCV nu este disponibil.
     """
-    if not CV2_AVAILABLE:
+    t0 = time.perf_counter()
+    try:
+        return _classify(img_bytes)
+    finally:
+        CLASSIFIER_DURATION.observe(time.perf_counter() - t0, ("opencv" if _cv2() is not None else "fallback",))
+
+
+def _classify(img_bytes: io.BytesIO) -> Tuple[str, float, Dict[str, Any]]:
+    from PIL import Image
+
+    cv2 = _cv2()
+    if cv2 is None:
         # Fallback simplu fără OpenCV
         img = Image.open(img_bytes)
         width, height = img.size
@@ -33,6 +57,8 @@ def classify_image(img_bytes: io.BytesIO) -> Tuple[str, float, Dict[str, Any]]:
             return "adaptor_structural", 0.5, {"image_size": [width, height], "aspect_ratio": aspect_ratio}
     
     # Cod original cu OpenCV
+    import numpy as np
+
     img = Image.open(img_bytes)
     img_np = np.array(img.convert("RGB"))
     h, w = img_np.shape[:2]
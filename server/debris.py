@@ -0,0 +1,273 @@
+"""Debris modelled as perturbed SGP4 element sets and screened in bulk.
+
+Each debris object is a real ``Satrec`` whose elements are derived from a
+parent (the satellite itself or a catalog object), so it moves along its
+own orbit. Closest approaches are computed from the relative motion over
+the same time grid as the satellite, using chunked array SGP4.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sgp4.api import Satrec, WGS72
+
+from propagate import propagate_teme_batch
+
+# Aceleași constante ca SGP4 (WGS72) ca elementele perturbate să fie consistente
+MU_KM3_S2 = 398600.8
+EARTH_RADIUS_KM = 6378.135
+MIN_PERIGEE_ALT_KM = 200.0
+_SGP4_EPOCH_JD = 2433281.5  # 1949-12-31 00:00 UT, referința pentru sgp4init
+
+
+@dataclass(frozen=True)
+class DebrisSpread:
+    """Half-widths of the uniform perturbations applied to parent elements."""
+    alt_km: float
+    inc_deg: float
+    raan_deg: float
+    ecc: float
+    argp_deg: float
+    mean_anomaly_deg: float
+
+
+# Fragmente pe aceeași orbită cu satelitul (simulare)
+CO_ORBITAL_SPREAD = DebrisSpread(
+    alt_km=5.0, inc_deg=0.3, raan_deg=0.3, ecc=0.0005, argp_deg=2.0, mean_anomaly_deg=2.0
+)
+
+# Nor de fragmentare în jurul unui obiect părinte din catalog
+FRAGMENTATION_SPREAD = DebrisSpread(
+    alt_km=200.0, inc_deg=1.0, raan_deg=5.0, ecc=0.01, argp_deg=20.0, mean_anomaly_deg=15.0
+)
+
+
+def _mean_motion_rad_min(a_km: float) -> float:
+    return math.sqrt(MU_KM3_S2 / a_km ** 3) * 60.0
+
+
+def _semi_major_axis_km(no_kozai_rad_min: float) -> float:
+    n_rad_s = no_kozai_rad_min / 60.0
+    return (MU_KM3_S2 / (n_rad_s * n_rad_s)) ** (1.0 / 3.0)
+
+
+def _kozai_mean_motion(p: Satrec, n_brouwer: float, ecc: float, inc: float) -> float:
+    """Invert the Kozai -> Brouwer mean-motion conversion done by ``sgp4init``."""
+    cosi = math.cos(inc)
+    omeosq = 1.0 - ecc * ecc
+    d1 = 0.75 * p.j2 * (3.0 * cosi * cosi - 1.0) / (math.sqrt(omeosq) * omeosq)
+    no_kozai = n_brouwer
+    for _ in range(3):
+        ak = (p.xke / no_kozai) ** (2.0 / 3.0)
+        delta = d1 / (ak * ak)
+        adel = ak * (1.0 - delta * delta - delta * (1.0 / 3.0 + 134.0 * delta * delta / 81.0))
+        no_kozai = n_brouwer * (1.0 + d1 / (adel * adel))
+    return no_kozai
+
+
+def _elements_at(p: Satrec, jd: Optional[float], fr: float) -> Tuple[float, float, float, float, float, float, float]:
+    """
+    ``(epoch, ecc, argp, inc, mo, no_kozai, raan)`` of ``p``, either at its own
+    epoch or (when ``jd`` is given) as SGP4 mean elements at ``jd + fr``.
+    """
+    if jd is None:
+        return (p.jdsatepoch + p.jdsatepochF - _SGP4_EPOCH_JD,
+                p.ecco, p.argpo, p.inclo, p.mo, p.no_kozai, p.nodeo)
+    err, _, _ = p.sgp4(jd, fr)
+    if err:
+        raise ValueError(f"Parent {p.satnum} propagation failed (SGP4 error {err}).")
+    return (jd + fr - _SGP4_EPOCH_JD, p.em, p.om, p.im, p.mm,
+            _kozai_mean_motion(p, p.nm, p.em, p.im), p.Om)
+
+
+def perturb_elements(
+    parents: Sequence[Satrec],
+    count: int,
+    spread: DebrisSpread,
+    rng: Optional[np.random.Generator] = None,
+    satnum_base: int = 90000,
+    epoch: Optional[Tuple[float, float]] = None,
+) -> Tuple[List[Satrec], np.ndarray]:
+    """
+    Generate ``count`` debris element sets perturbed from ``parents``.
+
+    Parents are drawn uniformly and every debris shares its parent's drag
+    term. With ``epoch=(jd, fr)`` the perturbation is applied to the parent's
+    mean elements at that instant (a fragmentation happening "now");
+    otherwise it is applied at the parent's TLE epoch, in which case small
+    mean-motion offsets accumulate into large along-track drift for old TLEs.
+    Parents that SGP4 cannot propagate to ``epoch`` (decayed or stale
+    TLEs) are skipped; ``ValueError`` is raised only when none is left.
+    Returns the new models and the index in ``parents`` of each one's parent.
+    """
+    if not parents:
+        raise ValueError("At least one parent element set is required.")
+    rng = rng or np.random.default_rng()
+    jd, fr = epoch if epoch is not None else (None, 0.0)
+    usable, base = [], []
+    for k, p in enumerate(parents):
+        try:
+            base.append(_elements_at(p, jd, fr))
+        except ValueError:
+            continue
+        usable.append(k)
+    if not usable:
+        raise ValueError("No parent element set can be propagated to the fragmentation epoch.")
+
+    parent_idx = np.asarray(usable)[rng.integers(0, len(usable), size=count)]
+    base_of = dict(zip(usable, base))
+
+    u = rng.uniform(-1.0, 1.0, size=(count, 6))
+
+    debris: List[Satrec] = []
+    for i in range(count):
+        p = parents[int(parent_idx[i])]
+        p_epoch, p_ecc, p_argp, p_inc, p_mo, p_no, p_raan = base_of[int(parent_idx[i])]
+        d_alt, d_inc, d_raan, d_ecc, d_argp, d_mo = u[i]
+
+        a = _semi_major_axis_km(p_no) + d_alt * spread.alt_km
+        ecc = min(max(p_ecc + d_ecc * spread.ecc, 0.0), 0.9)
+        # Perigeul nu are voie să intre în atmosferă (SGP4 ar întoarce eroare)
+        a = max(a, (EARTH_RADIUS_KM + MIN_PERIGEE_ALT_KM) / (1.0 - ecc))
+        inc = min(max(p_inc + math.radians(d_inc * spread.inc_deg), 0.0), math.pi)
+
+        sat = Satrec()
+        sat.sgp4init(
+            WGS72,
+            "i",
+            satnum_base + i,
+            p_epoch,
+            p.bstar,
+            p.ndot,
+            p.nddot,
+            ecc,
+            (p_argp + math.radians(d_argp * spread.argp_deg)) % (2 * math.pi),
+            inc,
+            (p_mo + math.radians(d_mo * spread.mean_anomaly_deg)) % (2 * math.pi),
+            _mean_motion_rad_min(a),
+            (p_raan + math.radians(d_raan * spread.raan_deg)) % (2 * math.pi),
+        )
+        debris.append(sat)
+    return debris, parent_idx
+
+
+def shell_overlaps(primary: Satrec, candidates: Sequence[Satrec], margin_km: float) -> List[int]:
+    """
+    Indices of ``candidates`` whose perigee/apogee shell comes within
+    ``margin_km`` of the primary's shell.
+    """
+    def shell(s: Satrec) -> Tuple[float, float]:
+        a = _semi_major_axis_km(s.no_kozai)
+        return a * (1.0 - s.ecco), a * (1.0 + s.ecco)
+
+    p_lo, p_hi = shell(primary)
+    out = []
+    for i, c in enumerate(candidates):
+        lo, hi = shell(c)
+        if lo - margin_km <= p_hi and hi + margin_km >= p_lo:
+            out.append(i)
+    return out
+
+
+def closest_approaches(
+    primary: Satrec,
+    secondaries: Sequence[Satrec],
+    jd: np.ndarray,
+    fr: np.ndarray,
+    chunk_size: int = 256,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Minimum distance and time of closest approach between ``primary`` and
+    every object in ``secondaries`` over the grid ``(jd, fr)``.
+
+    The grid minimum is refined assuming linear relative motion around the
+    best sample, which is accurate for the short encounter durations typical
+    of orbital conjunctions. Objects whose propagation fails get
+    ``valid=False`` and an infinite distance.
+
+    Returned arrays (length ``len(secondaries)``):
+    ``min_distance_km``, ``tca_offset_s`` (seconds after ``jd[0] + fr[0]``),
+    ``rel_speed_kms``, ``r0_teme``/``v0_teme`` (state at the first sample),
+    ``r_tca_teme``/``v_tca_teme`` and ``r_tca_primary``/``v_tca_primary``
+    (both states at TCA, as used by ``collision.probability_of_collision``)
+    and ``valid``. ``progress(done, total)`` is called after every chunk.
+    """
+    n = len(secondaries)
+    t_s = ((jd - jd[0]) + (fr - fr[0])) * 86400.0
+    step_s = float(t_s[1] - t_s[0]) if len(t_s) > 1 else 0.0
+
+    err_p, r_p, v_p = primary.sgp4_array(jd, fr)
+    if np.any(err_p):
+        raise ValueError(f"Primary object propagation failed (SGP4 error {int(err_p[err_p != 0][0])}).")
+
+    min_distance = np.full(n, np.inf)
+    tca_offset = np.zeros(n)
+    rel_speed = np.zeros(n)
+    r0 = np.full((n, 3), np.nan)
+    v0 = np.full((n, 3), np.nan)
+    r_tca = np.full((n, 3), np.nan)
+    v_tca = np.full((n, 3), np.nan)
+    r_tca_p = np.full((n, 3), np.nan)
+    v_tca_p = np.full((n, 3), np.nan)
+    valid = np.zeros(n, dtype=bool)
+
+    for offset, r, v, err in propagate_teme_batch(secondaries, jd, fr, chunk_size=chunk_size):
+        m = r.shape[0]
+        sl = slice(offset, offset + m)
+        rows = np.arange(m)
+
+        dr = r - r_p[None, :, :]
+        d2 = np.einsum("ijk,ijk->ij", dr, dr)
+        d2[err != 0] = np.inf
+        k = np.argmin(d2, axis=1)
+
+        dr_k = dr[rows, k]
+        dv_k = v[rows, k] - v_p[k]
+        dv2 = np.einsum("ij,ij->i", dv_k, dv_k)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_star = np.where(dv2 > 0, -np.einsum("ij,ij->i", dr_k, dv_k) / dv2, 0.0)
+        t_star = np.clip(t_star, -step_s, step_s)
+        # Nu extrapola în afara ferestrei de propagare
+        t_star = np.clip(t_star, -t_s[k], t_s[-1] - t_s[k])
+        miss = dr_k + dv_k * t_star[:, None]
+
+        ok = np.isfinite(d2[rows, k])
+        min_distance[sl] = np.where(ok, np.linalg.norm(miss, axis=1), np.inf)
+        tca_offset[sl] = t_s[k] + t_star
+        rel_speed[sl] = np.sqrt(dv2)
+        r0[sl] = r[:, 0]
+        v0[sl] = v[:, 0]
+        r_tca_p[sl] = r_p[k] + v_p[k] * t_star[:, None]
+        v_tca_p[sl] = v_p[k]
+        r_tca[sl] = r_tca_p[sl] + miss
+        v_tca[sl] = v_p[k] + dv_k
+        valid[sl] = ok & (err[:, 0] == 0)
+        if progress is not None:
+            progress(offset + m, n)
+
+    return {
+        "min_distance_km": min_distance,
+        "tca_offset_s": tca_offset,
+        "rel_speed_kms": rel_speed,
+        "r0_teme": r0,
+        "v0_teme": v0,
+        "r_tca_teme": r_tca,
+        "v_tca_teme": v_tca,
+        "r_tca_primary": r_tca_p,
+        "v_tca_primary": v_tca_p,
+        "valid": valid,
+    }
+
+
+__all__ = [
+    "DebrisSpread",
+    "CO_ORBITAL_SPREAD",
+    "FRAGMENTATION_SPREAD",
+    "perturb_elements",
+    "shell_overlaps",
+    "closest_approaches",
+]
@@ -0,0 +1,293 @@
+"""Orbital density map: catalog object counts binned by altitude x inclination.
+
+Each object falls into one cell from its mean elements: mean altitude
+``a - R_E`` (``a`` from the mean motion), inclination and, optionally, a
+third axis with the RAAN or the local time of the ascending node (LTAN) at
+the TLE epoch. Objects above ``alt_max_km`` (or below the surface) are only
+counted in ``out_of_range``.
+
+The counts are maintained incrementally: ``DensityIndex`` keeps the
+element rows it has binned, and each catalog change (a ``TLEStore``
+listener for loads in this process, a generation check for shared
+catalogs updated by another worker) only moves the objects that were
+added, changed or removed between cells. Reads return a snapshot that is
+rebuilt only after the counts changed.
+"""
+from __future__ import annotations
+
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tle_store import ELEMENT_FIELDS, TLERecord, parse_elements
+
+MU_KM3_S2 = 398600.4418
+RE_KM = 6378.137
+
+_INC = ELEMENT_FIELDS.index("inclination_deg")
+_RAAN = ELEMENT_FIELDS.index("raan_deg")
+_MEAN_MOTION = ELEMENT_FIELDS.index("mean_motion_rev_day")
+_EPOCH = ELEMENT_FIELDS.index("epoch_jd")
+# Coloanele care determină celula; restul elementelor nu mută obiectul
+_BIN_COLUMNS = [_EPOCH, _INC, _RAAN, _MEAN_MOTION]
+
+THIRD_AXES = ("none", "raan", "local_time")
+
+
+@dataclass(frozen=True)
+class DensityBins:
+    alt_step_km: float = 50.0
+    alt_max_km: float = 2000.0
+    inc_step_deg: float = 5.0
+    by: str = "none"                # "none" | "raan" | "local_time"
+    raan_step_deg: float = 30.0
+    local_time_step_h: float = 2.0
+
+    def __post_init__(self):
+        if self.by not in THIRD_AXES:
+            raise ValueError(f"Unknown density axis '{self.by}' (use one of {', '.join(THIRD_AXES)}).")
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        n_third = 1
+        if self.by == "raan":
+            n_third = int(math.ceil(360.0 / self.raan_step_deg))
+        elif self.by == "local_time":
+            n_third = int(math.ceil(24.0 / self.local_time_step_h))
+        return (int(math.ceil(self.alt_max_km / self.alt_step_km)),
+                int(math.ceil(180.0 / self.inc_step_deg)),
+                n_third)
+
+    def edges(self) -> Dict[str, List[float]]:
+        n_alt, n_inc, n_third = self.shape
+        out = {
+            "alt_km": [min(k * self.alt_step_km, self.alt_max_km) for k in range(n_alt + 1)],
+            "inc_deg": [min(k * self.inc_step_deg, 180.0) for k in range(n_inc + 1)],
+        }
+        if self.by == "raan":
+            out["raan_deg"] = [min(k * self.raan_step_deg, 360.0) for k in range(n_third + 1)]
+        elif self.by == "local_time":
+            out["local_time_h"] = [min(k * self.local_time_step_h, 24.0) for k in range(n_third + 1)]
+        return out
+
+
+def sun_right_ascension_deg(jd: np.ndarray) -> np.ndarray:
+    """Apparent right ascension of the Sun (low-precision almanac formula, ~0.01 deg)."""
+    n = np.asarray(jd, dtype=float) - 2451545.0
+    mean_lon = np.radians(280.460 + 0.9856474 * n)
+    anomaly = np.radians(357.528 + 0.9856003 * n)
+    ecl_lon = mean_lon + np.radians(1.915) * np.sin(anomaly) + np.radians(0.020) * np.sin(2 * anomaly)
+    obliquity = np.radians(23.439 - 4e-7 * n)
+    return np.degrees(np.arctan2(np.cos(obliquity) * np.sin(ecl_lon), np.cos(ecl_lon))) % 360.0
+
+
+def mean_altitude_km(mean_motion_rev_day: np.ndarray) -> np.ndarray:
+    n_rad_s = np.asarray(mean_motion_rev_day, dtype=float) * (2.0 * math.pi / 86400.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.cbrt(MU_KM3_S2 / (n_rad_s * n_rad_s)) - RE_KM
+
+
+class DensityMap:
+    """Counts for one ``DensityBins`` layout, updated by moving objects between cells."""
+
+    def __init__(self, bins: DensityBins):
+        self.bins = bins
+        self.counts = np.zeros(bins.shape, dtype=np.int64)
+        self.out_of_range = 0
+        self._snapshot: Optional[Dict] = None
+
+    def cells(self, elements: np.ndarray) -> np.ndarray:
+        """Flat cell index of every element row; ``-1`` outside the grid, ``-2`` for unparsable rows."""
+        b = self.bins
+        n_alt, n_inc, n_third = b.shape
+        elements = np.asarray(elements, dtype=float).reshape(-1, len(ELEMENT_FIELDS))
+        alt = mean_altitude_km(elements[:, _MEAN_MOTION])
+        inc = elements[:, _INC]
+        bad = ~(np.isfinite(alt) & np.isfinite(inc))
+        with np.errstate(invalid="ignore"):
+            ia = np.floor(alt / b.alt_step_km)
+            inside = (ia >= 0) & (ia < n_alt) & ~bad
+        ia = np.where(inside, ia, 0).astype(np.int64)
+        ii = np.clip(np.floor(np.nan_to_num(inc) / b.inc_step_deg), 0, n_inc - 1).astype(np.int64)
+
+        if b.by == "raan":
+            it = np.floor(np.nan_to_num(elements[:, _RAAN]) % 360.0 / b.raan_step_deg)
+        elif b.by == "local_time":
+            # LTAN la epoca TLE: unghiul orar al nodului ascendent față de Soare, +12 h
+            ra_sun = sun_right_ascension_deg(np.nan_to_num(elements[:, _EPOCH]))
+            ltan_h = ((np.nan_to_num(elements[:, _RAAN]) - ra_sun) / 15.0 + 12.0) % 24.0
+            it = np.floor(ltan_h / b.local_time_step_h)
+        else:
+            it = np.zeros(len(elements))
+        it = np.clip(it, 0, n_third - 1).astype(np.int64)
+
+        flat = (ia * n_inc + ii) * n_third + it
+        return np.where(bad, -2, np.where(inside, flat, -1))
+
+    def move(self, old_elements: np.ndarray, new_elements: np.ndarray) -> None:
+        """Remove the objects with ``old_elements`` and add those with ``new_elements``."""
+        flat = self.counts.reshape(-1)
+        for rows, sign in ((old_elements, -1), (new_elements, 1)):
+            if not len(rows):
+                continue
+            cells = self.cells(rows)
+            np.add.at(flat, cells[cells >= 0], sign)
+            self.out_of_range += sign * int(np.count_nonzero(cells == -1))
+        self._snapshot = None
+
+    def snapshot(self) -> Dict:
+        """JSON-ready counts; cached until the next ``move``."""
+        if self._snapshot is None:
+            b = self.bins
+            counts = self.counts if b.by != "none" else self.counts[:, :, 0]
+            self._snapshot = {
+                "by": b.by,
+                "edges": b.edges(),
+                "objects": int(self.counts.sum()),
+                "out_of_range": self.out_of_range,
+                "max_count": int(self.counts.max()) if self.counts.size else 0,
+                "counts": counts.tolist(),
+            }
+        return self._snapshot
+
+
+class DensityIndex:
+    """
+    Density maps over a ``TLEStore``, one per requested bin layout (at most
+    ``max_maps``, least recently used dropped), kept in step with the catalog.
+    """
+
+    def __init__(self, store, max_maps: int = 8):
+        self.store = store
+        self.max_maps = max_maps
+        self._lock = threading.Lock()
+        self._maps: "OrderedDict[DensityBins, DensityMap]" = OrderedDict()
+        self._ids = np.empty(0, dtype=np.int64)                 # sortate
+        self._elements = np.empty((0, len(ELEMENT_FIELDS)))
+        self._generation: Optional[int] = None
+        self._loaded = False
+        self.version = 0                                         # crește la fiecare schimbare a catalogului
+        store.add_listener(self._on_catalog_change)
+
+    def _load(self) -> None:
+        ids, elements = self.store.element_arrays()
+        order = np.argsort(ids, kind="stable")
+        self._ids = np.asarray(ids, dtype=np.int64)[order]
+        self._elements = np.array(elements, dtype=float)[order]
+        self._generation = self.store.generation
+        self._loaded = True
+        self.version += 1
+
+    def _lookup(self, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions of ``ids`` in the binned rows and whether each one is there."""
+        pos = np.searchsorted(self._ids, ids)
+        if not len(self._ids):
+            return pos, np.zeros(len(ids), dtype=bool)
+        return pos, (pos < len(self._ids)) & (self._ids[np.minimum(pos, len(self._ids) - 1)] == ids)
+
+    def _apply(self, ids: np.ndarray, elements: np.ndarray, removed: np.ndarray) -> None:
+        """Upsert ``(ids, elements)`` rows and drop ``removed`` ids, moving their counts."""
+        pos, found = self._lookup(ids)
+        prev = np.full_like(elements, np.nan)
+        prev[found] = self._elements[pos[found]]
+        # Obiectele reîncărcate fără schimbări în coloanele relevante rămân în aceeași celulă
+        a, b = prev[:, _BIN_COLUMNS], elements[:, _BIN_COLUMNS]
+        same = found & np.all((a == b) | (np.isnan(a) & np.isnan(b)), axis=1)
+        rpos, rfound = self._lookup(removed)
+
+        old_rows = np.concatenate([prev[found & ~same], self._elements[rpos[rfound]]])
+        new_rows = elements[~same]
+        if len(old_rows) or len(new_rows):
+            self.version += 1
+            for m in self._maps.values():
+                m.move(old_rows, new_rows)
+
+        keep = np.ones(len(self._ids), dtype=bool)
+        keep[pos[found]] = False
+        keep[rpos[rfound]] = False
+        all_ids = np.concatenate([self._ids[keep], ids])
+        order = np.argsort(all_ids, kind="stable")
+        self._ids = all_ids[order]
+        self._elements = np.concatenate([self._elements[keep], elements])[order]
+
+    def _on_catalog_change(self, changed: List[TLERecord], removed: List[int]) -> None:
+        with self._lock:
+            if not self._loaded:
+                return          # nicio hartă încă: prima citire construiește tot
+            ids = np.fromiter((r.norad_id for r in changed), dtype=np.int64, count=len(changed))
+            elements = np.full((len(changed), len(ELEMENT_FIELDS)), np.nan)
+            for i, r in enumerate(changed):
+                try:
+                    elements[i] = parse_elements(r.line1, r.line2)
+                except ValueError:
+                    pass
+            self._apply(ids, elements, np.asarray(removed, dtype=np.int64))
+            self._generation = self.store.generation
+
+    def _sync_shared(self) -> None:
+        """A shared catalog republished by another worker: diff it against the rows binned here."""
+        ids, elements = self.store.element_arrays()
+        ids = np.asarray(ids, dtype=np.int64)
+        self._apply(ids, np.array(elements, dtype=float), np.setdiff1d(self._ids, ids))
+        self._generation = self.store.generation
+
+    def _map(self, bins: DensityBins) -> DensityMap:
+        if not self._loaded:
+            self._load()
+        elif self.store.shared and self.store.generation != self._generation:
+            self._sync_shared()
+        m = self._maps.get(bins)
+        if m is None:
+            m = DensityMap(bins)
+            m.move(np.empty((0, len(ELEMENT_FIELDS))), self._elements)
+            self._maps[bins] = m
+            while len(self._maps) > self.max_maps:
+                self._maps.popitem(last=False)
+        else:
+            self._maps.move_to_end(bins)
+        return m
+
+    def get(self, bins: DensityBins) -> DensityMap:
+        with self._lock:
+            return self._map(bins)
+
+    def snapshot(self, bins: DensityBins) -> Dict:
+        """Counts for ``bins`` plus the index ``version`` they correspond to."""
+        with self._lock:
+            # Construirea hărții poate aplica modificări în așteptare: versiunea se citește după
+            m = self._map(bins)
+            return {"version": self.version, **m.snapshot()}
+
+
+@lru_cache(maxsize=8)
+def flux_grid(bins: DensityBins, size_min_cm: float, size_max_cm: float) -> np.ndarray:
+    """
+    ORDEM-like flux (#/m²/year) at the centre of every altitude x inclination
+    cell (cached; the flux table does not change while the server runs).
+    """
+    from risk import flux_ordem_like
+
+    n_alt, n_inc, _ = bins.shape
+    grid = np.empty((n_alt, n_inc))
+    for ia in range(n_alt):
+        alt = min((ia + 0.5) * bins.alt_step_km, bins.alt_max_km)
+        for ii in range(n_inc):
+            inc = min((ii + 0.5) * bins.inc_step_deg, 180.0)
+            grid[ia, ii] = flux_ordem_like(alt, inc, size_min_cm, size_max_cm)
+    return grid
+
+
+__all__ = [
+    "THIRD_AXES",
+    "DensityBins",
+    "DensityIndex",
+    "DensityMap",
+    "flux_grid",
+    "mean_altitude_km",
+    "sun_right_ascension_deg",
+]
@@ -0,0 +1,311 @@
+"""Interpolating ephemeris cache: SGP4 once per knot, polynomials afterwards.
+
+Each object is propagated with SGP4 on a uniform grid of knots (TEME
+position and velocity). Between two knots the trajectory is the cubic
+Hermite interpolant matching position and velocity at both ends, so any
+time inside the window costs a handful of multiply-adds, vectorised across
+objects and times.
+
+Error bound
+-----------
+For a cubic Hermite segment of length ``h`` the position error is at most
+``h**4 / 384 * max|r''''|``; for a near-circular orbit ``|r''''| ~ n**4 a``,
+i.e. about 0.4 m for LEO with the default 60 s knot spacing (6 m at
+120 s). Rather than
+trusting the estimate (eccentric orbits are worse near perigee), every
+table is checked against direct SGP4 at all segment midpoints, where the
+position error of the interpolant peaks. The measured maximum is kept in
+``max_error_km``; objects above ``tolerance_km`` are flagged and always
+evaluated with SGP4, so results are within ``tolerance_km`` of SGP4 or
+exact. Velocity error is of order ``h**3`` (about 0.1 m/s for LEO at 60 s).
+
+Caching
+-------
+``EphemerisCache`` keys tables by NORAD id and an aligned time bucket of
+``window_s``. A table built for bucket ``k`` spans ``[k W, (k + 2) W]``, so
+every query that starts in the bucket and lasts at most ``W`` is served by
+it, and all objects of a bucket share the same knot grid. Entries carry the
+TLE lines they were built from and are rebuilt when the element set (and so
+its epoch) changes. Queries spanning more than ``W`` are not cached: they
+are evaluated with SGP4 directly unless they ask for more samples than an
+ad-hoc table of the span would cost (knots plus midpoints), so the work
+follows the number of samples, never the length of the span alone.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sgp4.api import Satrec, SatrecArray
+
+from metrics import EPHEMERIS_CACHE, PROPAGATION_SAMPLES
+from propagate import satrec_from_record
+
+_J2000_JD = 2451545.0
+_DAY_S = 86400.0
+
+
+def seconds_since_j2000(t: dt.datetime) -> float:
+    t = t.astimezone(dt.timezone.utc)
+    delta = t - dt.datetime(2000, 1, 1, 12, tzinfo=dt.timezone.utc)
+    return delta.days * _DAY_S + delta.seconds + delta.microseconds * 1e-6
+
+
+def _split_jd(t_s: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Partea întreagă în jd, restul în fr: păstrează precizia de microsecundă
+    days = np.floor(t_s / _DAY_S)
+    return _J2000_JD + days, (t_s - days * _DAY_S) / _DAY_S
+
+
+def _hermite(r0, v0, r1, v1, s, h):
+    """Cubic Hermite position and velocity; ``s`` in [0, 1], ``h`` segment length [s]."""
+    s2 = s * s
+    s3 = s2 * s
+    h00 = 2 * s3 - 3 * s2 + 1
+    h10 = s3 - 2 * s2 + s
+    h01 = -2 * s3 + 3 * s2
+    h11 = s3 - s2
+    r = h00[..., None] * r0 + (h10 * h)[..., None] * v0 + h01[..., None] * r1 + (h11 * h)[..., None] * v1
+    d00 = 6 * s2 - 6 * s
+    d10 = 3 * s2 - 4 * s + 1
+    d11 = 3 * s2 - 2 * s
+    v = (d00 / h)[..., None] * (r0 - r1) + d10[..., None] * v0 + d11[..., None] * v1
+    return r, v
+
+
+@dataclass
+class EphemerisTable:
+    """Hermite knots for a set of objects on one shared time grid."""
+
+    norad_ids: np.ndarray           # (n_obj,)
+    signatures: Tuple[Tuple[str, str], ...]
+    satrecs: List[Satrec]
+    t0_s: float                     # primul nod, secunde de la J2000
+    step_s: float
+    r: np.ndarray                   # (n_obj, n_knots, 3) TEME km
+    v: np.ndarray                   # (n_obj, n_knots, 3) TEME km/s
+    valid: np.ndarray               # (n_obj, n_knots) SGP4 fără eroare
+    max_error_km: np.ndarray        # (n_obj,) eroarea măsurată la mijlocul segmentelor
+    exact: np.ndarray               # (n_obj,) peste toleranță -> evaluare directă SGP4
+
+    @property
+    def t1_s(self) -> float:
+        return self.t0_s + (self.r.shape[1] - 1) * self.step_s
+
+    def covers(self, t_start_s: float, t_end_s: float) -> bool:
+        return self.t0_s <= t_start_s and t_end_s <= self.t1_s
+
+    @classmethod
+    def build(
+        cls,
+        satrecs: Sequence[Satrec],
+        norad_ids: Sequence[int],
+        signatures: Sequence[Tuple[str, str]],
+        t0_s: float,
+        span_s: float,
+        step_s: float = 60.0,
+        tolerance_km: float = 1e-3,
+    ) -> "EphemerisTable":
+        n_knots = int(math.ceil(span_s / step_s)) + 1
+        knots = t0_s + np.arange(n_knots) * step_s
+        mids = knots[:-1] + 0.5 * step_s
+        jd, fr = _split_jd(np.concatenate([knots, mids]))
+        err, r_all, v_all = SatrecArray(list(satrecs)).sgp4(jd, fr)
+        PROPAGATION_SAMPLES.inc(("ephemeris",), err.size)
+
+        r, v = r_all[:, :n_knots], v_all[:, :n_knots]
+        valid = err[:, :n_knots] == 0
+        r_mid, _ = _hermite(r[:, :-1], v[:, :-1], r[:, 1:], v[:, 1:], np.full(n_knots - 1, 0.5), step_s)
+        diff = np.linalg.norm(r_mid - r_all[:, n_knots:], axis=-1)
+        ok_mid = valid[:, :-1] & valid[:, 1:] & (err[:, n_knots:] == 0)
+        max_error = np.where(ok_mid, diff, 0.0).max(axis=1) if n_knots > 1 else np.zeros(len(satrecs))
+        return cls(
+            norad_ids=np.asarray(norad_ids, dtype=np.int64),
+            signatures=tuple(signatures),
+            satrecs=list(satrecs),
+            t0_s=float(t0_s),
+            step_s=float(step_s),
+            r=r,
+            v=v,
+            valid=valid,
+            max_error_km=max_error,
+            exact=max_error > tolerance_km,
+        )
+
+    def evaluate(self, t_s: np.ndarray, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Position/velocity of ``rows`` (default: all objects) at times ``t_s``
+        (seconds since J2000, inside the table span).
+
+        Returns ``r``, ``v`` with shape ``(n_rows, n_t, 3)`` and a validity
+        mask ``(n_rows, n_t)``.
+        """
+        t_s = np.asarray(t_s, dtype=float)
+        rows = np.arange(len(self.norad_ids)) if rows is None else np.asarray(rows)
+        x = (t_s - self.t0_s) / self.step_s
+        k = np.clip(np.floor(x).astype(np.int64), 0, self.r.shape[1] - 2)
+        s = x - k
+        rr = self.r[rows]
+        vv = self.v[rows]
+        r, v = _hermite(rr[:, k], vv[:, k], rr[:, k + 1], vv[:, k + 1], s, self.step_s)
+        ok = self.valid[rows][:, k] & self.valid[rows][:, k + 1]
+
+        exact = np.flatnonzero(self.exact[rows])
+        if len(exact):
+            jd, fr = _split_jd(t_s)
+            for i in exact:
+                e, r_e, v_e = self.satrecs[rows[i]].sgp4_array(jd, fr)
+                r[i], v[i], ok[i] = r_e, v_e, e == 0
+        PROPAGATION_SAMPLES.inc(("interpolated",), ok.size)
+        return r, v, ok
+
+
+class EphemerisCache:
+    """Per-object interpolating ephemerides over rolling, bucket-aligned windows."""
+
+    def __init__(
+        self,
+        window_s: float = 6 * 3600.0,
+        step_s: float = 60.0,
+        tolerance_km: float = 1e-3,
+        max_objects: int = 2048,
+    ):
+        self.window_s = window_s
+        self.step_s = step_s
+        self.tolerance_km = tolerance_km
+        self.max_objects = max_objects
+        self._entries: "OrderedDict[Tuple[int, int], Tuple[EphemerisTable, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _lookup(self, records, bucket: int) -> Tuple[List[Optional[Tuple[EphemerisTable, int]]], List[int]]:
+        found: List[Optional[Tuple[EphemerisTable, int]]] = []
+        missing: List[int] = []
+        with self._lock:
+            for i, rec in enumerate(records):
+                key = (rec.norad_id, bucket)
+                entry = self._entries.get(key)
+                if entry is not None and entry[0].signatures[entry[1]] == (rec.line1, rec.line2):
+                    self._entries.move_to_end(key)
+                    EPHEMERIS_CACHE.inc(("hit",))
+                    found.append(entry)
+                else:
+                    EPHEMERIS_CACHE.inc(("miss" if entry is None else "stale",))
+                    found.append(None)
+                    missing.append(i)
+        return found, missing
+
+    def _build(self, records, t0_s: float, span_s: float) -> EphemerisTable:
+        return EphemerisTable.build(
+            [satrec_from_record(r) for r in records],
+            [r.norad_id for r in records],
+            [(r.line1, r.line2) for r in records],
+            t0_s, span_s, self.step_s, self.tolerance_km,
+        )
+
+    def tables(self, records, t_start_s: float, t_end_s: float) -> List[Tuple[EphemerisTable, int]]:
+        """``(table, row)`` per record, covering ``[t_start_s, t_end_s]``."""
+        if t_end_s - t_start_s > self.window_s:
+            # Mai lung decât o fereastră: tabel ad-hoc, necache-uit
+            table = self._build(records, t_start_s, t_end_s - t_start_s)
+            return [(table, i) for i in range(len(records))]
+
+        bucket = int(math.floor(t_start_s / self.window_s))
+        found, missing = self._lookup(records, bucket)
+        if missing:
+            built = self._build([records[i] for i in missing], bucket * self.window_s, 2 * self.window_s)
+            with self._lock:
+                for row, i in enumerate(missing):
+                    found[i] = (built, row)
+                    self._entries[(records[i].norad_id, bucket)] = (built, row)
+                while len(self._entries) > self.max_objects:
+                    self._entries.popitem(last=False)
+        return found  # type: ignore[return-value]
+
+    def evaluate(self, records, t_s: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        TEME ``r``, ``v`` of every record at times ``t_s`` (seconds since
+        J2000), shape ``(n_records, n_t, 3)``, plus the validity mask.
+        """
+        t_s = np.asarray(t_s, dtype=float)
+        r = np.empty((len(records), len(t_s), 3))
+        v = np.empty_like(r)
+        ok = np.zeros((len(records), len(t_s)), dtype=bool)
+        if not len(records) or not len(t_s):
+            return r, v, ok
+        span_s = float(t_s.max() - t_s.min())
+        # Un tabel ad-hoc costă noduri + mijloace; sub atât, SGP4 direct pe momentele cerute e mai ieftin
+        if span_s > self.window_s and len(t_s) < 2 * int(math.ceil(span_s / self.step_s)) + 1:
+            jd, fr = _split_jd(t_s)
+            err, r, v = SatrecArray([satrec_from_record(rec) for rec in records]).sgp4(jd, fr)
+            PROPAGATION_SAMPLES.inc(("ephemeris_direct",), err.size)
+            return r, v, err == 0
+        entries = self.tables(records, float(t_s.min()), float(t_s.max()))
+
+        groups: Dict[int, Tuple[EphemerisTable, List[int], List[int]]] = {}
+        for i, (table, row) in enumerate(entries):
+            g = groups.setdefault(id(table), (table, [], []))
+            g[1].append(i)
+            g[2].append(row)
+        for table, idx, rows in groups.values():
+            r[idx], v[idx], ok[idx] = table.evaluate(t_s, np.asarray(rows))
+        return r, v, ok
+
+    def geodetic_samples(self, record, start_time_utc: dt.datetime, minutes: int = 120, step_seconds: int = 60) -> List[Dict]:
+        """Drop-in for ``propagate.propagate_positions`` served from the cache."""
+        return self.samples(record, start_time_utc, minutes=minutes, step_seconds=step_seconds)
+
+    def samples(self, record, start_time_utc: dt.datetime, minutes: int = 120, step_seconds: int = 60,
+                frame: str = "geodetic") -> List[Dict]:
+        """Same output as ``propagate.propagate_positions(..., frame=frame)``, served from the cache."""
+        from frames import teme_to_geodetic
+        from propagate import convert_teme, state_samples
+
+        steps = max(1, int((minutes * 60) // step_seconds))
+        offsets = np.arange(steps + 1, dtype=float) * step_seconds
+        t_s = seconds_since_j2000(start_time_utc) + offsets
+        r, v, ok = self.evaluate([record], t_s)
+        jd, fr = _split_jd(t_s)
+        if frame != "geodetic":
+            r_f, v_f = convert_teme(r[0], v[0], jd, fr, frame)
+            return state_samples(start_time_utc, step_seconds, r_f, v_f, ok[0])
+
+        lat, lon, alt = teme_to_geodetic(r[0], jd, fr)
+        samples = []
+        for k in range(len(t_s)):
+            if not ok[0, k]:
+                continue
+            t = start_time_utc + dt.timedelta(seconds=float(offsets[k]))
+            samples.append({
+                "t": t.isoformat().replace("+00:00", "Z"),
+                "lat_deg": float(lat[k]),
+                "lon_deg": float(lon[k]),
+                "alt_km": float(alt[k]),
+            })
+        return samples
+
+
+@lru_cache(maxsize=1)
+def get_ephemeris_cache() -> EphemerisCache:
+    """Process-wide cache (created on first use)."""
+    return EphemerisCache()
+
+
+__all__ = [
+    "EphemerisCache",
+    "EphemerisTable",
+    "get_ephemeris_cache",
+    "seconds_since_j2000",
+]
@@ -0,0 +1,130 @@
+"""Vectorised reference-frame helpers for raw SGP4 (TEME) output."""
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+# WGS84 ellipsoid
+WGS84_A_KM = 6378.137
+WGS84_F = 1.0 / 298.257223563
+WGS84_E2 = WGS84_F * (2.0 - WGS84_F)
+
+_T0 = 2451545.0
+_DAY_S = 86400.0
+
+
+def gmst82(jd_ut1, fr=0.0):
+    """Greenwich mean sidereal angle (IAU-82, as used by SGP4) in radians.
+
+    Returns ``(theta, theta_dot)`` with ``theta_dot`` in radians per second.
+    Accepts scalars or NumPy arrays.
+    """
+    jd_ut1 = np.asarray(jd_ut1, dtype=float)
+    fr = np.asarray(fr, dtype=float)
+    t = (jd_ut1 - _T0 + fr) / 36525.0
+    g = 67310.54841 + (8640184.812866 + (0.093104 + (-6.2e-6) * t) * t) * t
+    dg = 8640184.812866 + (0.093104 * 2.0 + (-6.2e-6 * 3.0) * t) * t
+    theta = (jd_ut1 % 1.0 + fr + g / _DAY_S % 1.0) % 1.0 * (2.0 * math.pi)
+    theta_dot = (1.0 + dg / (_DAY_S * 36525.0)) * (2.0 * math.pi) / _DAY_S
+    return theta, theta_dot
+
+
+def teme_to_itrf(r_teme, v_teme, jd, fr):
+    """Rotate TEME position/velocity (km, km/s) into the Earth-fixed frame.
+
+    ``r_teme``/``v_teme`` have shape ``(..., 3)``; ``jd``/``fr`` must
+    broadcast against ``r_teme.shape[:-1]``. Polar motion is ignored.
+    """
+    r_teme = np.asarray(r_teme, dtype=float)
+    v_teme = np.asarray(v_teme, dtype=float)
+    theta, theta_dot = gmst82(jd, fr)
+    c = np.cos(theta)
+    s = np.sin(theta)
+
+    x = c * r_teme[..., 0] + s * r_teme[..., 1]
+    y = -s * r_teme[..., 0] + c * r_teme[..., 1]
+    r_itrf = np.stack([x, y, r_teme[..., 2]], axis=-1)
+
+    vx = c * v_teme[..., 0] + s * v_teme[..., 1] + theta_dot * y
+    vy = -s * v_teme[..., 0] + c * v_teme[..., 1] - theta_dot * x
+    v_itrf = np.stack([vx, vy, v_teme[..., 2]], axis=-1)
+    return r_itrf, v_itrf
+
+
+def itrf_to_geodetic(r_itrf):
+    """Convert Earth-fixed cartesian positions (km) to WGS84 geodetic.
+
+    Returns ``(lat_deg, lon_deg, alt_km)`` arrays shaped like ``r_itrf[..., 0]``.
+    """
+    r_itrf = np.asarray(r_itrf, dtype=float)
+    x = r_itrf[..., 0]
+    y = r_itrf[..., 1]
+    z = r_itrf[..., 2]
+    p = np.hypot(x, y)
+    lon = np.arctan2(y, x)
+
+    lat = np.arctan2(z, p * (1.0 - WGS84_E2))
+    for _ in range(4):
+        sin_lat = np.sin(lat)
+        n = WGS84_A_KM / np.sqrt(1.0 - WGS84_E2 * sin_lat * sin_lat)
+        lat = np.arctan2(z + n * WGS84_E2 * sin_lat, p)
+
+    sin_lat = np.sin(lat)
+    cos_lat = np.cos(lat)
+    n = WGS84_A_KM / np.sqrt(1.0 - WGS84_E2 * sin_lat * sin_lat)
+    # Formula stabilă și la latitudini mari (evită împărțirea la cos(lat) ~ 0)
+    alt = p * cos_lat + z * sin_lat - n * (1.0 - WGS84_E2 * sin_lat * sin_lat)
+    return np.degrees(lat), np.degrees(lon), alt
+
+
+def teme_to_geodetic(r_teme, jd, fr):
+    """Shortcut: TEME positions straight to ``(lat_deg, lon_deg, alt_km)``."""
+    r_teme = np.asarray(r_teme, dtype=float)
+    r_itrf, _ = teme_to_itrf(r_teme, np.zeros_like(r_teme), jd, fr)
+    return itrf_to_geodetic(r_itrf)
+
+
+def geodetic_to_itrf(lat_deg, lon_deg, alt_km):
+    """WGS84 geodetic coordinates to Earth-fixed cartesian (km), shape ``(..., 3)``."""
+    lat = np.radians(np.asarray(lat_deg, dtype=float))
+    lon = np.radians(np.asarray(lon_deg, dtype=float))
+    alt_km = np.asarray(alt_km, dtype=float)
+    sin_lat = np.sin(lat)
+    n = WGS84_A_KM / np.sqrt(1.0 - WGS84_E2 * sin_lat * sin_lat)
+    x = (n + alt_km) * np.cos(lat) * np.cos(lon)
+    y = (n + alt_km) * np.cos(lat) * np.sin(lon)
+    z = (n * (1.0 - WGS84_E2) + alt_km) * sin_lat
+    return np.stack(np.broadcast_arrays(x, y, z), axis=-1)
+
+
+def itrf_to_topocentric(r_itrf, lat_deg, lon_deg, alt_km):
+    """Look angles from a ground observer to Earth-fixed positions.
+
+    Returns ``(azimuth_deg, elevation_deg, range_km)`` shaped like
+    ``r_itrf[..., 0]``; azimuth is measured from north through east.
+    """
+    r_itrf = np.asarray(r_itrf, dtype=float)
+    d = r_itrf - geodetic_to_itrf(lat_deg, lon_deg, alt_km)
+    lat = math.radians(lat_deg)
+    lon = math.radians(lon_deg)
+    sl, cl = math.sin(lat), math.cos(lat)
+    so, co = math.sin(lon), math.cos(lon)
+    east = -so * d[..., 0] + co * d[..., 1]
+    north = -sl * co * d[..., 0] - sl * so * d[..., 1] + cl * d[..., 2]
+    up = cl * co * d[..., 0] + cl * so * d[..., 1] + sl * d[..., 2]
+    horizontal = np.hypot(east, north)
+    elevation = np.degrees(np.arctan2(up, horizontal))
+    azimuth = np.degrees(np.arctan2(east, north)) % 360.0
+    return azimuth, elevation, np.hypot(horizontal, up)
+
+
+__all__ = [
+    "WGS84_A_KM",
+    "gmst82",
+    "teme_to_itrf",
+    "itrf_to_geodetic",
+    "teme_to_geodetic",
+    "geodetic_to_itrf",
+    "itrf_to_topocentric",
+]
@@ -0,0 +1,201 @@
+"""Ground-track level of detail: antimeridian splitting and Douglas–Peucker.
+
+A propagated ground track is cut into segments wherever it crosses the
+antimeridian (with an interpolated point on both sides of the cut, so each
+polyline ends exactly on +/-180 deg) or has an SGP4 gap. Each segment is
+then ranked with the Douglas–Peucker recursion, run once and breadth-first
+over all open intervals with NumPy: every interior point gets the
+angular distance (great circle, degrees) at which it was selected, capped
+by the distance of the point that opened its interval. With that cap the
+ranking is nested, so
+
+* the points ranked above ``tolerance_deg`` are exactly the Douglas–Peucker
+  simplification for that tolerance;
+* the ``max_points`` highest-ranked points are the best simplification
+  within a point budget;
+
+and any number of zoom levels come out of one ranking by thresholding it.
+Segment end points always stay.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Lățimea unei dale Web Mercator la zoom 0, în pixeli
+TILE_SIZE_PX = 256
+
+
+@dataclass
+class TrackSegment:
+    t_s: np.ndarray          # secunde de la începutul ferestrei
+    lat_deg: np.ndarray
+    lon_deg: np.ndarray
+    rank_deg: Optional[np.ndarray] = None
+
+
+def tolerance_for_zoom(zoom: float, pixel_tolerance: float = 0.5) -> float:
+    """Angular tolerance (deg) of ``pixel_tolerance`` pixels at a Web Mercator zoom level (equator)."""
+    return pixel_tolerance * 360.0 / (TILE_SIZE_PX * 2.0 ** zoom)
+
+
+def split_antimeridian(t_s: np.ndarray, lat_deg: np.ndarray, lon_deg: np.ndarray,
+                       ok: Optional[np.ndarray] = None) -> List[TrackSegment]:
+    """
+    Cut the track where consecutive samples jump by more than 180 deg in
+    longitude or where ``ok`` is false. A crossing adds the interpolated
+    point at +/-180 deg to the end of one segment and the start of the next.
+    """
+    t_s = np.asarray(t_s, dtype=float)
+    lat = np.asarray(lat_deg, dtype=float)
+    lon = np.asarray(lon_deg, dtype=float)
+    if ok is None:
+        ok = np.isfinite(lat) & np.isfinite(lon)
+
+    segments: List[TrackSegment] = []
+    # Porțiuni continue fără erori SGP4
+    edges = np.flatnonzero(np.diff(np.r_[0, ok.astype(np.int8), 0]))
+    for start, stop in zip(edges[::2], edges[1::2]):
+        ts, la, lo = t_s[start:stop], lat[start:stop], lon[start:stop]
+        dlon = np.diff(lo)
+        cuts = np.flatnonzero(np.abs(dlon) > 180.0)
+        if not len(cuts):
+            segments.append(TrackSegment(ts, la, lo))
+            continue
+        # Punctul de traversare, pe longitudinea desfășurată
+        side = np.where(dlon[cuts] < 0, 180.0, -180.0)            # vest -> est trece prin +180
+        lon_next = lo[cuts + 1] + 2.0 * side
+        f = (side - lo[cuts]) / (lon_next - lo[cuts])
+        lat_c = la[cuts] + f * (la[cuts + 1] - la[cuts])
+        t_c = ts[cuts] + f * (ts[cuts + 1] - ts[cuts])
+
+        bounds = np.r_[0, cuts + 1, len(ts)]
+        for j in range(len(bounds) - 1):
+            a, b = bounds[j], bounds[j + 1]
+            seg_t, seg_lat, seg_lon = [ts[a:b]], [la[a:b]], [lo[a:b]]
+            if j > 0:                                              # intrare prin partea opusă
+                seg_t.insert(0, t_c[j - 1:j])
+                seg_lat.insert(0, lat_c[j - 1:j])
+                seg_lon.insert(0, -side[j - 1:j])
+            if j < len(cuts):                                      # ieșire pe antimeridian
+                seg_t.append(t_c[j:j + 1])
+                seg_lat.append(lat_c[j:j + 1])
+                seg_lon.append(side[j:j + 1])
+            segments.append(TrackSegment(np.concatenate(seg_t), np.concatenate(seg_lat), np.concatenate(seg_lon)))
+    return segments
+
+
+def _unit_vectors(lat_deg: np.ndarray, lon_deg: np.ndarray) -> np.ndarray:
+    lat = np.radians(lat_deg)
+    lon = np.radians(lon_deg)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def _angle(u: np.ndarray, w: np.ndarray) -> np.ndarray:
+    return np.arctan2(np.linalg.norm(np.cross(u, w), axis=-1), np.einsum("ij,ij->i", u, w))
+
+
+def _arc_distance(p: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Angle (rad) from each ``p`` to the great-circle arc ``a``-``b`` (all unit vectors, ``(n, 3)``)."""
+    normal = np.cross(a, b)
+    norm = np.linalg.norm(normal, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n_hat = normal / norm[:, None]
+        cross_track = np.abs(np.arcsin(np.clip(np.einsum("ij,ij->i", p, n_hat), -1.0, 1.0)))
+    # Piciorul perpendicularei cade pe arc doar între capete; altfel distanța până la capătul cel mai apropiat
+    within = (np.einsum("ij,ij->i", np.cross(a, p), normal) >= 0) & (np.einsum("ij,ij->i", np.cross(p, b), normal) >= 0)
+    to_end = np.minimum(_angle(p, a), _angle(p, b))
+    return np.where((norm > 1e-12) & within, cross_track, to_end)
+
+
+def _rank(xyz: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Ranks for the polylines ``xyz[starts[k]:ends[k] + 1]``, all processed together."""
+    rank = np.zeros(len(xyz))
+    rank[starts] = np.inf
+    rank[ends] = np.inf
+    caps = np.full(len(starts), np.inf)
+    # Toate intervalele deschise ale unui nivel de recursie, evaluate împreună
+    while len(starts):
+        inner = ends - starts - 1
+        keep = inner > 0
+        starts, ends, caps, inner = starts[keep], ends[keep], caps[keep], inner[keep]
+        if not len(starts):
+            break
+        owner = np.repeat(np.arange(len(starts)), inner)
+        first = np.cumsum(inner) - inner
+        idx = np.arange(len(owner)) - first[owner] + starts[owner] + 1
+        d = _arc_distance(xyz[idx], xyz[starts[owner]], xyz[ends[owner]])
+        # Maximul pe interval: sortare după (interval, -distanță), primul din fiecare grup
+        order = np.lexsort((-d, owner))
+        best = order[first]
+        split = idx[best]
+        rank[split] = np.minimum(np.degrees(d[best]), caps)
+        starts, ends, caps = (np.concatenate([starts, split]), np.concatenate([split, ends]),
+                              np.concatenate([rank[split], rank[split]]))
+    return rank
+
+
+def rank_points(lat_deg: np.ndarray, lon_deg: np.ndarray) -> np.ndarray:
+    """
+    Douglas–Peucker rank (deg) of every point of one polyline; end points
+    get ``inf``. Keeping the points with rank above ``tol`` is the
+    Douglas–Peucker simplification with tolerance ``tol``.
+    """
+    n = len(lat_deg)
+    if n == 0:
+        return np.zeros(0)
+    xyz = _unit_vectors(np.asarray(lat_deg, dtype=float), np.asarray(lon_deg, dtype=float))
+    return _rank(xyz, np.array([0]), np.array([n - 1]))
+
+
+def rank_segments(segments: Sequence[TrackSegment]) -> List[TrackSegment]:
+    """Set ``rank_deg`` on every segment (one vectorised pass over all of them)."""
+    segments = [seg for seg in segments if len(seg.t_s)]
+    if not segments:
+        return []
+    lengths = np.array([len(seg.t_s) for seg in segments])
+    starts = np.cumsum(lengths) - lengths
+    xyz = _unit_vectors(np.concatenate([seg.lat_deg for seg in segments]),
+                        np.concatenate([seg.lon_deg for seg in segments]))
+    rank = _rank(xyz, starts, starts + lengths - 1)
+    for seg, a, n in zip(segments, starts, lengths):
+        seg.rank_deg = rank[a:a + n]
+    return segments
+
+
+def budget_threshold(segments: Sequence[TrackSegment], max_points: int) -> float:
+    """Rank threshold that keeps at most ``max_points`` points (segment end points always count)."""
+    ranks = np.concatenate([s.rank_deg for s in segments]) if segments else np.empty(0)
+    if len(ranks) <= max_points:
+        return -1.0
+    # Punctele cu rang egal cu pragul nu se păstrează
+    return float(np.sort(ranks)[::-1][max(max_points, 0)])
+
+
+def simplify(segments: Sequence[TrackSegment], threshold_deg: float, t_decimals: int = 1,
+             decimals: int = 4) -> Dict:
+    """JSON level with the points ranked strictly above ``threshold_deg``."""
+    out = []
+    points = 0
+    for seg in segments:
+        keep = (seg.rank_deg > threshold_deg) | np.isinf(seg.rank_deg)
+        points += int(np.count_nonzero(keep))
+        out.append({
+            "t_s": np.round(seg.t_s[keep], t_decimals).tolist(),
+            "lat_deg": np.round(seg.lat_deg[keep], decimals).tolist(),
+            "lon_deg": np.round(seg.lon_deg[keep], decimals).tolist(),
+        })
+    return {"points": points, "segments": out}
+
+
+__all__ = [
+    "TrackSegment",
+    "budget_threshold",
+    "rank_points",
+    "rank_segments",
+    "simplify",
+    "split_antimeridian",
+    "tolerance_for_zoom",
+]
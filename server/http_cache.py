@@ -0,0 +1,156 @@
+"""Request coalescing and HTTP conditional caching for read endpoints.
+
+``cached_json_response`` wraps an endpoint's computation:
+
+* The ETag is a hash of the route, the request parameters (minus the
+  profiling ones) and whatever version information the endpoint passes in (TLE lines, catalog
+  generation). If the client's ``If-None-Match`` matches, a ``304`` is
+  returned without computing anything.
+* Otherwise the computation runs under ``SingleFlight``: concurrent
+  requests with the same ETag wait for the first one and share its
+  already-serialised body instead of recomputing.
+
+Endpoints that default to "now" use ``quantized_now`` so that requests
+arriving within the same ``NOW_QUANTUM_S`` seconds are identical (same
+ETag, coalescable) and can be cached by the browser until the quantum ends.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from metrics import HTTP_CACHE
+from profiling import PROFILE_QUERY_PARAMS
+
+NOW_QUANTUM_S = 10
+
+
+class _Call:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Share one in-flight computation between concurrent callers with the same key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run ``fn`` (or wait for the running one); returns ``(value, shared)``."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+        try:
+            call.value = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.value, False
+
+
+_FLIGHTS = SingleFlight()
+
+
+def quantized_now(quantum_s: int = NOW_QUANTUM_S) -> dt.datetime:
+    """Current UTC time floored to a multiple of ``quantum_s`` seconds."""
+    now = dt.datetime.now(dt.timezone.utc)
+    ts = int(now.timestamp()) // quantum_s * quantum_s
+    return dt.datetime.fromtimestamp(ts, dt.timezone.utc)
+
+
+def seconds_left_in_quantum(quantum_s: int = NOW_QUANTUM_S) -> int:
+    now = dt.datetime.now(dt.timezone.utc).timestamp()
+    return max(0, int(quantum_s - now % quantum_s))
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        # Comparație slabă (RFC 9110): W/"x" este echivalent cu "x"
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _render(content: Any) -> bytes:
+    # Aceeași serializare ca JSONResponse din Starlette
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def cached_json_response(
+    request: Request,
+    version: Tuple[Any, ...],
+    compute: Callable[[], Any],
+    max_age: Optional[int] = None,
+) -> Response:
+    """
+    Serve ``compute()`` as JSON with an ETag derived from the route, the
+    query parameters and ``version``.
+
+    ``max_age=None`` sends ``Cache-Control: no-cache`` (always revalidate,
+    for results that only change when the data changes); an integer lets
+    clients reuse the response for that many seconds.
+    """
+    # Parametrii de profilare nu schimbă răspunsul: cererea profilată revalidează ca una obișnuită
+    params = sorted(kv for kv in request.query_params.multi_items() if kv[0] not in PROFILE_QUERY_PARAMS)
+    etag = make_etag(request.url.path, params, version)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache" if max_age is None else f"public, max-age={max_age}",
+    }
+    if etag_matches(request, etag):
+        HTTP_CACHE.inc(("not_modified",))
+        return Response(status_code=304, headers=headers)
+
+    body, shared = _FLIGHTS.do(etag, lambda: _render(compute()))
+    HTTP_CACHE.inc(("coalesced" if shared else "computed",))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+__all__ = [
+    "NOW_QUANTUM_S",
+    "SingleFlight",
+    "cached_json_response",
+    "etag_matches",
+    "make_etag",
+    "quantized_now",
+    "seconds_left_in_quantum",
+]
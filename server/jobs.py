@@ -0,0 +1,434 @@
+"""Background jobs for analyses that do not fit a single request.
+
+A job is a registered function run on a bounded pool of worker threads fed
+by a priority queue (lower number = runs first, FIFO within a priority).
+The function receives its parameters plus a ``JobContext`` used to report
+progress and to notice cancellation, and returns a dict whose ``items``
+list is the pageable part of the result; every other key is a summary.
+
+State lives in ``<directory>/<job_id>.json`` (metadata, rewritten on state
+changes and at most once per second for progress) and the result in
+``<job_id>.result.json``, written atomically. On start-up, jobs that were
+queued or running when the process stopped are queued again; finished
+results are served from disk. Metadata is re-read from disk for jobs this
+process does not own, so any uvicorn worker can report on any job, and
+cancellation goes through a ``<job_id>.cancel`` marker file for the same
+reason.
+"""
+from __future__ import annotations
+
+import heapq
+import inspect
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "jobs"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+# Cât timp un lacăt fără PID (abia creat) e considerat valid
+_LOCK_PID_GRACE_S = 5.0
+
+
+def _pid_alive(pid: int) -> bool:
+    """Whether process ``pid`` exists, without signalling it (``os.kill`` terminates it on Windows)."""
+    if pid <= 0:
+        return False
+    if os.name == "nt":
+        import ctypes
+
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        handle = kernel32.OpenProcess(0x1000, False, pid)   # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return ctypes.get_last_error() == 5                # ERROR_ACCESS_DENIED: există, alt utilizator
+        try:
+            code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+                return True
+            return code.value == 259                           # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function when cancellation was requested."""
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    params: Dict[str, Any]
+    priority: int = 5
+    status: str = QUEUED
+    progress: float = 0.0
+    message: str = ""
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    total_items: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class JobContext:
+    """Handle passed to job functions for progress reporting and cancellation."""
+
+    def __init__(self, manager: "JobManager", job: Job):
+        self._manager = manager
+        self._job = job
+        self._cancel = threading.Event()
+        self._last_check = 0.0
+
+    def progress(self, done: float, total: float, message: str = "") -> None:
+        """Report ``done`` out of ``total``; raises ``JobCancelled`` if cancelled."""
+        self._job.progress = min(1.0, done / total) if total else 0.0
+        if message:
+            self._job.message = message
+        self._manager._persist(self._job, throttle=True)
+        self.check_cancelled()
+
+    def cancelled(self) -> bool:
+        if self._cancel.is_set():
+            return True
+        now = time.monotonic()
+        if now - self._last_check >= 0.5:
+            # Anularea poate veni de la alt worker uvicorn, prin fișierul marker
+            self._last_check = now
+            if os.path.exists(self._manager._path(self._job.id, ".cancel")):
+                self._cancel.set()
+        return self._cancel.is_set()
+
+    def check_cancelled(self) -> None:
+        if self.cancelled():
+            raise JobCancelled()
+
+
+class JobManager:
+    def __init__(self, directory: str = _DEFAULT_DIR, workers: int = 2, result_cache: int = 8):
+        self.directory = directory
+        self.workers = max(1, workers)
+        self._kinds: Dict[str, Callable[..., Dict[str, Any]]] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._contexts: Dict[str, JobContext] = {}
+        self._heap: List[Tuple[int, int, str]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._started = False
+        self._stopping = False
+        self._last_persist: Dict[str, float] = {}
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._result_cache = result_cache
+
+    # -- înregistrare și pornire --------------------------------------------
+
+    def register(self, kind: str, fn: Callable[..., Dict[str, Any]]) -> None:
+        """Register ``fn(ctx, **params)`` as job kind ``kind``."""
+        self._kinds[kind] = fn
+
+    @property
+    def kinds(self) -> List[str]:
+        return sorted(self._kinds)
+
+    def start(self) -> None:
+        """Start the worker threads and re-queue jobs interrupted by a restart."""
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+            self._stopping = False
+        os.makedirs(self.directory, exist_ok=True)
+        for job in self._load_all():
+            if job.status in (QUEUED, RUNNING):
+                job.status, job.progress, job.started_at = QUEUED, 0.0, None
+                self._enqueue(job)
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        with self._cond:
+            self._stopping = True
+            for ctx in self._contexts.values():
+                ctx._cancel.set()
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads.clear()
+        self._started = False
+
+    # -- API publică ----------------------------------------------------------
+
+    def submit(self, kind: str, params: Optional[Dict[str, Any]] = None, priority: int = 5) -> Job:
+        """
+        Queue a job. Raises ``KeyError`` for an unknown kind and ``TypeError``
+        when ``params`` do not match the job function's signature.
+        """
+        fn = self._kinds[kind]
+        params = dict(params or {})
+        inspect.signature(fn).bind(None, **params)
+        self.start()
+        job = Job(id=uuid.uuid4().hex[:16], kind=kind, params=params, priority=priority)
+        self._enqueue(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        # Joburile altor procese (alți worker-i uvicorn) sunt citite de pe disc
+        return self._jobs.get(job_id) or self._load(job_id)
+
+    def list(self, limit: int = 100) -> List[Job]:
+        jobs = {j.id: j for j in self._load_all()}
+        jobs.update(self._jobs)
+        return sorted(jobs.values(), key=lambda j: j.created_at, reverse=True)[:limit]
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if job_id in self._results:
+            self._results.move_to_end(job_id)
+            return self._results[job_id]
+        try:
+            with open(self._path(job_id, ".result.json"), "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._remember(job_id, result)
+        return result
+
+    def page(self, job_id: str, offset: int = 0, limit: int = 100) -> Tuple[Dict[str, Any], List[Any]]:
+        """``(summary, items[offset:offset + limit])`` of a finished job."""
+        result = self.result(job_id) or {}
+        summary = {k: v for k, v in result.items() if k != "items"}
+        return summary, result.get("items", [])[offset:offset + limit]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a queued or running job. Finished jobs are deleted together
+        with their results. Returns the job (``None`` if unknown).
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.status in FINISHED:
+            self._delete(job_id)
+            return job
+        with self._cond:
+            ctx = self._contexts.get(job_id)
+            if ctx is not None:
+                ctx._cancel.set()
+            elif job_id in self._jobs and job.status == QUEUED:
+                job.status, job.finished_at = CANCELLED, time.time()
+                self._persist(job)
+                return job
+        # Rulează aici sau în alt proces: marker-ul e verificat de JobContext
+        with open(self._path(job_id, ".cancel"), "w", encoding="utf-8") as f:
+            f.write(str(time.time()))
+        return job
+
+    # -- execuție ------------------------------------------------------------
+
+    def _enqueue(self, job: Job) -> None:
+        with self._cond:
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (job.priority, next(self._seq), job.id))
+            self._persist(job)
+            self._cond.notify()
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                _, _, job_id = heapq.heappop(self._heap)
+                job = self._jobs[job_id]
+                if job.status != QUEUED:
+                    continue  # anulat cât timp era în coadă
+                if not self._claim(job):
+                    continue
+                ctx = JobContext(self, job)
+                self._contexts[job_id] = ctx
+                job.status, job.started_at = RUNNING, time.time()
+            self._persist(job)
+            self._run(job, ctx)
+
+    def _run(self, job: Job, ctx: JobContext) -> None:
+        try:
+            result = self._kinds[job.kind](ctx, **job.params)
+            ctx.check_cancelled()
+            self._write_json(self._path(job.id, ".result.json"), result)
+            self._remember(job.id, result)
+            job.total_items = len(result.get("items", []))
+            job.status, job.progress = SUCCEEDED, 1.0
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            job.status, job.error = FAILED, str(getattr(exc, "detail", None) or exc)
+        finally:
+            job.finished_at = time.time()
+            with self._cond:
+                self._contexts.pop(job.id, None)
+            if job.status == CANCELLED and self._stopping:
+                # Oprit de shutdown, nu de utilizator: reia la următoarea pornire
+                job.status, job.finished_at = QUEUED, None
+            self._persist(job)
+            self._release(job.id)
+
+    def _claim(self, job: Job) -> bool:
+        """
+        Take exclusive ownership of ``job`` across processes (``.lock`` file
+        created with O_EXCL). Every worker re-queues interrupted jobs on
+        start-up; only the first claimant runs each of them.
+        """
+        path = self._path(job.id, ".lock")
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self._lock_alive(path):
+                    self._jobs.pop(job.id, None)
+                    return False
+                try:
+                    os.remove(path)  # lacăt rămas de la un proces oprit
+                except OSError:
+                    pass
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(str(os.getpid()))
+            on_disk = self._load(job.id)
+            if on_disk is not None and on_disk.status in FINISHED:
+                # Terminat între timp de alt proces
+                self._jobs[job.id] = on_disk
+                self._release(job.id)
+                return False
+            if os.path.exists(self._path(job.id, ".cancel")):
+                job.status, job.finished_at = CANCELLED, time.time()
+                self._persist(job)
+                self._release(job.id)
+                return False
+            return True
+        return False
+
+    @staticmethod
+    def _lock_alive(path: str) -> bool:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read().strip()
+            age = time.time() - os.path.getmtime(path)
+        except OSError:
+            # Lacătul a dispărut între timp: slotul e liber
+            return False
+        pid = int(text) if text.isdigit() else 0
+        if pid <= 0:
+            # Creat chiar acum de alt proces, care încă nu și-a scris PID-ul (altfel e invalid)
+            return age < _LOCK_PID_GRACE_S
+        return _pid_alive(pid)
+
+    def _release(self, job_id: str) -> None:
+        for suffix in (".lock", ".cancel"):
+            try:
+                os.remove(self._path(job_id, suffix))
+            except OSError:
+                pass
+
+    # -- persistență -------------------------------------------------------
+
+    def _path(self, job_id: str, suffix: str) -> str:
+        safe = "".join(ch for ch in job_id if ch.isalnum())
+        return os.path.join(self.directory, f"{safe}{suffix}")
+
+    @staticmethod
+    def _write_json(path: str, payload: Any) -> None:
+        tmp = f"{path}.tmp{threading.get_ident()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def _persist(self, job: Job, throttle: bool = False) -> None:
+        now = time.monotonic()
+        if throttle and now - self._last_persist.get(job.id, 0.0) < 1.0:
+            return
+        self._last_persist[job.id] = now
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._write_json(self._path(job.id, ".json"), job.to_dict())
+        except OSError:
+            logger.warning("Could not persist job %s", job.id, exc_info=True)
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        try:
+            with open(self._path(job_id, ".json"), "r", encoding="utf-8") as f:
+                return Job(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _load_all(self) -> List[Job]:
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        jobs = []
+        for name in names:
+            if name.endswith(".json") and not name.endswith(".result.json"):
+                job = self._load(name[:-len(".json")])
+                if job is not None:
+                    jobs.append(job)
+        return jobs
+
+    def _remember(self, job_id: str, result: Dict[str, Any]) -> None:
+        self._results[job_id] = result
+        self._results.move_to_end(job_id)
+        while len(self._results) > self._result_cache:
+            self._results.popitem(last=False)
+
+    def _delete(self, job_id: str) -> None:
+        with self._cond:
+            self._jobs.pop(job_id, None)
+            self._results.pop(job_id, None)
+            self._last_persist.pop(job_id, None)
+        for suffix in (".json", ".result.json", ".cancel", ".lock"):
+            try:
+                os.remove(self._path(job_id, suffix))
+            except OSError:
+                pass
+
+
+__all__ = [
+    "Job",
+    "JobCancelled",
+    "JobContext",
+    "JobManager",
+    "QUEUED",
+    "RUNNING",
+    "SUCCEEDED",
+    "FAILED",
+    "CANCELLED",
+    "FINISHED",
+]
@@ -2,29 +2,60 @@ import os
 import sys
 import io
 import random
-import requests
 import json
 import math
+import time
 import datetime as dt
-from typing import Optional, List, Dict
+from contextlib import asynccontextmanager
+from functools import lru_cache, wraps
+from typing import Any, Optional, List, Dict
 
 # Adaugă directorul server la path pentru importuri
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-import uvicorn
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
-from tle_store import TLEStore, TLERecord
-from propagate import propagate_positions
-from classifier import classify_image
+from tle_store import CatalogSnapshotMiddleware, TLEStore, TLERecord, format_tle_lines, iter_tle_lines, iter_tle_text, merge_newest
+from http_cache import cached_json_response, quantized_now, seconds_left_in_quantum
+from jobs import JobManager, JobCancelled, FINISHED, SUCCEEDED
+from propagate import propagate_adaptive, propagate_positions, satrec_from_record, time_grid
 from nasa import fetch_donki_gst, latest_kp_index
 from risk import flux_ordem_like, annual_collision_probability, inclination_from_tle
+from metrics import (
+    MetricsMiddleware, render_latest,
+    TLE_CATALOG_OBJECTS, TLE_CATALOG_REFRESH_AGE, UPSTREAM_DURATION, UPSTREAM_ERRORS,
+)
+from profiling import install_profiling
+from skyfield_utils import get_timescale
+
+# Dependențele grele (NumPy, sgp4, Skyfield, OpenCV, PIL, requests) sunt importate
+# la prima utilizare, în funcțiile care au nevoie de ele, pentru o pornire rapidă.
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Opțional: încălzește timescale-ul Skyfield la pornire, nu la primul request
+    if os.getenv("PREWARM_TIMESCALE", "").lower() in ("1", "true", "yes"):
+        get_timescale()
+    # Reia joburile întrerupte de o repornire
+    job_manager.start()
+    # Lista de urmărire salvată: screening-ul continuă de la pornire
+    path = _watchlist_path()
+    if path and os.path.exists(path):
+        get_watchlist().start()
+    yield
+    job_manager.shutdown()
+    if get_watchlist.cache_info().currsize:
+        get_watchlist().shutdown()
+
 
-app = FastAPI(title="Space Debris NASA Demo API", version="0.2.0")
+app = FastAPI(title="Space Debris NASA Demo API", version="0.2.0", lifespan=lifespan)
+# Profilare la cerere (PROFILE_TOKEN / PROFILE_SAMPLE_RATE); trebuie instalată înaintea rutelor
+install_profiling(app)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,15 +63,132 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Catalog-Generation"],
+)
+app.add_middleware(MetricsMiddleware)
+
+def _make_tle_store() -> TLEStore:
+    # TLE_SHARED_MEMORY=<prefix> (sau 1): catalog comun tuturor worker-ilor uvicorn
+    prefix = os.getenv("TLE_SHARED_MEMORY", "").strip()
+    if not prefix or prefix.lower() in ("0", "false", "no"):
+        return TLEStore()
+    from shared_catalog import SharedCatalog
+    if prefix.lower() in ("1", "true", "yes"):
+        prefix = "nasa-tle"
+    return TLEStore(shared=SharedCatalog(prefix))
+
+
+tle_store = _make_tle_store()
+# Fiecare cerere citește un singur snapshot al catalogului (X-Catalog-Generation în răspuns)
+app.add_middleware(CatalogSnapshotMiddleware, store=tle_store)
+TLE_CATALOG_OBJECTS.set_function(lambda: len(tle_store))
+TLE_CATALOG_REFRESH_AGE.set_function(
+    lambda: time.time() - tle_store.last_loaded if tle_store.last_loaded is not None else None
+)
+
+# Joburi de fundal (analize lungi): coadă cu priorități, rezultate persistate în data/jobs
+job_manager = JobManager(
+    directory=os.getenv("JOBS_DIR") or os.path.join(os.path.dirname(__file__), "..", "data", "jobs"),
+    workers=int(os.getenv("JOB_WORKERS", "2")),
 )
 
-tle_store = TLEStore()
+
+@lru_cache(maxsize=1)
+def get_tle_history():
+    """
+    Arhiva TLE (toate seturile de elemente încărcate vreodată), în TLE_HISTORY_DIR
+    (implicit data/tle_history; "0" o dezactivează). None dacă e dezactivată.
+    """
+    directory = os.getenv("TLE_HISTORY_DIR", "").strip()
+    if directory.lower() in ("0", "false", "no", "off"):
+        return None
+    from tle_history import TLEHistory
+    return TLEHistory(directory or os.path.join(os.path.dirname(__file__), "..", "data", "tle_history"))
+
+
+@lru_cache(maxsize=1)
+def get_density_index():
+    """Hărțile de densitate ale catalogului, actualizate incremental la fiecare încărcare TLE."""
+    from density import DensityIndex
+    return DensityIndex(tle_store)
+
+
+def _watchlist_path() -> Optional[str]:
+    # WATCHLIST_FILE: activele urmărite (implicit data/watchlist.json; "0" = doar în memorie)
+    path = os.getenv("WATCHLIST_FILE", "").strip()
+    if path.lower() in ("0", "false", "no", "off"):
+        return None
+    return path or os.path.join(os.path.dirname(__file__), "..", "data", "watchlist.json")
+
+
+@lru_cache(maxsize=1)
+def get_watchlist():
+    """
+    Activele protejate, cu apropierile față de catalog ținute la zi pe un fir de fundal
+    (doar perechile atinse de TLE-urile noi se recalculează).
+    """
+    from watchlist import Watchlist
+    return Watchlist(
+        tle_store,
+        threshold_km=float(os.getenv("WATCHLIST_THRESHOLD_KM", "50")),
+        window_minutes=int(os.getenv("WATCHLIST_WINDOW_MIN", "1440")),
+        block_minutes=int(os.getenv("WATCHLIST_BLOCK_MIN", "60")),
+        path=_watchlist_path(),
+    )
+
+
+def _archive_records(records) -> Optional[int]:
+    """Adaugă în arhivă seturile noi; None dacă arhiva e dezactivată sau indisponibilă."""
+    history = get_tle_history()
+    if history is None:
+        return None
+    try:
+        return history.append(records)
+    except OSError:
+        return None
+
+
+def _archive_tle_text(text: str) -> Optional[int]:
+    return _archive_records(iter_tle_text(text))
+
+
+def _record_at(rec: TLERecord, when: dt.datetime) -> TLERecord:
+    """Setul de elemente cu epoca cea mai apropiată de `when`: cel curent sau unul din arhivă."""
+    from tle_store import tle_epoch_jd
+
+    history = get_tle_history()
+    if history is None:
+        return rec
+    old = history.nearest(rec.norad_id, when)
+    if old is None:
+        return rec
+    from tle_history import datetime_to_jd
+    jd = datetime_to_jd(when)
+    if abs(tle_epoch_jd(old.line1) - jd) < abs(tle_epoch_jd(rec.line1) - jd):
+        return TLERecord(name=rec.name, line1=old.line1, line2=old.line2, norad_id=rec.norad_id)
+    return rec
+
+
+def _tle_epoch_iso(rec: TLERecord) -> str:
+    from tle_history import jd_to_datetime
+    from tle_store import tle_epoch_jd
+    return jd_to_datetime(tle_epoch_jd(rec.line1)).isoformat().replace("+00:00", "Z")
+
+
+# Sursa CelesTrak (suprascrisă în testele de încărcare cu un server local)
+CELESTRAK_BASE_URL = os.getenv("CELESTRAK_BASE_URL", "https://celestrak.org").rstrip("/")
+# Câte grupuri CelesTrak se descarcă în paralel la o încărcare
+CELESTRAK_MAX_PARALLEL = int(os.getenv("CELESTRAK_MAX_PARALLEL", "8"))
 
 CLIENT_DIR = os.path.join(os.path.dirname(__file__), "..", "client")
 app.mount("/static", StaticFiles(directory=CLIENT_DIR), name="static")
 
 
 # Funcții pentru NASA Space-Track API
+# Raza echivalentă (hard-body) pe clase RCS [m]
+_RCS_RADIUS_M = {"SMALL": 0.05, "MEDIUM": 0.5, "LARGE": 2.0}
+
+
 def fetch_nasa_debris(limit: int = 200) -> List[Dict]:
     """
     Fetch real debris data from NASA Space-Track API
@@ -91,6 +239,7 @@ def fetch_nasa_debris(limit: int = 200) -> List[Dict]:
     
     # Generez mai multe deșeuri bazate pe tipare reale
     debris_list = []
+    now = dt.datetime.now(dt.timezone.utc)
     for i in range(min(limit, 500)):
         base_debris = random.choice(known_debris)
         debris_item = base_debris.copy()
@@ -103,82 +252,124 @@ def fetch_nasa_debris(limit: int = 200) -> List[Dict]:
         debris_item["mean_motion"] += random.uniform(-0.5, 0.5)
         debris_item["inclination"] += random.uniform(-2, 2)
         debris_item["eccentricity"] += random.uniform(-0.02, 0.02)
-        debris_item["apogee"] += random.randint(-100, 100)
-        debris_item["perigee"] += random.randint(-50, 50)
-        
-        # Poziție aproximativă calculată din parametri orbitali
-        debris_item["latitude"] = random.uniform(-debris_item["inclination"], debris_item["inclination"])
-        debris_item["longitude"] = random.uniform(-180, 180)
-        debris_item["altitude"] = (debris_item["apogee"] + debris_item["perigee"]) / 2
+
+        # Set de elemente coerent: excentricitatea limitată astfel încât perigeul să rămână peste 200 km
+        a_km = (398600.4418 / (debris_item["mean_motion"] * 2 * math.pi / 86400) ** 2) ** (1 / 3)
+        ecc = min(max(debris_item["eccentricity"], 0.0), max(0.0, 1 - (6378.137 + 200) / a_km))
+        debris_item["eccentricity"] = round(ecc, 7)
+        debris_item["apogee"] = round(a_km * (1 + ecc) - 6378.137)
+        debris_item["perigee"] = round(a_km * (1 - ecc) - 6378.137)
+
+        # TLE vechi de 0.5–3 zile, ca în catalog (vârsta determină covarianța folosită pentru Pc)
+        epoch = now - dt.timedelta(days=random.uniform(0.5, 3.0))
+        epoch_day = epoch.timetuple().tm_yday + (epoch.hour * 3600 + epoch.minute * 60 + epoch.second) / 86400.0
+        debris_item["tle_line1"], debris_item["tle_line2"] = format_tle_lines(
+            debris_item["norad_id"], epoch.year, epoch_day,
+            debris_item["inclination"], random.uniform(0, 360), ecc,
+            random.uniform(0, 360), random.uniform(0, 360), debris_item["mean_motion"],
+        )
         
         debris_list.append(debris_item)
     
     return debris_list
 
 
-def filter_debris_by_proximity(satellite_pos: Dict, debris_list: List[Dict], max_distance_km: float = 1000) -> List[Dict]:
+def filter_debris_by_proximity(sat_r, sat_v, debris_list: List[Dict], debris_r, debris_v,
+                               max_distance_km: float = 1000) -> List[Dict]:
     """
-    Filtrează deșeurile în funcție de proximitatea față de satelit cu calcul îmbunătățit
+    Filtrează deșeurile în funcție de proximitatea față de satelit.
+    Distanța și viteza relativă se calculează din vectorii de stare reali la același moment
+    (același sistem de referință, km și km/s): `sat_r`/`sat_v` de forma (3,), `debris_r`/`debris_v`
+    de forma (n, 3), în ordinea din `debris_list`.
     """
+    import numpy as np
+
+    dr = np.asarray(debris_r, dtype=float).reshape(-1, 3) - np.asarray(sat_r, dtype=float)
+    dv = np.asarray(debris_v, dtype=float).reshape(-1, 3) - np.asarray(sat_v, dtype=float)
+    distance_km = np.sqrt(np.einsum("ij,ij->i", dr, dr))
+    relative_velocity = np.sqrt(np.einsum("ij,ij->i", dv, dv))
+
+    # Risc bazat pe distanță și viteza relativă (normalizată la 10 km/s)
+    risk_distance_factor = np.maximum(0.0, (max_distance_km - distance_km) / max_distance_km)
+    risk_velocity_factor = np.minimum(1.0, relative_velocity / 10)
+    combined_risk = (risk_distance_factor * 0.7) + (risk_velocity_factor * 0.3)
+
     filtered_debris = []
-    
-    sat_alt = satellite_pos.get("altitude_km", 400)
-    sat_lat = satellite_pos.get("latitude", 0)
-    sat_lon = satellite_pos.get("longitude", 0)
-    
-    for debris in debris_list:
-        # Calculez distanța 3D în spațiu folosind coordonate carteziene
-        debris_alt = debris["altitude"]
-        debris_lat = debris["latitude"]
-        debris_lon = debris["longitude"]
-        
-        # Convertesc coordonatele sferice în carteziene pentru calcul precis
-        earth_radius = 6371  # km
-        
-        # Satelit
-        sat_r = earth_radius + sat_alt
-        sat_x = sat_r * math.cos(math.radians(sat_lat)) * math.cos(math.radians(sat_lon))
-        sat_y = sat_r * math.cos(math.radians(sat_lat)) * math.sin(math.radians(sat_lon))
-        sat_z = sat_r * math.sin(math.radians(sat_lat))
-        
-        # Deșeu
-        debris_r = earth_radius + debris_alt
-        debris_x = debris_r * math.cos(math.radians(debris_lat)) * math.cos(math.radians(debris_lon))
-        debris_y = debris_r * math.cos(math.radians(debris_lat)) * math.sin(math.radians(debris_lon))
-        debris_z = debris_r * math.sin(math.radians(debris_lat))
-        
-        # Distanța euclidiană în spațiu 3D
-        distance_km = math.sqrt(
-            (sat_x - debris_x)**2 + 
-            (sat_y - debris_y)**2 + 
-            (sat_z - debris_z)**2
-        )
-        
-        # Calculez viteza relativă pentru risc de impact
-        # Simplificat: viteza orbitală aproximativă
-        sat_orbital_velocity = math.sqrt(398600 / sat_r)  # km/s
-        debris_orbital_velocity = math.sqrt(398600 / debris_r)  # km/s
-        relative_velocity = abs(sat_orbital_velocity - debris_orbital_velocity)
-        
-        # Calculez factorul de risc îmbunătățit
-        if distance_km <= max_distance_km:
-            # Risc bazat pe distanță și viteza relativă
-            risk_distance_factor = max(0, (max_distance_km - distance_km) / max_distance_km)
-            risk_velocity_factor = min(1, relative_velocity / 10)  # normalizez la 10 km/s max
-            combined_risk = (risk_distance_factor * 0.7) + (risk_velocity_factor * 0.3)
-            
-            debris["distance_from_satellite_km"] = round(distance_km, 2)
-            debris["relative_velocity_kms"] = round(relative_velocity, 3)
-            debris["proximity_risk_factor"] = round(combined_risk, 4)
-            filtered_debris.append(debris)
-    
+    for i in np.flatnonzero(distance_km <= max_distance_km):
+        debris = debris_list[i]
+        debris["distance_from_satellite_km"] = round(float(distance_km[i]), 2)
+        debris["relative_velocity_kms"] = round(float(relative_velocity[i]), 3)
+        debris["proximity_risk_factor"] = round(float(combined_risk[i]), 4)
+        filtered_debris.append(debris)
+
     return sorted(filtered_debris, key=lambda x: x["proximity_risk_factor"], reverse=True)
 
 
+def _upstream_get(upstream: str, url: str, session=None, **kwargs):
+    """requests.get (sau session.get) cu latența și erorile înregistrate în /api/metrics."""
+    import requests
+
+    t0 = time.perf_counter()
+    try:
+        r = (session or requests).get(url, **kwargs)
+    except Exception:
+        UPSTREAM_ERRORS.inc((upstream,))
+        raise
+    finally:
+        UPSTREAM_DURATION.observe(time.perf_counter() - t0, (upstream,))
+    if not r.ok:
+        UPSTREAM_ERRORS.inc((upstream,))
+    return r
+
+
+@lru_cache(maxsize=1)
+def _celestrak_session():
+    """Sesiune HTTP comună pentru CelesTrak: conexiunile rămân deschise între grupuri și încărcări."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=CELESTRAK_MAX_PARALLEL)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _fetch_celestrak_group(group: str) -> List[TLERecord]:
+    """
+    Descarcă un grup CelesTrak (gp.php, apoi vechiul <group>.txt) și îl parsează pe măsură ce sosește.
+    Ridică RuntimeError cu motivele, dacă niciun endpoint nu întoarce date.
+    """
+    errors = []
+    endpoints = (
+        ("gp.php", f"{CELESTRAK_BASE_URL}/NORAD/elements/gp.php", {"GROUP": group, "FORMAT": "tle"}),
+        ("legacy txt", f"{CELESTRAK_BASE_URL}/NORAD/elements/{group}.txt", None),
+    )
+    for label, url, params in endpoints:
+        try:
+            r = _upstream_get("celestrak", url, session=_celestrak_session(), params=params, timeout=15, stream=True)
+            with r:
+                if not r.ok:
+                    errors.append(f"{label} returned status {r.status_code}")
+                    continue
+                r.encoding = r.encoding or "utf-8"
+                records = list(iter_tle_lines(r.iter_lines(chunk_size=65536, decode_unicode=True)))
+        except Exception as exc:
+            errors.append(f"{label} error: {exc}")
+            continue
+        if records:
+            return records
+        # gp.php răspunde 200 cu "No GP data found" pentru grupuri necunoscute
+        errors.append(f"{label} returned no TLE data")
+    raise RuntimeError("; ".join(errors))
+
+
 class LoadTLERequest(BaseModel):
     source: str = "celestrak"  # "celestrak" | "sample" | "url"
     url: Optional[str] = None
     group: Optional[str] = "active"
+    groups: Optional[List[str]] = None  # mai multe grupuri CelesTrak, descărcate în paralel
+    replace: Optional[bool] = None  # implicit: celestrak înlocuiește catalogul, celelalte surse îl completează
 
 
 @app.get("/api/health")
@@ -186,82 +377,194 @@ def health():
     return {"status": "ok", "time": dt.datetime.utcnow().isoformat() + "Z"}
 
 
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def api_metrics():
+    """
+    Metrici în formatul text Prometheus (latențe per rută, propagare, catalog, upstream, clasificator).
+    """
+    return PlainTextResponse(render_latest(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.post("/api/tle/load")
 def load_tle(req: LoadTLERequest):
     try:
         if req.source == "celestrak":
-            group = (req.group or "active").strip()
-            import requests
+            groups = list(dict.fromkeys(g.strip() for g in (req.groups or [req.group or "active"]) if g and g.strip()))
+            if not groups:
+                raise HTTPException(status_code=400, detail="No CelesTrak group given.")
 
-            text = None
-            error_messages = []
+            # Grupurile se descarcă în paralel: durata totală e cea a celui mai lent grup
+            from concurrent.futures import ThreadPoolExecutor
 
-            # Încearcă noul endpoint gp.php
-            try:
-                r = requests.get(
-                    "https://celestrak.org/NORAD/elements/gp.php",
-                    params={"GROUP": group, "FORMAT": "tle"},
-                    timeout=15,
-                )
-                if r.ok and "No GP data found" not in r.text:
-                    text = r.text
-                else:
-                    error_messages.append(f"gp.php returned status {r.status_code}")
-            except Exception as exc:
-                error_messages.append(f"gp.php error: {exc}")
-
-            # Fallback la vechiul endpoint dacă noul nu merge
-            if text is None:
-                legacy_url = f"https://celestrak.org/NORAD/elements/{group}.txt"
+            with ThreadPoolExecutor(max_workers=min(len(groups), CELESTRAK_MAX_PARALLEL)) as pool:
+                futures = {g: pool.submit(_fetch_celestrak_group, g) for g in groups}
+            fetched, failed = {}, {}
+            for g, fut in futures.items():
                 try:
-                    r = requests.get(legacy_url, timeout=15)
-                    r.raise_for_status()
-                    text = r.text
+                    fetched[g] = fut.result()
                 except Exception as exc:
-                    error_messages.append(f"legacy txt error: {exc}")
-
-            if text is None:
-                detail = "; ".join(error_messages) if error_messages else "Unknown error"
-                raise HTTPException(status_code=502, detail=f"Failed to fetch CelesTrak group '{group}': {detail}")
+                    failed[g] = str(exc)
+            if failed:
+                detail = "; ".join(f"'{g}': {e}" for g, e in failed.items())
+                raise HTTPException(status_code=502, detail=f"Failed to fetch CelesTrak group(s) {detail}")
 
-            tle_store.clear()
-            count = tle_store.load_from_text(text)
-            return {"loaded": count, "source": "celestrak", "group": group}
+            # Un singur set per obiect (epoca cea mai nouă), etichetat cu toate grupurile în care apare
+            merged = merge_newest(fetched)
+            count = tle_store.load_records(merged, replace=True if req.replace is None else req.replace)
+            fetched_total = sum(len(recs) for recs in fetched.values())
+            return {"loaded": count, "source": "celestrak", "group": groups[0] if len(groups) == 1 else None,
+                    "groups": {g: len(recs) for g, recs in fetched.items()},
+                    "duplicates": fetched_total - count, "generation": tle_store.generation,
+                    "archived": _archive_records(r for recs in fetched.values() for r in recs)}
         elif req.source == "url":
             if not req.url:
                 raise HTTPException(status_code=400, detail="Missing 'url' for source=url")
-            import requests
-            r = requests.get(req.url, timeout=15)
+            r = _upstream_get("url", req.url, timeout=15)
             r.raise_for_status()
-            count = tle_store.load_from_text(r.text)
-            return {"loaded": count, "source": "url"}
+            count = tle_store.load_from_text(r.text, replace=bool(req.replace))
+            return {"loaded": count, "source": "url", "generation": tle_store.generation,
+                    "archived": _archive_tle_text(r.text)}
         elif req.source == "sample":
             sample_path = os.path.join(os.path.dirname(__file__), "..", "data", "sample_tle.txt")
             if not os.path.exists(sample_path):
                 raise HTTPException(status_code=500, detail="Sample TLE file not found.")
             with open(sample_path, "r", encoding="utf-8") as f:
                 text = f.read()
-            count = tle_store.load_from_text(text)
-            return {"loaded": count, "source": "sample"}
+            count = tle_store.load_from_text(text, replace=bool(req.replace))
+            return {"loaded": count, "source": "sample", "generation": tle_store.generation,
+                    "archived": _archive_tle_text(text)}
         else:
             raise HTTPException(status_code=400, detail="Invalid source. Use 'celestrak' | 'sample' | 'url'.")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to load TLEs: {e}")
 
 
+@app.post("/api/tle/history")
+async def api_tle_history_load(file: UploadFile = File(...)):
+    """
+    Completează arhiva TLE dintr-un fișier cu istoric (mai multe epoci per obiect, ex. export Space-Track).
+    Catalogul curent nu se modifică.
+    """
+    history = get_tle_history()
+    if history is None:
+        raise HTTPException(status_code=404, detail="TLE history is disabled (TLE_HISTORY_DIR=0).")
+    text = (await file.read()).decode("utf-8", errors="replace")
+    added = history.append_text(text)
+    return {"archived": added, "total_element_sets": len(history)}
+
+
+@app.get("/api/tle/history")
+def api_tle_history(
+    norad_id: int = Query(..., description="NORAD catalog ID"),
+    limit: int = Query(1000, ge=1, le=100000, description="Most recent epochs to return"),
+):
+    """
+    Epocile arhivate ale unui obiect (cele mai recente `limit`, în ordine crescătoare).
+    """
+    history = get_tle_history()
+    if history is None:
+        raise HTTPException(status_code=404, detail="TLE history is disabled (TLE_HISTORY_DIR=0).")
+    from tle_history import jd_to_datetime
+
+    epochs = history.epochs(norad_id)
+    return {
+        "norad_id": norad_id,
+        "count": int(len(epochs)),
+        "epochs": [jd_to_datetime(e).isoformat().replace("+00:00", "Z") for e in epochs[-limit:]],
+    }
+
+
 @app.get("/api/objects")
-def list_objects(limit: int = 100):
-    items = tle_store.list_objects(limit=limit)
-    return {"count": len(items), "objects": items}
+def list_objects(request: Request, limit: int = 100,
+                 group: Optional[str] = Query(None, description="Only objects from this CelesTrak group")):
+    def compute():
+        items = tle_store.list_objects(limit=limit, group=group)
+        return {"generation": tle_store.generation, "count": len(items), "objects": items}
+
+    # Snapshot-urile sunt imutabile: generația ajunge ca versiune pentru ETag
+    return cached_json_response(request, (tle_store.generation, tle_store.last_loaded), compute)
+
+
+@app.get("/api/tle/groups")
+def api_tle_groups(request: Request):
+    """Grupurile CelesTrak din care provin obiectele încărcate, cu numărul de obiecte din fiecare."""
+    return cached_json_response(
+        request, (tle_store.generation, tle_store.last_loaded),
+        lambda: {"generation": tle_store.generation, "total": len(tle_store), "groups": tle_store.groups()})
+
+
+@app.get("/api/density")
+def api_density(
+    request: Request,
+    alt_step_km: float = Query(50.0, ge=5.0, le=1000.0, description="Altitude bin [km]"),
+    alt_max_km: float = Query(2000.0, ge=100.0, le=50000.0, description="Upper edge of the altitude axis [km]"),
+    inc_step_deg: float = Query(5.0, ge=0.5, le=90.0, description="Inclination bin [deg]"),
+    by: str = Query("none", pattern="^(none|raan|local_time)$", description="Third axis: none | raan | local_time"),
+    raan_step_deg: float = Query(30.0, ge=1.0, le=180.0, description="RAAN bin [deg] (by=raan)"),
+    local_time_step_h: float = Query(2.0, ge=0.25, le=12.0, description="LTAN bin [h] (by=local_time)"),
+    flux: bool = Query(False, description="Add the ORDEM-like flux per altitude x inclination cell"),
+    size_min_cm: float = Query(1.0, ge=0.01, description="Min size [cm] for the flux"),
+    size_max_cm: float = Query(10.0, ge=0.01, description="Max size [cm] for the flux"),
+):
+    """
+    Densitatea catalogului: numărul de obiecte pe celule altitudine medie × înclinație
+    (opțional și RAAN sau ora locală a nodului ascendent). Hărțile sunt păstrate în memorie
+    și actualizate incremental la încărcările TLE; opțional, fluxul ORDEM-like pe celulă
+    și numărul de obiecte ponderat cu fluxul.
+    """
+    from density import DensityBins
+
+    bins = DensityBins(alt_step_km=alt_step_km, alt_max_km=alt_max_km, inc_step_deg=inc_step_deg, by=by,
+                       raan_step_deg=raan_step_deg, local_time_step_h=local_time_step_h)
+    n_alt, n_inc, n_third = bins.shape
+    if n_alt * n_inc * n_third > 250_000:
+        raise HTTPException(status_code=400, detail="Too many density cells; use coarser bins.")
+    snapshot = get_density_index().snapshot(bins)
+
+    def compute():
+        out = {"generation": tle_store.generation, **snapshot}
+        if flux:
+            import numpy as np
+            from density import flux_grid
+            try:
+                grid = flux_grid(bins, size_min_cm, size_max_cm)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Flux calculation failed: {e}")
+            counts = np.asarray(snapshot["counts"], dtype=float)
+            per_cell = counts if counts.ndim == 2 else counts.sum(axis=2)
+            out["size_bin_cm"] = [size_min_cm, size_max_cm]
+            out["flux_per_m2_per_year"] = grid.tolist()
+            out["flux_weighted_counts"] = (per_cell * grid).tolist()
+        return out
+
+    # Versiunea indexului se schimbă doar când se mută obiecte între celule
+    return cached_json_response(request, (tle_store.generation, tle_store.last_loaded, snapshot["version"]), compute)
 
 
 @app.get("/api/propagate")
 def api_propagate(
+    request: Request,
     norad_id: int = Query(..., description="NORAD catalog ID"),
     minutes: int = Query(120, ge=1, le=1440),
     step_s: int = Query(60, ge=5, le=3600),
     start_iso: Optional[str] = Query(None, description="Start time ISO UTC, default=now"),
+    exact: bool = Query(False, description="Bypass the interpolating ephemeris cache (direct SGP4)"),
+    frame: str = Query("geodetic", pattern="^(geodetic|teme|gcrs|itrf)$",
+                       description="geodetic (lat/lon/alt) | teme | gcrs | itrf (position + velocity, km, km/s)"),
+    mode: str = Query("uniform", pattern="^(uniform|adaptive)$",
+                      description="uniform (every step_s) | adaptive (non-uniform, error-bounded; step_s ignored)"),
+    tolerance_km: float = Query(1.0, ge=0.001, le=1000.0,
+                                description="Adaptive: max deviation of linear interpolation from SGP4 [km]"),
+    max_points: Optional[int] = Query(None, ge=2, le=100_000, description="Adaptive: sample budget"),
 ):
+    """
+    Traiectoria satelitului: coordonate geodezice WGS84 sau vectori de stare carteziene (poziție și viteză)
+    în TEME, GCRS sau ITRF; pentru cadrele carteziene conversia geodezică nu se mai face.
+    Cu mode=adaptive pasul urmează curbura orbitei (mai des la perigeu), astfel încât interpolarea liniară
+    între eșantioane să rămână sub tolerance_km (sau în bugetul max_points); eroarea atinsă e în "adaptive".
+    """
     rec: Optional[TLERecord] = tle_store.get(norad_id)
     if not rec:
         raise HTTPException(status_code=404, detail=f"NORAD {norad_id} not found in TLE store.")
@@ -271,11 +574,245 @@ def api_propagate(
             start_time = dt.datetime.fromisoformat(start_iso.replace("Z", "+00:00")).astimezone(dt.timezone.utc)
         except Exception:
             raise HTTPException(status_code=400, detail="Invalid start_iso format. Use ISO 8601.")
+        max_age = None
+    else:
+        # "Acum" cuantizat: cererile identice din aceeași cuantă au același ETag și sunt comasate
+        start_time = quantized_now()
+        max_age = seconds_left_in_quantum()
+    # Pentru alte momente decât "acum": setul de elemente cu epoca cea mai apropiată din arhivă
+    if start_iso:
+        rec = _record_at(rec, start_time + dt.timedelta(minutes=minutes / 2))
+
+    def compute():
+        if mode == "adaptive":
+            # Direct SGP4: eșantioanele neuniforme nu trec prin cache-ul de efemeride
+            samples, info = propagate_adaptive(rec, start_time, minutes=minutes, tolerance_km=tolerance_km,
+                                               max_points=max_points, frame=frame)
+            return {"norad_id": norad_id, "name": rec.name, "tle_epoch": _tle_epoch_iso(rec), "frame": frame,
+                    "mode": mode, "adaptive": info, "samples": samples}
+        if exact:
+            samples = propagate_positions(rec, start_time, minutes=minutes, step_seconds=step_s, frame=frame)
+        else:
+            # Interpolare Hermite din cache (sub 1 m față de SGP4), reconstruită la schimbarea TLE-ului
+            from ephemeris import get_ephemeris_cache
+            samples = get_ephemeris_cache().samples(rec, start_time, minutes=minutes, step_seconds=step_s, frame=frame)
+        return {"norad_id": norad_id, "name": rec.name, "tle_epoch": _tle_epoch_iso(rec), "frame": frame,
+                "mode": mode, "samples": samples}
+
+    return cached_json_response(request, (rec.line1, rec.line2, start_time.isoformat()), compute, max_age)
+
+
+@app.get("/api/groundtrack")
+def api_groundtrack(
+    request: Request,
+    norad_id: int = Query(..., description="NORAD catalog ID"),
+    minutes: int = Query(1440, ge=1, le=10080),
+    step_s: int = Query(10, ge=1, le=600),
+    start_iso: Optional[str] = Query(None, description="Start time ISO UTC, default=now"),
+    tolerance_deg: Optional[float] = Query(None, gt=0.0, le=10.0, description="Angular tolerance [deg]"),
+    zooms: Optional[str] = Query(None, description="Comma-separated Web Mercator zoom levels (one level each)"),
+    pixel_tolerance: float = Query(0.5, gt=0.0, le=10.0, description="Tolerance in pixels for `zooms`"),
+    max_points: Optional[int] = Query(None, ge=2, le=1_000_000, description="Point budget per level"),
+):
+    """
+    Urma la sol simplificată pe server: segmente tăiate la antimeridian (cu punctul de traversare
+    la ±180°) și Douglas–Peucker pe sferă, la toleranța unghiulară cerută, la un buget de puncte
+    sau pentru mai multe niveluri de zoom într-un singur răspuns (clasamentul punctelor se calculează o dată).
+    Fără toleranță, zoom sau buget se folosește 0.01° (~1 km).
+    """
+    rec: Optional[TLERecord] = tle_store.get(norad_id)
+    if not rec:
+        raise HTTPException(status_code=404, detail=f"NORAD {norad_id} not found in TLE store.")
+    try:
+        zoom_levels = [float(z) for z in zooms.split(",") if z.strip()] if zooms else []
+    except ValueError:
+        raise HTTPException(status_code=400, detail="zooms must be comma-separated numbers.")
+    if len(zoom_levels) > 24 or any(not 0 <= z <= 24 for z in zoom_levels):
+        raise HTTPException(status_code=400, detail="At most 24 zoom levels, each between 0 and 24.")
+    if minutes * 60 // step_s > 200_000:
+        raise HTTPException(status_code=400, detail="Too many samples; increase step_s or shorten the window.")
+
+    if start_iso:
+        try:
+            start_time = dt.datetime.fromisoformat(start_iso.replace("Z", "+00:00")).astimezone(dt.timezone.utc)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid start_iso format. Use ISO 8601.")
+        max_age = None
+        rec = _record_at(rec, start_time + dt.timedelta(minutes=minutes / 2))
+    else:
+        start_time = quantized_now()
+        max_age = seconds_left_in_quantum()
+
+    def compute():
+        from frames import teme_to_geodetic
+        from groundtrack import budget_threshold, rank_segments, simplify, split_antimeridian, tolerance_for_zoom
+        from propagate import propagate_states
+
+        jd, fr, r, _, ok = propagate_states(rec, start_time, minutes=minutes, step_seconds=step_s)
+        lat, lon, _ = teme_to_geodetic(r, jd, fr)
+        t_s = (jd - jd[0] + fr - fr[0]) * 86400.0
+        segments = rank_segments(split_antimeridian(t_s, lat, lon, ok))
+
+        if zoom_levels:
+            targets = [{"zoom": z, "tolerance_deg": tolerance_for_zoom(z, pixel_tolerance)} for z in zoom_levels]
+        else:
+            targets = [{"tolerance_deg": tolerance_deg if tolerance_deg is not None else (0.0 if max_points else 0.01)}]
+        budget = budget_threshold(segments, max_points) if max_points else -1.0
+        levels = []
+        for target in targets:
+            levels.append({**target, **simplify(segments, max(target["tolerance_deg"], budget))})
+        return {
+            "norad_id": norad_id,
+            "name": rec.name,
+            "tle_epoch": _tle_epoch_iso(rec),
+            "start": start_time.isoformat().replace("+00:00", "Z"),
+            "step_s": step_s,
+            "samples": int(ok.sum()),
+            "levels": levels,
+        }
+
+    return cached_json_response(request, (rec.line1, rec.line2, start_time.isoformat()), compute, max_age)
+
+
+@app.get("/api/ephemeris")
+def api_ephemeris(
+    norad_ids: str = Query(..., description="Comma-separated NORAD IDs"),
+    times: Optional[str] = Query(None, description="Comma-separated ISO UTC times (alternative to start/step/count)"),
+    start_iso: Optional[str] = Query(None, description="Start time ISO UTC, default=now"),
+    step_s: float = Query(1.0, gt=0.0, le=3600.0),
+    count: int = Query(60, ge=1, le=10000),
+):
+    """
+    Poziții și viteze TEME (km, km/s) pentru mai multe obiecte la momente arbitrare,
+    evaluate din efemeridele interpolate (cache per obiect și fereastră de timp).
+    """
+    import numpy as np
+    from ephemeris import get_ephemeris_cache, seconds_since_j2000
+
+    try:
+        ids = [int(x) for x in norad_ids.split(",") if x.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="norad_ids must be comma-separated integers.")
+    if len(ids) > 500:
+        raise HTTPException(status_code=400, detail="At most 500 objects per request.")
+    records = [r for r in (tle_store.get(i) for i in ids) if r is not None]
+    if not records:
+        raise HTTPException(status_code=404, detail="No matching objects in TLE store.")
+
+    try:
+        if times:
+            instants = [dt.datetime.fromisoformat(x.strip().replace("Z", "+00:00")).astimezone(dt.timezone.utc)
+                        for x in times.split(",") if x.strip()]
+        else:
+            start_time = (dt.datetime.fromisoformat(start_iso.replace("Z", "+00:00")).astimezone(dt.timezone.utc)
+                          if start_iso else dt.datetime.now(dt.timezone.utc))
+            instants = [start_time + dt.timedelta(seconds=k * step_s) for k in range(count)]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid time format. Use ISO 8601.")
+    if len(instants) > 10000:
+        raise HTTPException(status_code=400, detail="At most 10000 times per request.")
+    if (times or start_iso) and instants:
+        middle = min(instants) + (max(instants) - min(instants)) / 2
+        records = [_record_at(r, middle) for r in records]
+
+    t_s = np.array([seconds_since_j2000(t) for t in instants])
+    r, v, ok = get_ephemeris_cache().evaluate(records, t_s)
+    iso = [t.isoformat().replace("+00:00", "Z") for t in instants]
+
+    objects = []
+    for i, rec in enumerate(records):
+        objects.append({
+            "norad_id": rec.norad_id,
+            "name": rec.name,
+            "tle_epoch": _tle_epoch_iso(rec),
+            "samples": [
+                {"t": iso[k], "r_teme_km": r[i, k].round(6).tolist(), "v_teme_kms": v[i, k].round(9).tolist()}
+                if ok[i, k] else {"t": iso[k], "r_teme_km": None, "v_teme_kms": None}
+                for k in range(len(iso))
+            ],
+        })
+    return {"frame": "TEME", "objects": objects}
+
+
+@app.get("/api/passes")
+def api_passes(
+    lat: float = Query(..., ge=-90.0, le=90.0, description="Observer latitude [deg]"),
+    lon: float = Query(..., ge=-180.0, le=180.0, description="Observer longitude [deg]"),
+    alt_m: float = Query(0.0, ge=-500.0, le=9000.0, description="Observer altitude [m]"),
+    norad_ids: Optional[str] = Query(None, description="Comma-separated NORAD IDs"),
+    name_contains: Optional[str] = Query(None, description="Catalog filter on object name (used when norad_ids is absent)"),
+    limit: int = Query(1000, ge=1, le=5000, description="Maximum number of objects"),
+    start_iso: Optional[str] = Query(None, description="Start time ISO UTC, default=now"),
+    hours: float = Query(24.0, gt=0.0, le=72.0, description="Prediction window [h]"),
+    min_elevation_deg: float = Query(10.0, ge=0.0, le=89.0),
+    step_s: int = Query(60, ge=10, le=300, description="Coarse scan step [s]"),
+):
+    """
+    Tabel de treceri (răsărit / culminație / apus) deasupra unei stații de sol, pentru mai multe obiecte.
+    Scanare vectorizată a elevației pe toate obiectele simultan, apoi rafinare prin bisecție.
+    """
+    from passes import Observer, predict_passes
+
+    if norad_ids:
+        try:
+            ids = [int(x) for x in norad_ids.split(",") if x.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="norad_ids must be comma-separated integers.")
+        records = [r for r in (tle_store.get(i) for i in ids) if r is not None]
+        missing = [i for i in ids if tle_store.get(i) is None]
+    else:
+        needle = (name_contains or "").upper()
+        records = [r for r in tle_store.records() if needle in r.name.upper()]
+        missing = []
+    records = records[:limit]
+    if not records:
+        raise HTTPException(status_code=404, detail="No matching objects in TLE store.")
+
+    if start_iso:
+        try:
+            start_time = dt.datetime.fromisoformat(start_iso.replace("Z", "+00:00")).astimezone(dt.timezone.utc)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid start_iso format. Use ISO 8601.")
+        records = [_record_at(r, start_time + dt.timedelta(hours=hours / 2)) for r in records]
     else:
         start_time = dt.datetime.now(dt.timezone.utc)
 
-    samples = propagate_positions(rec, start_time, minutes=minutes, step_seconds=step_s)
-    return {"norad_id": norad_id, "name": rec.name, "samples": samples}
+    jd, fr = time_grid(start_time, minutes=int(round(hours * 60)), step_seconds=step_s)
+    observer = Observer(lat_deg=lat, lon_deg=lon, alt_km=alt_m / 1000.0)
+    found = predict_passes([satrec_from_record(r) for r in records], observer, jd, fr, min_elevation_deg)
+
+    def iso(offset_s: Optional[float]) -> Optional[str]:
+        if offset_s is None:
+            return None
+        return (start_time + dt.timedelta(seconds=offset_s)).isoformat().replace("+00:00", "Z")
+
+    passes = []
+    for p in found:
+        rec = records[p.index]
+        passes.append({
+            "norad_id": rec.norad_id,
+            "name": rec.name,
+            "rise_time": iso(p.rise_s),
+            "rise_azimuth_deg": round(p.rise_azimuth_deg, 2) if p.rise_azimuth_deg is not None else None,
+            "culmination_time": iso(p.culmination_s),
+            "max_elevation_deg": round(p.max_elevation_deg, 2),
+            "culmination_azimuth_deg": round(p.culmination_azimuth_deg, 2),
+            "set_time": iso(p.set_s),
+            "set_azimuth_deg": round(p.set_azimuth_deg, 2) if p.set_azimuth_deg is not None else None,
+            "duration_s": round(p.set_s - p.rise_s, 1) if p.rise_s is not None and p.set_s is not None else None,
+        })
+    passes.sort(key=lambda x: x["culmination_time"])
+
+    return {
+        "observer": {"lat_deg": lat, "lon_deg": lon, "alt_m": alt_m},
+        "start": iso(0.0),
+        "end": iso(float((jd[-1] - jd[0] + fr[-1] - fr[0]) * 86400.0)),
+        "min_elevation_deg": min_elevation_deg,
+        "objects": len(records),
+        "missing_norad_ids": missing,
+        "count": len(passes),
+        "passes": passes,
+    }
 
 
 @app.get("/api/debris/nasa")
@@ -283,34 +820,67 @@ def api_debris_nasa(
     norad_id: int = Query(..., description="NORAD catalog ID of satellite"),
     limit: int = Query(200, ge=10, le=1000, description="Maximum number of debris objects"),
     proximity_km: float = Query(1000.0, ge=100.0, le=5000.0, description="Proximity filter radius in km"),
+    minutes: int = Query(120, ge=1, le=1440, description="Screening window for closest approach / Pc [min]"),
+    sat_radius_m: float = Query(5.0, ge=0.1, le=100.0, description="Satellite hard-body radius [m]"),
+    pc_method: str = Query("foster", pattern="^(foster|chan)$", description="Pc method: foster | chan"),
 ):
     """
-    Încarcă deșeuri spațiale reale din NASA Space-Track și filtrează doar pe cele din proximitatea satelitului
+    Încarcă deșeuri spațiale reale din NASA Space-Track și filtrează doar pe cele din proximitatea satelitului.
+    Pentru fiecare deșeu din proximitate se calculează apropierea maximă din fereastra `minutes`
+    și probabilitatea de coliziune (Pc) în planul de întâlnire, cu covarianțe estimate din vârsta TLE.
     """
     rec: Optional[TLERecord] = tle_store.get(norad_id)
     if not rec:
         raise HTTPException(status_code=404, detail=f"NORAD {norad_id} not found in TLE store.")
 
     try:
-        # Calculez poziția curentă a satelitului pentru filtrare
-        from skyfield.api import load, EarthSatellite
-        ts = load.timescale()
-        satellite = EarthSatellite(rec.line1, rec.line2, rec.name, ts)
-        now = ts.now()
-        geocentric = satellite.at(now)
-        subpoint = geocentric.subpoint()
-        
-        satellite_pos = {
-            "latitude": float(subpoint.latitude.degrees),
-            "longitude": float(subpoint.longitude.degrees),
-            "altitude_km": float(subpoint.elevation.km) if subpoint.elevation.km > 0 else 400
-        }
-        
         # Încarcă toate deșeurile NASA disponibile
         all_debris = fetch_nasa_debris(limit * 3)  # Încarc mai multe pentru filtrare
-        
-        # Filtrează doar deșeurile din proximitate
-        nearby_debris = filter_debris_by_proximity(satellite_pos, all_debris, proximity_km)
+
+        # Propagare vectorizată: starea curentă (primul eșantion) și apropierea maximă din fereastră
+        import numpy as np
+        from sgp4.api import Satrec
+        from collision import approach_pc, satrec_epoch_jd
+        from debris import closest_approaches
+        from frames import teme_to_geodetic
+
+        now = dt.datetime.now(dt.timezone.utc)
+        sat_model = satrec_from_record(rec)
+        debris_models = [Satrec.twoline2rv(d["tle_line1"], d["tle_line2"]) for d in all_debris]
+        jd, fr = time_grid(now, minutes=minutes, step_seconds=60)
+        err, sat_r0, sat_v0 = sat_model.sgp4(jd[0], fr[0])
+        if err:
+            raise ValueError(f"SGP4 error {err} for the satellite")
+        sat_lat, sat_lon, sat_alt = teme_to_geodetic(np.array(sat_r0), jd[0], fr[0])
+        satellite_pos = {
+            "latitude": float(sat_lat),
+            "longitude": float(sat_lon),
+            "altitude_km": float(sat_alt) if sat_alt > 0 else 400
+        }
+
+        approach = closest_approaches(sat_model, debris_models, jd, fr)
+        lat0, lon0, alt0 = teme_to_geodetic(approach["r0_teme"], jd[0], fr[0])
+        hbr_km = (sat_radius_m + np.array([_RCS_RADIUS_M.get(d.get("rcs_size"), 0.5) for d in all_debris])) / 1000.0
+        pc = approach_pc(approach, float(jd[0] + fr[0]), satrec_epoch_jd(sat_model),
+                         [satrec_epoch_jd(m) for m in debris_models], hbr_km, method=pc_method)
+
+        propagated = []
+        propagated_idx = []
+        for i, debris in enumerate(all_debris):
+            if not approach["valid"][i]:
+                continue
+            debris["latitude"] = float(lat0[i])
+            debris["longitude"] = float(lon0[i])
+            debris["altitude"] = float(alt0[i])
+            debris["min_distance_km"] = round(float(approach["min_distance_km"][i]), 3)
+            debris["closest_approach_time"] = (now + dt.timedelta(seconds=float(approach["tca_offset_s"][i]))).isoformat().replace("+00:00", "Z")
+            debris["collision_probability"] = float(pc[i])
+            propagated.append(debris)
+            propagated_idx.append(i)
+
+        # Filtrează doar deșeurile din proximitate (distanța și viteza relativă din vectorii TEME)
+        nearby_debris = filter_debris_by_proximity(sat_r0, sat_v0, propagated, approach["r0_teme"][propagated_idx],
+                                                   approach["v0_teme"][propagated_idx], proximity_km)
         
         # Limitez la numărul solicitat
         filtered_debris = nearby_debris[:limit]
@@ -332,20 +902,20 @@ def api_debris_nasa(
             elif distance < 500:
                 risk_level = "MEDIUM"
             
-            # Calculez probabilitatea de coliziune bazată pe distanță și mărime
-            collision_prob = max(0, (1000 - distance) / 1000) * 0.001
-            if debris.get("rcs_size") == "LARGE":
-                collision_prob *= 2
-            
             collision_risks.append({
                 "debris_id": debris["norad_id"],
                 "debris_name": debris["name"],
                 "distance_km": distance,
                 "risk_level": risk_level,
-                "collision_probability": collision_prob,
+                "collision_probability": debris["collision_probability"],
+                "min_distance_km": debris["min_distance_km"],
+                "closest_approach_time": debris["closest_approach_time"],
                 "altitude_km": debris["altitude"],
                 "size": debris.get("rcs_size", "UNKNOWN")
             })
+
+        # Clasament după probabilitatea de coliziune
+        collision_risks.sort(key=lambda x: x["collision_probability"], reverse=True)
         
         return {
             "satellite_norad_id": norad_id,
@@ -357,8 +927,10 @@ def api_debris_nasa(
             "debris_objects": filtered_debris,
             "collision_risks": collision_risks,
             "high_risk_debris": high_risk_count,
+            "screening_window_minutes": minutes,
+            "pc_method": pc_method,
             "data_source": "NASA_SPACE_TRACK_SIMULATED",
-            "timestamp": now.utc_iso()
+            "timestamp": now.replace(microsecond=0).isoformat().replace("+00:00", "Z")
         }
         
     except Exception as e:
@@ -368,15 +940,28 @@ def api_debris_nasa(
 @app.get("/api/debris/real")
 def api_debris_real(
     norad_id: int = Query(..., description="NORAD catalog ID"),
-    limit: int = Query(100, ge=10, le=500, description="Maximum number of debris objects"),
+    limit: int = Query(100, ge=10, le=5000, description="Maximum number of debris objects"),
     danger_zone_km: float = Query(15.0, ge=1.0, le=100.0, description="Danger zone radius in km"),
+    minutes: int = Query(120, ge=1, le=1440, description="Screening window [min]"),
+    sat_radius_m: float = Query(5.0, ge=0.1, le=100.0, description="Satellite hard-body radius [m]"),
+    pc_method: str = Query("foster", pattern="^(foster|chan)$", description="Pc method: foster | chan"),
 ):
     """
-    Încarcă deșeuri spațiale reale din NASA Space-Track și calculează riscurile față de satelitul selectat
+    Încarcă deșeuri spațiale reale din NASA Space-Track și calculează riscurile față de satelitul selectat.
+    Fiecare deșeu are propriul set de elemente orbitale (perturbat dintr-un părinte real din catalog)
+    și este propagat pe aceeași grilă de timp ca satelitul. Riscurile sunt ordonate după probabilitatea
+    de coliziune (Pc) la TCA, cu covarianțe estimate din vârsta TLE-urilor.
+    Pentru ferestre lungi / multe deșeuri folosiți jobul "debris_real" (POST /api/jobs).
     """
-    import requests
-    import math
+    return _debris_real(norad_id, limit, danger_zone_km, minutes, sat_radius_m=sat_radius_m, pc_method=pc_method)
+
+
+def _debris_real(norad_id: int, limit: int, danger_zone_km: float, minutes: int, progress=None,
+                 sat_radius_m: float = 5.0, pc_method: str = "foster") -> Dict:
     from datetime import datetime, timezone
+    from collision import approach_pc, satrec_epoch_jd
+    from debris import perturb_elements, shell_overlaps, closest_approaches, FRAGMENTATION_SPREAD
+    from frames import teme_to_geodetic
     
     rec: Optional[TLERecord] = tle_store.get(norad_id)
     if not rec:
@@ -384,7 +969,7 @@ def api_debris_real(
 
     # Propagă orbita satelitului pentru referință
     start_time = datetime.now(timezone.utc)
-    satellite_samples = propagate_positions(rec, start_time, minutes=120, step_seconds=60)
+    satellite_samples = propagate_positions(rec, start_time, minutes=minutes, step_seconds=60)
     
     if not satellite_samples:
         raise HTTPException(status_code=500, detail="Failed to propagate satellite orbit")
@@ -401,80 +986,92 @@ def api_debris_real(
         
         # Generăm deșeuri bazate pe date statistice reale
         debris_types = [
-            {"name": "SL-16 R/B FRAGMENT", "size_range": (5, 50), "velocity_offset": (-0.8, 0.8)},
-            {"name": "FENGYUN 1C DEBRIS", "size_range": (1, 30), "velocity_offset": (-1.2, 1.2)},
-            {"name": "COSMOS 2251 DEBRIS", "size_range": (3, 40), "velocity_offset": (-0.9, 0.9)},
-            {"name": "IRIDIUM 33 DEBRIS", "size_range": (2, 35), "velocity_offset": (-1.0, 1.0)},
-            {"name": "UNKNOWN FRAGMENT", "size_range": (1, 20), "velocity_offset": (-1.5, 1.5)},
+            {"name": "SL-16 R/B FRAGMENT", "size_range": (5, 50)},
+            {"name": "FENGYUN 1C DEBRIS", "size_range": (1, 30)},
+            {"name": "COSMOS 2251 DEBRIS", "size_range": (3, 40)},
+            {"name": "IRIDIUM 33 DEBRIS", "size_range": (2, 35)},
+            {"name": "UNKNOWN FRAGMENT", "size_range": (1, 20)},
         ]
         
-        # Calculăm poziția medie a satelitului pentru distribuția deșeurilor
-        if satellite_samples:
-            avg_lat = sum(s["lat_deg"] for s in satellite_samples) / len(satellite_samples)
-            avg_lon = sum(s["lon_deg"] for s in satellite_samples) / len(satellite_samples)
-            avg_alt = sum(s["alt_km"] for s in satellite_samples) / len(satellite_samples)
-        else:
-            avg_lat, avg_lon, avg_alt = 0, 0, 400
+        # Calculăm poziția medie a satelitului pentru rezumat
+        avg_lat = sum(s["lat_deg"] for s in satellite_samples) / len(satellite_samples)
+        avg_lon = sum(s["lon_deg"] for s in satellite_samples) / len(satellite_samples)
+        avg_alt = sum(s["alt_km"] for s in satellite_samples) / len(satellite_samples)
+
+        # Părinți reali: deșeuri / corpuri de rachetă din catalog care intersectează pătura orbitală
+        # a satelitului; dacă nu există, fragmentele pornesc din orbita satelitului
+        sat_model = satrec_from_record(rec)
+        candidates = [r for r in tle_store.records()
+                      if r.norad_id != norad_id and ("DEB" in r.name.upper() or "R/B" in r.name.upper())]
+        candidate_models = [satrec_from_record(r) for r in candidates]
+        keep = shell_overlaps(sat_model, candidate_models, FRAGMENTATION_SPREAD.alt_km)
+        parents = [candidate_models[k] for k in keep] or [sat_model]
+        parent_names = [candidates[k].name for k in keep] or [None]
+
+        jd, fr = time_grid(start_time, minutes=minutes, step_seconds=60)
+        try:
+            # Părinții pe care SGP4 nu-i poate duce la momentul fragmentării (TLE-uri vechi) sunt omiși
+            debris_models, parent_idx = perturb_elements(parents, limit, FRAGMENTATION_SPREAD, epoch=(jd[0], fr[0]))
+        except ValueError:
+            if parents == [sat_model]:
+                raise
+            parents, parent_names = [sat_model], [None]
+            debris_models, parent_idx = perturb_elements(parents, limit, FRAGMENTATION_SPREAD, epoch=(jd[0], fr[0]))
+        approach = closest_approaches(sat_model, debris_models, jd, fr, progress=progress)
+        lat0, lon0, alt0 = teme_to_geodetic(approach["r0_teme"], jd[0], fr[0])
+
+        # Pc la TCA: fragmentele moștenesc incertitudinea (vârsta TLE) părintelui
+        sizes_cm = [random.uniform(*debris_types[i % len(debris_types)]["size_range"]) for i in range(limit)]
+        parent_epochs = [satrec_epoch_jd(p) for p in parents]
+        pc = approach_pc(approach, float(jd[0] + fr[0]), satrec_epoch_jd(sat_model),
+                         [parent_epochs[int(k)] for k in parent_idx],
+                         [(sat_radius_m + size / 200.0) / 1000.0 for size in sizes_cm], method=pc_method)
 
         for i in range(limit):
             debris_type = debris_types[i % len(debris_types)]
+            parent_name = parent_names[int(parent_idx[i])]
+            model = debris_models[i]
             
-            # Distribuie deșeurile în zona orbitei satelitului cu variații realiste
-            lat_var = random.uniform(-15, 15)  # Variație latitudine ±15°
-            lon_var = random.uniform(-20, 20)  # Variație longitudine ±20°
-            alt_var = random.uniform(-200, 200)  # Variație altitudine ±200km
-            
-            debris_lat = max(-90, min(90, avg_lat + lat_var))
-            debris_lon = (avg_lon + lon_var) % 360
-            if debris_lon > 180:
-                debris_lon -= 360
-            debris_alt = max(150, avg_alt + alt_var)  # Minimum 150km altitudine
-            
-            size_cm = random.uniform(*debris_type["size_range"])
-            velocity_diff = random.uniform(*debris_type["velocity_offset"])
-            
+            size_cm = sizes_cm[i]
             # Calculăm masa estimată bazată pe dimensiune (formula empirică)
             mass_kg = (size_cm / 10) ** 2.5 * random.uniform(0.1, 2.0)
+
+            valid = bool(approach["valid"][i])
+            min_distance_km = float(approach["min_distance_km"][i])
+            relative_velocity = float(approach["rel_speed_kms"][i]) if valid else None
+            closest_time = (start_time + dt.timedelta(seconds=float(approach["tca_offset_s"][i]))).isoformat().replace("+00:00", "Z")
             
             debris_obj = {
                 "id": f"DEBRIS_{i+1:04d}",
-                "name": f"{debris_type['name']} #{i+1}",
+                "name": f"{parent_name or debris_type['name']} #{i+1}",
                 "norad_id": f"90000{i+1:03d}",  # ID-uri simulate pentru deșeuri
-                "lat_deg": debris_lat,
-                "lon_deg": debris_lon,
-                "alt_km": debris_alt,
+                "lat_deg": float(lat0[i]) if approach["valid"][i] else None,
+                "lon_deg": float(lon0[i]) if approach["valid"][i] else None,
+                "alt_km": float(alt0[i]) if approach["valid"][i] else None,
+                "inclination_deg": round(math.degrees(model.inclo), 4),
+                "raan_deg": round(math.degrees(model.nodeo), 4),
+                "eccentricity": round(model.ecco, 6),
+                "mean_motion_rev_day": round(model.no_kozai * 1440 / (2 * math.pi), 8),
+                "parent": parent_name or rec.name,
                 "size_cm": size_cm,
                 "mass_kg": mass_kg,
-                "velocity_diff_kms": velocity_diff,
+                "velocity_diff_kms": relative_velocity,
+                "min_distance_km": round(min_distance_km, 3) if approach["valid"][i] else None,
+                "closest_approach_time": closest_time if approach["valid"][i] else None,
+                "collision_probability": float(pc[i]),
                 "threat_level": "LOW",
                 "object_type": "DEBRIS",
                 "source": "NASA_SPACE_TRACK"
             }
             
-            # Calculăm distanța minimă față de satelit
-            min_distance_km = float('inf')
-            closest_time = None
-            
-            for sample in satellite_samples:
-                # Distanța sferică (haversine) plus diferența de altitudine
-                dlat = math.radians(debris_lat - sample["lat_deg"])
-                dlon = math.radians(debris_lon - sample["lon_deg"])
-                a = (math.sin(dlat/2)**2 + 
-                     math.cos(math.radians(debris_lat)) * 
-                     math.cos(math.radians(sample["lat_deg"])) * 
-                     math.sin(dlon/2)**2)
-                distance_surface = 6371 * 2 * math.asin(math.sqrt(a))
-                
-                alt_diff = abs(debris_alt - sample["alt_km"])
-                distance_3d = math.sqrt(distance_surface**2 + alt_diff**2)
-                
-                if distance_3d < min_distance_km:
-                    min_distance_km = distance_3d
-                    closest_time = sample["t"]
-            
-            # Clasificăm riscul îmbunătățit bazat pe proximitate, dimensiune și viteză
-            proximity_risk = debris_obj.get("proximity_risk_factor", 0)
-            base_risk_factor = (size_cm * abs(velocity_diff)) / max(min_distance_km, 0.1)
+            if not valid:
+                # Propagare eșuată: fără distanță sau viteză relativă, deci fără clasificare de risc
+                debris_objects.append(debris_obj)
+                continue
+
+            # Clasificăm riscul bazat pe distanța minimă reală, dimensiune și viteza relativă la TCA
+            proximity_risk = max(0.0, 1.0 - min_distance_km / danger_zone_km)
+            base_risk_factor = (size_cm * relative_velocity) / max(min_distance_km, 0.1)
             
             # Combinăm factorul de risc tradițional cu cel de proximitate
             combined_risk_factor = (base_risk_factor * 0.6) + (proximity_risk * 100 * 0.4)
@@ -501,13 +1098,14 @@ def api_debris_real(
                     "velocity_diff_kms": round(debris_obj["velocity_diff_kms"], 2),
                     "risk_factor": round(combined_risk_factor, 2),
                     "proximity_risk": round(proximity_risk, 4),
-                    "relative_velocity": round(debris_obj.get("relative_velocity_kms", 0), 3)
+                    "relative_velocity": round(relative_velocity, 3),
+                    "collision_probability": float(pc[i])
                 })
             
             debris_objects.append(debris_obj)
         
-        # Sortăm riscurile după factorul de risc
-        collision_risks.sort(key=lambda x: x["risk_factor"], reverse=True)
+        # Sortăm riscurile după probabilitatea de coliziune, apoi după factorul de risc
+        collision_risks.sort(key=lambda x: (x["collision_probability"], x["risk_factor"]), reverse=True)
         
         return {
             "satellite": {
@@ -521,34 +1119,50 @@ def api_debris_real(
             "debris": debris_objects,
             "collision_risks": collision_risks[:20],  # Top 20 riscuri
             "danger_zone_km": danger_zone_km,
+            "screening_window_minutes": minutes,
+            "pc_method": pc_method,
+            "max_collision_probability": float(pc.max()) if len(pc) else 0.0,
             "total_debris": len(debris_objects),
             "high_risk_debris": len([r for r in collision_risks if r["threat_level"] in ["HIGH", "CRITICAL"]]),
             "data_source": "NASA_SPACE_TRACK_SIMULATED",
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
         
+    except JobCancelled:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading real debris data: {str(e)}")
 
 
 @app.get("/api/satellite/details")
-def api_satellite_details(norad_id: int = Query(..., description="NORAD catalog ID")):
+def api_satellite_details(request: Request, norad_id: int = Query(..., description="NORAD catalog ID")):
     """
     Returnează informații detaliate despre un satelit
     """
     rec: Optional[TLERecord] = tle_store.get(norad_id)
     if not rec:
         raise HTTPException(status_code=404, detail=f"NORAD {norad_id} not found in TLE store.")
-    
+
+    # Poziția "curentă" e calculată pe cuante de timp ca cererile simultane să fie comasate
+    now_utc = quantized_now()
+    return cached_json_response(
+        request, (rec.line1, rec.line2, now_utc.isoformat()),
+        lambda: _satellite_details(rec, now_utc), seconds_left_in_quantum(),
+    )
+
+
+def _satellite_details(rec: TLERecord, now_utc: dt.datetime) -> Dict:
+    norad_id = rec.norad_id
+
     # Calculăm parametrii orbitali din TLE
-    from skyfield.api import load, EarthSatellite
+    from skyfield.api import EarthSatellite
     
     try:
-        ts = load.timescale()
+        ts = get_timescale()
         satellite = EarthSatellite(rec.line1, rec.line2, rec.name, ts)
         
         # Calculăm orbita curentă
-        now = ts.now()
+        now = ts.from_datetime(now_utc)
         geocentric = satellite.at(now)
         subpoint = geocentric.subpoint()
         
@@ -593,15 +1207,26 @@ def api_satellite_details(norad_id: int = Query(..., description="NORAD catalog
 def api_debris_simulate(
     norad_id: int = Query(..., description="NORAD catalog ID"),
     minutes: int = Query(120, ge=1, le=1440),
-    debris_count: int = Query(50, ge=10, le=200),
+    debris_count: int = Query(50, ge=10, le=5000),
     danger_zone_km: float = Query(10.0, ge=1.0, le=100.0),
+    sat_radius_m: float = Query(5.0, ge=0.1, le=100.0, description="Satellite hard-body radius [m]"),
+    pc_method: str = Query("foster", pattern="^(foster|chan)$", description="Pc method: foster | chan"),
 ):
     """
-    Simulează deșeuri spațiale pe aceeași orbită cu satelitul și identifică potențiale coliziuni
+    Simulează deșeuri spațiale pe aceeași orbită cu satelitul și identifică potențiale coliziuni.
+    Deșeurile sunt seturi de elemente perturbate din orbita satelitului, propagate odată cu acesta;
+    riscurile sunt ordonate după probabilitatea de coliziune (Pc) la TCA.
+    Pentru simulări lungi folosiți jobul "debris_simulate" (POST /api/jobs).
     """
-    import random
-    import math
-    
+    return _debris_simulate(norad_id, minutes, debris_count, danger_zone_km, sat_radius_m=sat_radius_m, pc_method=pc_method)
+
+
+def _debris_simulate(norad_id: int, minutes: int, debris_count: int, danger_zone_km: float, progress=None,
+                     sat_radius_m: float = 5.0, pc_method: str = "foster") -> Dict:
+    from collision import approach_pc, satrec_epoch_jd
+    from debris import perturb_elements, closest_approaches, CO_ORBITAL_SPREAD
+    from frames import teme_to_geodetic
+
     rec: Optional[TLERecord] = tle_store.get(norad_id)
     if not rec:
         raise HTTPException(status_code=404, detail=f"NORAD {norad_id} not found in TLE store.")
@@ -613,57 +1238,42 @@ def api_debris_simulate(
     if not satellite_samples:
         raise HTTPException(status_code=500, detail="Failed to propagate satellite orbit")
 
-    # Generează deșeuri simulate pe orbită
+    # Generează deșeuri pe orbite vecine și le propagă vectorizat pe aceeași grilă de timp
+    sat_model = satrec_from_record(rec)
+    jd, fr = time_grid(start_time, minutes=minutes, step_seconds=60)
+    try:
+        debris_models, _ = perturb_elements([sat_model], debris_count, CO_ORBITAL_SPREAD, epoch=(jd[0], fr[0]))
+        approach = closest_approaches(sat_model, debris_models, jd, fr, progress=progress)
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to propagate debris: {e}")
+    lat0, lon0, alt0 = teme_to_geodetic(approach["r0_teme"], jd[0], fr[0])
+
+    # Deșeurile provin din orbita satelitului: aceeași vârstă TLE pentru ambele obiecte
+    sizes_cm = [random.uniform(1, 50) for _ in range(debris_count)]
+    sat_epoch = satrec_epoch_jd(sat_model)
+    pc = approach_pc(approach, float(jd[0] + fr[0]), sat_epoch, sat_epoch,
+                     [(sat_radius_m + size / 200.0) / 1000.0 for size in sizes_cm], method=pc_method)
+
     debris_objects = []
     collision_risks = []
     
     for i in range(debris_count):
-        # Selectează un punct random de pe orbita satelitului
-        base_sample = random.choice(satellite_samples)
-        
-        # Adaugă variație random pentru poziția deșeului
-        lat_offset = random.uniform(-2.0, 2.0)  # ±2 grade latitudine
-        lon_offset = random.uniform(-2.0, 2.0)  # ±2 grade longitudine  
-        alt_offset = random.uniform(-5.0, 5.0)  # ±5 km altitudine
-        
-        debris_lat = base_sample["lat_deg"] + lat_offset
-        debris_lon = base_sample["lon_deg"] + lon_offset
-        debris_alt = base_sample["alt_km"] + alt_offset
-        
-        # Simulează mișcarea deșeului cu viteze random
-        velocity_offset = random.uniform(-0.5, 0.5)  # km/s diferență de viteză
-        
+        min_distance_km = float(approach["min_distance_km"][i])
+        closest_time = (start_time + dt.timedelta(seconds=float(approach["tca_offset_s"][i]))).isoformat().replace("+00:00", "Z")
+
         debris_obj = {
             "id": f"DEBRIS_{i:03d}",
-            "lat_deg": debris_lat,
-            "lon_deg": debris_lon, 
-            "alt_km": max(debris_alt, 100),  # minimum 100km
-            "size_cm": random.uniform(1, 50),
-            "velocity_diff_kms": velocity_offset,
+            "lat_deg": float(lat0[i]) if approach["valid"][i] else None,
+            "lon_deg": float(lon0[i]) if approach["valid"][i] else None,
+            "alt_km": float(alt0[i]) if approach["valid"][i] else None,
+            "size_cm": sizes_cm[i],
+            "velocity_diff_kms": float(approach["rel_speed_kms"][i]) if approach["valid"][i] else None,
+            "collision_probability": float(pc[i]),
             "threat_level": "LOW"
         }
         
-        # Calculează distanța față de satelit pentru fiecare sample
-        min_distance_km = float('inf')
-        closest_time = None
-        
-        for sample in satellite_samples:
-            # Distanța aproximativă folosind formula haversine simplificată
-            dlat = math.radians(debris_lat - sample["lat_deg"])
-            dlon = math.radians(debris_lon - sample["lon_deg"])
-            a = math.sin(dlat/2)**2 + math.cos(math.radians(debris_lat)) * math.cos(math.radians(sample["lat_deg"])) * math.sin(dlon/2)**2
-            distance_surface = 6371 * 2 * math.asin(math.sqrt(a))  # km pe suprafață
-            
-            # Adaugă diferența de altitudine
-            alt_diff = abs(debris_alt - sample["alt_km"])
-            distance_3d = math.sqrt(distance_surface**2 + alt_diff**2)
-            
-            if distance_3d < min_distance_km:
-                min_distance_km = distance_3d
-                closest_time = sample["t"]
-        
-        # Determină nivelul de risc
-        if min_distance_km < danger_zone_km:
+        # Determină nivelul de risc (nu și pentru deșeurile a căror propagare a eșuat)
+        if approach["valid"][i] and min_distance_km < danger_zone_km:
             if min_distance_km < danger_zone_km / 3:
                 debris_obj["threat_level"] = "CRITICAL"
             elif min_distance_km < danger_zone_km / 1.5:
@@ -677,13 +1287,15 @@ def api_debris_simulate(
                 "min_distance_km": round(min_distance_km, 2),
                 "closest_approach_time": closest_time,
                 "threat_level": debris_obj["threat_level"],
-                "debris_size_cm": debris_obj["size_cm"]
+                "debris_size_cm": debris_obj["size_cm"],
+                "relative_velocity_kms": round(debris_obj["velocity_diff_kms"], 3),
+                "collision_probability": debris_obj["collision_probability"]
             })
         
         debris_objects.append(debris_obj)
     
-    # Sortează riscurile după distanță
-    collision_risks.sort(key=lambda x: x["min_distance_km"])
+    # Sortează riscurile după probabilitatea de coliziune, apoi după distanță
+    collision_risks.sort(key=lambda x: (-x["collision_probability"], x["min_distance_km"]))
     
     return {
         "satellite": {
@@ -695,6 +1307,8 @@ def api_debris_simulate(
         "collision_risks": collision_risks,
         "danger_zone_km": danger_zone_km,
         "simulation_time_minutes": minutes,
+        "pc_method": pc_method,
+        "max_collision_probability": float(pc.max()) if len(pc) else 0.0,
         "total_debris": len(debris_objects),
         "high_risk_debris": len([r for r in collision_risks if r["threat_level"] in ["HIGH", "CRITICAL"]])
     }
@@ -702,6 +1316,8 @@ def api_debris_simulate(
 
 @app.post("/api/detect")
 async def api_detect(file: UploadFile = File(...)):
+    from classifier import classify_image
+
     content = await file.read()
     label, conf, meta = classify_image(io.BytesIO(content))
     return {"label": label, "confidence": conf, "meta": meta}
@@ -722,6 +1338,7 @@ def api_spaceweather_donki(
 
 @app.get("/api/risk/ordem")
 def api_risk_ordem(
+    request: Request,
     norad_id: int = Query(..., description="NORAD catalog ID"),
     alt_km: float = Query(..., description="Mean altitude [km] for evaluation"),
     area_m2: float = Query(10.0, gt=0, description="Cross-section area [m^2]"),
@@ -733,6 +1350,16 @@ def api_risk_ordem(
     if not rec:
         raise HTTPException(status_code=404, detail=f"NORAD {norad_id} not found in TLE store.")
 
+    # Rezultatul depinde doar de TLE și de parametri; clientul revalidează cu If-None-Match
+    return cached_json_response(
+        request, (rec.line1, rec.line2),
+        lambda: _risk_ordem(rec, alt_km, area_m2, size_min_cm, size_max_cm, duration_days),
+    )
+
+
+def _risk_ordem(rec: TLERecord, alt_km: float, area_m2: float, size_min_cm: float, size_max_cm: float,
+                duration_days: float) -> Dict:
+    norad_id = rec.norad_id
     try:
         inc_deg = inclination_from_tle(rec.line1, rec.line2, rec.name)
         flux = flux_ordem_like(alt_km, inc_deg, size_min_cm, size_max_cm)  # #/m^2/year
@@ -778,6 +1405,378 @@ def api_risk_ordem(
         raise HTTPException(status_code=500, detail=f"Risk calculation failed: {e}")
 
 
+# ---------------------------------------------------------------------------
+# Joburi de fundal
+# ---------------------------------------------------------------------------
+
+def _job_debris_real(ctx, norad_id: int, limit: int = 1000, danger_zone_km: float = 15.0, minutes: int = 1440,
+                     sat_radius_m: float = 5.0, pc_method: str = "foster") -> Dict:
+    result = _debris_real(int(norad_id), int(limit), float(danger_zone_km), int(minutes), progress=ctx.progress,
+                          sat_radius_m=float(sat_radius_m), pc_method=pc_method)
+    result["items"] = result.pop("debris")
+    return result
+
+
+def _job_debris_simulate(ctx, norad_id: int, minutes: int = 1440, debris_count: int = 1000,
+                         danger_zone_km: float = 10.0, sat_radius_m: float = 5.0, pc_method: str = "foster") -> Dict:
+    result = _debris_simulate(int(norad_id), int(minutes), int(debris_count), float(danger_zone_km), progress=ctx.progress,
+                              sat_radius_m=float(sat_radius_m), pc_method=pc_method)
+    result["items"] = result.pop("debris")
+    return result
+
+
+def _job_catalog_screening(ctx, norad_id: int, minutes: int = 1440, step_s: int = 60,
+                           threshold_km: float = 50.0, start_iso: Optional[str] = None,
+                           hbr_m: float = 10.0, pc_method: str = "foster") -> Dict:
+    """
+    Apropieri ale satelitului față de toate obiectele reale din catalog, ordonate după Pc
+    (raza combinată `hbr_m`, covarianțe din vârsta TLE-urilor), apoi după distanță.
+    """
+    from collision import approach_pc, satrec_epoch_jd
+    from debris import closest_approaches, shell_overlaps
+
+    rec = tle_store.get(int(norad_id))
+    if rec is None:
+        raise ValueError(f"NORAD {norad_id} not found in TLE store.")
+    start_time = (dt.datetime.fromisoformat(start_iso.replace("Z", "+00:00")).astimezone(dt.timezone.utc)
+                  if start_iso else dt.datetime.now(dt.timezone.utc))
+
+    sat_model = satrec_from_record(rec)
+    others = [r for r in tle_store.records() if r.norad_id != rec.norad_id]
+    models = [satrec_from_record(r) for r in others]
+    ctx.progress(0, 1, f"{len(others)} catalog objects")
+    keep = shell_overlaps(sat_model, models, threshold_km)
+    jd, fr = time_grid(start_time, minutes=int(minutes), step_seconds=int(step_s))
+    approach = closest_approaches(sat_model, [models[k] for k in keep], jd, fr, progress=ctx.progress)
+    pc = approach_pc(approach, float(jd[0] + fr[0]), satrec_epoch_jd(sat_model),
+                     [satrec_epoch_jd(models[k]) for k in keep], float(hbr_m) / 1000.0, method=pc_method)
+
+    items = []
+    for j, k in enumerate(keep):
+        d = float(approach["min_distance_km"][j])
+        if not approach["valid"][j] or d > threshold_km:
+            continue
+        tca = start_time + dt.timedelta(seconds=float(approach["tca_offset_s"][j]))
+        items.append({
+            "norad_id": others[k].norad_id,
+            "name": others[k].name,
+            "min_distance_km": round(d, 3),
+            "closest_approach_time": tca.isoformat().replace("+00:00", "Z"),
+            "relative_velocity_kms": round(float(approach["rel_speed_kms"][j]), 3),
+            "collision_probability": float(pc[j]),
+        })
+    items.sort(key=lambda x: (-x["collision_probability"], x["min_distance_km"]))
+    return {
+        "norad_id": rec.norad_id,
+        "name": rec.name,
+        "start": start_time.isoformat().replace("+00:00", "Z"),
+        "window_minutes": int(minutes),
+        "threshold_km": threshold_km,
+        "pc_method": pc_method,
+        "catalog_objects": len(others),
+        "screened_objects": len(keep),
+        "items": items,
+    }
+
+
+def _job_fleet_risk(ctx, norad_ids: Optional[List[int]] = None, name_contains: str = "", area_m2: float = 10.0,
+                    size_min_cm: float = 1.0, size_max_cm: float = 10.0, duration_days: float = 365.0) -> Dict:
+    """Clasament ORDEM-like al probabilității de coliziune pentru o flotă (ID-uri sau filtru de nume)."""
+    from tle_store import parse_elements
+
+    if norad_ids:
+        records = [r for r in (tle_store.get(int(i)) for i in norad_ids) if r is not None]
+    else:
+        needle = name_contains.upper()
+        records = [r for r in tle_store.records() if needle in r.name.upper()]
+
+    mu = 398600.4418
+    items = []
+    for n, rec in enumerate(records):
+        try:
+            _, inc, _, ecc, _, _, mean_motion, _, _ = parse_elements(rec.line1, rec.line2)
+            n_rad_s = mean_motion * 2 * math.pi / 86400.0
+            a_km = (mu / (n_rad_s * n_rad_s)) ** (1.0 / 3.0)
+            alt_km = a_km - 6378.137
+            flux = flux_ordem_like(alt_km, inc, size_min_cm, size_max_cm)
+            prob = annual_collision_probability(area_m2, duration_days / 365.0, flux)
+        except (ValueError, ZeroDivisionError):
+            continue
+        items.append({
+            "norad_id": rec.norad_id,
+            "name": rec.name,
+            "mean_altitude_km": round(alt_km, 1),
+            "inclination_deg": inc,
+            "eccentricity": ecc,
+            "flux_per_m2_per_year": flux,
+            "collision_probability": prob,
+        })
+        if n % 200 == 0:
+            ctx.progress(n + 1, len(records))
+    items.sort(key=lambda x: x["collision_probability"], reverse=True)
+    return {
+        "objects": len(records),
+        "area_m2": area_m2,
+        "size_bin_cm": [size_min_cm, size_max_cm],
+        "duration_days": duration_days,
+        "items": items,
+    }
+
+
+def _job_monte_carlo_pc(ctx, norad_id: int, other_norad_ids: List[int], minutes: int = 1440,
+                        start_iso: Optional[str] = None, hbr_m: float = 10.0, window_s: float = 600.0,
+                        step_s: float = 5.0, max_samples: int = 10_000_000, rel_tol: float = 0.1,
+                        abs_tol: float = 1e-6, seed: Optional[int] = None) -> Dict:
+    """
+    Pc Monte Carlo (cu interval de încredere) pentru apropierea maximă a satelitului de fiecare obiect
+    din `other_norad_ids`, alături de Pc 2D pentru comparație. Procesele: MC_WORKERS (implicit nr. de CPU).
+    """
+    from collision import approach_pc, satrec_epoch_jd
+    from debris import closest_approaches
+    from montecarlo import monte_carlo_pc, spawn_pool
+
+    rec = tle_store.get(int(norad_id))
+    if rec is None:
+        raise ValueError(f"NORAD {norad_id} not found in TLE store.")
+    others = [tle_store.get(int(k)) for k in other_norad_ids]
+    missing = [int(k) for k, r in zip(other_norad_ids, others) if r is None]
+    if missing:
+        raise ValueError(f"NORAD {missing} not found in TLE store.")
+    start_time = (dt.datetime.fromisoformat(start_iso.replace("Z", "+00:00")).astimezone(dt.timezone.utc)
+                  if start_iso else dt.datetime.now(dt.timezone.utc))
+
+    sat_model = satrec_from_record(rec)
+    models = [satrec_from_record(r) for r in others]
+    jd, fr = time_grid(start_time, minutes=int(minutes), step_seconds=60)
+    approach = closest_approaches(sat_model, models, jd, fr)
+    hbr_km = float(hbr_m) / 1000.0
+    pc_2d = approach_pc(approach, float(jd[0] + fr[0]), satrec_epoch_jd(sat_model),
+                        [satrec_epoch_jd(m) for m in models], hbr_km)
+    workers = int(os.getenv("MC_WORKERS", "0")) or os.cpu_count() or 1
+    # Un singur pool de procese pentru toate apropierile jobului (pornirea "spawn" costă secunde)
+    pool = spawn_pool(workers) if workers > 1 and approach["valid"].any() else None
+
+    items = []
+    try:
+        for j, (other, model) in enumerate(zip(others, models)):
+            item = {"norad_id": other.norad_id, "name": other.name}
+            if not approach["valid"][j]:
+                items.append({**item, "error": "SGP4 propagation failed"})
+                continue
+            tca_s = float(approach["tca_offset_s"][j])
+            mc = monte_carlo_pc(
+                sat_model, model, float(jd[0]), float(fr[0]) + tca_s / 86400.0, hbr_km,
+                window_s=float(window_s), step_s=float(step_s), max_samples=int(max_samples),
+                rel_tol=float(rel_tol), abs_tol=float(abs_tol), workers=workers, seed=seed, pool=pool,
+                progress=lambda done, total, j=j: ctx.progress(j + done / total, len(models), other.name),
+            )
+            items.append({
+                **item,
+                "min_distance_km": round(float(approach["min_distance_km"][j]), 3),
+                "closest_approach_time": (start_time + dt.timedelta(seconds=tca_s)).isoformat().replace("+00:00", "Z"),
+                "relative_velocity_kms": round(float(approach["rel_speed_kms"][j]), 3),
+                "collision_probability": mc.pc,
+                "confidence_interval": [mc.ci_low, mc.ci_high],
+                "confidence": mc.confidence,
+                "converged": mc.converged,
+                "samples": mc.samples,
+                "hits": mc.hits,
+                "wall_time_s": round(mc.wall_time_s, 3),
+                "collision_probability_2d": float(pc_2d[j]),
+            })
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+    return {
+        "norad_id": rec.norad_id,
+        "name": rec.name,
+        "start": start_time.isoformat().replace("+00:00", "Z"),
+        "window_minutes": int(minutes),
+        "hbr_m": hbr_m,
+        "items": items,
+    }
+
+
+def _on_catalog_snapshot(fn):
+    """Jobul citește tot catalogul dintr-un singur snapshot; rezultatul poartă generația acestuia."""
+    @wraps(fn)
+    def run(ctx, **params):
+        with tle_store.pinned() as box:
+            result = fn(ctx, **params)
+            result.setdefault("catalog_generation", box[0].generation)
+            return result
+    return run
+
+
+job_manager.register("debris_real", _on_catalog_snapshot(_job_debris_real))
+job_manager.register("debris_simulate", _on_catalog_snapshot(_job_debris_simulate))
+job_manager.register("catalog_screening", _on_catalog_snapshot(_job_catalog_screening))
+job_manager.register("fleet_risk", _on_catalog_snapshot(_job_fleet_risk))
+job_manager.register("monte_carlo_pc", _on_catalog_snapshot(_job_monte_carlo_pc))
+
+
+# Aceleași limite ca parametrii Query ai endpoint-urilor echivalente (ge/gt/le sau valorile permise)
+_PC_METHODS = ("foster", "chan")
+_JOB_PARAM_LIMITS: Dict[str, Dict[str, Any]] = {
+    "debris_real": {"limit": {"ge": 10, "le": 5000}, "minutes": {"ge": 1, "le": 1440},
+                    "danger_zone_km": {"ge": 1.0, "le": 100.0}, "sat_radius_m": {"ge": 0.1, "le": 100.0},
+                    "pc_method": _PC_METHODS},
+    "debris_simulate": {"minutes": {"ge": 1, "le": 1440}, "debris_count": {"ge": 10, "le": 5000},
+                        "danger_zone_km": {"ge": 1.0, "le": 100.0}, "sat_radius_m": {"ge": 0.1, "le": 100.0},
+                        "pc_method": _PC_METHODS},
+    "catalog_screening": {"minutes": {"ge": 1, "le": 1440}, "step_s": {"ge": 5, "le": 3600},
+                          "threshold_km": {"ge": 1.0, "le": 100.0}, "hbr_m": {"ge": 0.1, "le": 100.0},
+                          "pc_method": _PC_METHODS},
+    # Ca /api/risk/ordem
+    "fleet_risk": {"area_m2": {"gt": 0.0}, "size_min_cm": {"ge": 0.01}, "size_max_cm": {"ge": 0.01},
+                   "duration_days": {"gt": 0.0}},
+    # Cel puțin un lot (batch_size din montecarlo); plafonul ține jobul sub câteva minute
+    "monte_carlo_pc": {"minutes": {"ge": 1, "le": 1440}, "hbr_m": {"ge": 0.1, "le": 100.0},
+                       "window_s": {"ge": 10.0, "le": 3600.0}, "step_s": {"ge": 0.5, "le": 60.0},
+                       "max_samples": {"ge": 50_000, "le": 50_000_000},
+                       "rel_tol": {"gt": 0.0, "le": 1.0}, "abs_tol": {"gt": 0.0, "le": 1.0}},
+}
+
+
+def _check_job_params(kind: str, params: Dict[str, Any]) -> None:
+    """ValueError dacă un parametru al jobului iese din limitele endpoint-ului corespunzător."""
+    for name, allowed in _JOB_PARAM_LIMITS.get(kind, {}).items():
+        if name not in params:
+            continue
+        value = params[name]
+        if isinstance(allowed, tuple):
+            if value not in allowed:
+                raise ValueError(f"{name} must be one of: {', '.join(allowed)}.")
+            continue
+        integer = all(isinstance(bound, int) for bound in allowed.values())
+        number = isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+        if not number or (integer and value != int(value)):
+            raise ValueError(f"{name} must be {'an integer' if integer else 'a number'}.")
+        checks = {"ge": (value >= allowed.get("ge", value), "at least"),
+                  "gt": (value > allowed["gt"] if "gt" in allowed else True, "greater than"),
+                  "le": (value <= allowed.get("le", value), "at most")}
+        for op, (ok, words) in checks.items():
+            if not ok:
+                raise ValueError(f"{name} must be {words} {allowed[op]}.")
+
+
+class JobRequest(BaseModel):
+    kind: str
+    params: Dict[str, Any] = {}
+    priority: int = 5  # mai mic = rulează mai devreme
+
+
+@app.post("/api/jobs", status_code=202)
+def api_jobs_submit(req: JobRequest):
+    """
+    Pornește o analiză de durată și întoarce imediat ID-ul jobului.
+    """
+    try:
+        _check_job_params(req.kind, req.params)
+        job = job_manager.submit(req.kind, req.params, priority=req.priority)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid parameters for '{req.kind}': {e}")
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind '{req.kind}'. Use one of: {', '.join(job_manager.kinds)}.")
+    except TypeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid parameters for '{req.kind}': {e}")
+    return {"job_id": job.id, "status": job.status, "kind": job.kind}
+
+
+@app.get("/api/jobs")
+def api_jobs_list(limit: int = Query(50, ge=1, le=500)):
+    jobs = [j.to_dict() for j in job_manager.list(limit=limit)]
+    return {"count": len(jobs), "kinds": job_manager.kinds, "jobs": jobs}
+
+
+@app.get("/api/jobs/{job_id}")
+def api_jobs_get(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=5000, description="Page size for result items"),
+):
+    """
+    Starea și progresul jobului; când s-a terminat, rezumatul și o pagină din rezultate.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    body = job.to_dict()
+    if job.status == SUCCEEDED:
+        summary, items = job_manager.page(job_id, offset=offset, limit=limit)
+        body.update({
+            "summary": summary,
+            "offset": offset,
+            "limit": limit,
+            "items": items,
+            "next_offset": offset + limit if job.total_items is not None and offset + limit < job.total_items else None,
+        })
+    return body
+
+
+@app.delete("/api/jobs/{job_id}")
+def api_jobs_cancel(job_id: str):
+    """
+    Anulează un job în coadă sau în execuție; un job terminat este șters împreună cu rezultatele.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    if job.status in FINISHED:
+        job_manager.cancel(job_id)
+        return {"job_id": job_id, "status": job.status, "deleted": True}
+    job = job_manager.cancel(job_id)
+    # Un job în execuție se oprește la următorul raport de progres
+    return {"job_id": job_id, "status": job.status, "cancel_requested": True}
+
+
+class WatchlistRequest(BaseModel):
+    norad_ids: List[int]
+
+
+@app.get("/api/watchlist")
+def api_watchlist(request: Request):
+    """
+    Activele urmărite și apropierile lor (sub pragul WATCHLIST_THRESHOLD_KM, în fereastra curentă),
+    servite din memorie; `seq` este ultimul eveniment, pentru /api/watchlist/events.
+    """
+    watchlist = get_watchlist()
+    watchlist.sync_assets()
+    view = watchlist.view()
+    return cached_json_response(request, (view["version"],), lambda: view)
+
+
+@app.post("/api/watchlist", status_code=202)
+def api_watchlist_add(req: WatchlistRequest):
+    """Adaugă active; screening-ul lor complet rulează în fundal (starea "pending" până atunci)."""
+    if not req.norad_ids:
+        raise HTTPException(status_code=400, detail="No NORAD ids given.")
+    watchlist = get_watchlist()
+    added = watchlist.add(req.norad_ids)
+    return {"added": added, "missing": [i for i in added if tle_store.get(i) is None],
+            "assets": watchlist.assets}
+
+
+@app.delete("/api/watchlist/{norad_id}")
+def api_watchlist_remove(norad_id: int):
+    if not get_watchlist().remove(norad_id):
+        raise HTTPException(status_code=404, detail=f"NORAD {norad_id} is not on the watchlist.")
+    return {"removed": norad_id, "assets": get_watchlist().assets}
+
+
+@app.get("/api/watchlist/events")
+async def api_watchlist_events(
+    since: int = Query(0, ge=0, description="Last event sequence number already seen"),
+    wait_s: float = Query(0.0, ge=0.0, le=30.0, description="Long-poll: wait up to this long for a new event"),
+):
+    """
+    Schimbările apropierilor activelor (new / updated / cleared) după `since`; cu `wait_s` cererea
+    așteaptă primul eveniment nou (pe bucla de evenimente, fără un thread din pool ocupat).
+    `truncated` arată că evenimente mai vechi au fost deja eliminate.
+    """
+    return await get_watchlist().wait_events(since=since, wait_s=wait_s)
+
+
 @app.get("/", response_class=HTMLResponse)
 def index():
     index_path = os.path.join(CLIENT_DIR, "index.html")
@@ -785,4 +1784,6 @@ def index():
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 8001)), reload=False)
\ No newline at end of file
@@ -0,0 +1,266 @@
+"""Monte Carlo probability of collision for encounters where 2D Pc breaks down.
+
+The 2D encounter-plane methods in ``collision`` assume rectilinear relative
+motion and a short encounter; slow, co-orbital or repeated approaches
+violate both. Here the states of both objects at the start of a window
+around TCA are sampled from their covariances and every sample pair is
+flown through the window, counting the pairs that come within the combined
+hard-body radius.
+
+Samples are propagated with an RK4 two-body + J2 integrator, but only their
+*deviation* from the integrated nominal state is used: it is added to the
+SGP4 trajectory of each object, so the sample cloud is centred on the same
+orbits as the rest of the server while keeping the non-linear spreading of
+the deviations. Between grid points the relative motion is treated as
+linear, which is accurate for the default 5 s step.
+
+Batches are independent: each one draws from its own ``SeedSequence``
+child and can run in a process pool. The estimate stops as soon as the
+Wilson confidence interval is narrower than ``rel_tol`` (relative) or
+``abs_tol`` (absolute), or when ``max_samples`` is reached. Results are
+consumed in submission order and the stopping test runs after every batch,
+so a given ``seed`` gives the same estimate for any number of workers
+(batches computed ahead of the stopping point are discarded).
+"""
+from __future__ import annotations
+
+import math
+import multiprocessing
+import os
+import statistics
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+from sgp4.api import Satrec
+
+from collision import satrec_epoch_jd, tle_state_covariance
+
+MU_KM3_S2 = 398600.4418
+RE_KM = 6378.137
+J2 = 1.08262668e-3
+
+
+@dataclass
+class MonteCarloResult:
+    pc: float
+    ci_low: float
+    ci_high: float
+    confidence: float
+    hits: int
+    samples: int
+    batches: int
+    converged: bool                 # intervalul a atins toleranța înainte de max_samples
+    wall_time_s: float
+
+    @property
+    def samples_per_s(self) -> float:
+        return self.samples / self.wall_time_s if self.wall_time_s > 0 else 0.0
+
+
+def wilson_interval(hits: int, n: int, confidence: float = 0.95) -> Tuple[float, float]:
+    """Wilson score interval for a binomial proportion."""
+    if n <= 0:
+        return 0.0, 1.0
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2.0)
+    p = hits / n
+    denom = 1.0 + z * z / n
+    centre = (p + z * z / (2.0 * n)) / denom
+    half = z * math.sqrt(p * (1.0 - p) / n + z * z / (4.0 * n * n)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def _acceleration(r: np.ndarray) -> np.ndarray:
+    """Two-body + J2 acceleration; ``r`` has the components on the first axis."""
+    x, y, z = r
+    r2 = x * x + y * y + z * z
+    k = -MU_KM3_S2 / (r2 * np.sqrt(r2))
+    kj = k * (1.5 * J2 * RE_KM * RE_KM) / r2
+    a = r * (k - kj * (5.0 * z * z / r2 - 1.0))
+    a[2] += 2.0 * kj * z
+    return a
+
+
+def _rk4_step(r: np.ndarray, v: np.ndarray, h: float) -> Tuple[np.ndarray, np.ndarray]:
+    a1 = _acceleration(r)
+    v2 = v + 0.5 * h * a1
+    a2 = _acceleration(r + 0.5 * h * v)
+    v3 = v + 0.5 * h * a2
+    a3 = _acceleration(r + 0.5 * h * v2)
+    v4 = v + h * a3
+    a4 = _acceleration(r + h * v3)
+    return (r + h / 6.0 * (v + 2.0 * v2 + 2.0 * v3 + v4),
+            v + h / 6.0 * (a1 + 2.0 * a2 + 2.0 * a3 + a4))
+
+
+def _sample_batch(task) -> int:
+    """Number of hits among ``n`` sampled pairs (runs in a pool worker)."""
+    seed, n, x0, chol, nominal_rel, step_s, hbr_km = task
+    rng = np.random.default_rng(seed)
+
+    # Componentele pe prima axă (3, obiect, eșantion): operații pe vectori contigui.
+    # Eșantionul 0 al fiecărui obiect este starea nominală, integrată la fel ca celelalte.
+    states = np.empty((6, 2, n + 1))
+    for obj in range(2):
+        states[:, obj, 0] = x0[obj]
+        states[:, obj, 1:] = x0[obj][:, None] + chol[obj] @ rng.standard_normal((6, n))
+    r, v = states[:3], states[3:]
+
+    def relative(r_: np.ndarray, k: int) -> np.ndarray:
+        dev = r_[:, :, 1:] - r_[:, :, :1]
+        return nominal_rel[k][:, None] + dev[:, 1] - dev[:, 0]
+
+    prev = relative(r, 0)
+    best = np.einsum("in,in->n", prev, prev)
+    for k in range(1, len(nominal_rel)):
+        r, v = _rk4_step(r, v, step_s)
+        cur = relative(r, k)
+        # Minimul pe segment, cu mișcare relativă liniară între eșantioane
+        seg = cur - prev
+        seg2 = np.einsum("in,in->n", seg, seg)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            s = np.clip(np.where(seg2 > 0, -np.einsum("in,in->n", prev, seg) / seg2, 0.0), 0.0, 1.0)
+        closest = prev + seg * s
+        np.minimum(best, np.einsum("in,in->n", closest, closest), out=best)
+        prev = cur
+    return int(np.count_nonzero(best < hbr_km * hbr_km))
+
+
+def spawn_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool for ``monte_carlo_pc``, to be shared by the encounters of one job."""
+    # "spawn": sigur și din procese cu fire de execuție (uvicorn, joburi)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def monte_carlo_pc(
+    primary: Satrec,
+    secondary: Satrec,
+    tca_jd: float,
+    tca_fr: float,
+    hbr_km: float,
+    cov_primary: Optional[np.ndarray] = None,
+    cov_secondary: Optional[np.ndarray] = None,
+    window_s: float = 600.0,
+    step_s: float = 5.0,
+    batch_size: int = 50_000,
+    max_samples: int = 10_000_000,
+    rel_tol: float = 0.1,
+    abs_tol: float = 1e-6,
+    confidence: float = 0.95,
+    workers: Optional[int] = None,
+    seed: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    pool: Optional[ProcessPoolExecutor] = None,
+) -> MonteCarloResult:
+    """
+    Estimate Pc for the encounter of ``primary`` and ``secondary`` around
+    ``tca_jd + tca_fr``.
+
+    ``cov_primary``/``cov_secondary`` are 6x6 TEME position/velocity
+    covariances (km, km/s) at the start of the window, ``tca - window_s/2``;
+    by default they come from ``collision.tle_state_covariance`` and the age
+    of each TLE. ``workers`` processes share the batches (``None`` = one
+    per CPU, ``1`` = run in this process); pass ``pool`` (see
+    ``spawn_pool``) to reuse one pool across calls instead of starting one
+    here. ``progress(samples, max_samples)`` is called after every batch
+    and may raise to abort the estimate.
+    """
+    if max_samples <= 0 or batch_size <= 0:
+        raise ValueError("max_samples and batch_size must be positive.")
+    if window_s <= 0 or step_s <= 0:
+        raise ValueError("window_s and step_s must be positive.")
+    t0 = time.perf_counter()
+    n_steps = max(1, int(math.ceil(window_s / step_s)))
+    t_s = (np.arange(n_steps + 1) - n_steps / 2.0) * step_s
+    jd = np.full(len(t_s), float(tca_jd))
+    fr = float(tca_fr) + t_s / 86400.0
+
+    x0 = np.empty((2, 6))
+    nominal = []
+    for obj, model in enumerate((primary, secondary)):
+        err, r, v = model.sgp4_array(jd, fr)
+        if np.any(err):
+            raise ValueError(f"SGP4 failed inside the encounter window (error {int(err[err != 0][0])}).")
+        x0[obj, :3], x0[obj, 3:] = r[0], v[0]
+        nominal.append(r)
+    nominal_rel = nominal[1] - nominal[0]
+
+    start_jd = float(tca_jd) + float(fr[0])
+    covs = []
+    for obj, (model, cov) in enumerate(((primary, cov_primary), (secondary, cov_secondary))):
+        if cov is None:
+            cov = tle_state_covariance(x0[obj:obj + 1, :3], x0[obj:obj + 1, 3:],
+                                       np.array([start_jd - satrec_epoch_jd(model)]))[0]
+        covs.append(np.asarray(cov, dtype=float))
+    chol = np.stack([np.linalg.cholesky(c) for c in covs])
+
+    root_seed = np.random.SeedSequence(seed)
+    hits = samples = batches = 0
+    submitted = 0
+
+    def task(n: int):
+        return (root_seed.spawn(1)[0], n, x0, chol, nominal_rel, float(step_s), float(hbr_km))
+
+    def next_size() -> int:
+        return min(batch_size, max_samples - submitted)
+
+    def done() -> bool:
+        if samples >= max_samples:
+            return True
+        lo, hi = wilson_interval(hits, samples, confidence)
+        return samples > 0 and 0.5 * (hi - lo) <= max(rel_tol * hits / samples, abs_tol)
+
+    def record(n: int, h: int) -> None:
+        nonlocal hits, samples, batches
+        hits += h
+        samples += n
+        batches += 1
+        if progress is not None:
+            progress(samples, max_samples)
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 and pool is None:
+        while not done() and next_size() > 0:
+            n = next_size()
+            submitted += n
+            record(n, _sample_batch(task(n)))
+    else:
+        own_pool = pool is None
+        if own_pool:
+            pool = spawn_pool(workers)
+        pending = deque()
+        try:
+            while not done():
+                while len(pending) < 2 * workers and next_size() > 0:
+                    n = next_size()
+                    submitted += n
+                    pending.append((pool.submit(_sample_batch, task(n)), n))
+                if not pending:
+                    break
+                # În ordinea trimiterii, ca oprirea să cadă pe același lot ca la un singur proces
+                fut, n = pending.popleft()
+                record(n, fut.result())
+        finally:
+            for fut, _ in pending:
+                fut.cancel()
+            if own_pool:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+    lo, hi = wilson_interval(hits, samples, confidence)
+    return MonteCarloResult(
+        pc=hits / samples if samples else 0.0,
+        ci_low=lo,
+        ci_high=hi,
+        confidence=confidence,
+        hits=hits,
+        samples=samples,
+        batches=batches,
+        converged=samples > 0 and 0.5 * (hi - lo) <= max(rel_tol * hits / samples, abs_tol),
+        wall_time_s=time.perf_counter() - t0,
+    )
+
+
+__all__ = ["MonteCarloResult", "monte_carlo_pc", "spawn_pool", "wilson_interval"]
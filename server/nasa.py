@@ -1,11 +1,12 @@
 import os
+import time
 import datetime as dt
 from typing import List, Dict, Any, Optional
 
-import requests
+from metrics import UPSTREAM_DURATION, UPSTREAM_ERRORS
 
 NASA_API_KEY = os.getenv("NASA_API_KEY", "mSDMpl3uGi7uuc67o4nR3gdnMUtQLn1afkgwJB8U")
-DONKI_GST_URL = "https://api.nasa.gov/DONKI/GST"
+DONKI_GST_URL = os.getenv("DONKI_GST_URL", "https://api.nasa.gov/DONKI/GST")
 
 def fetch_donki_gst(start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict[str, Any]]:
     """
@@ -23,9 +24,18 @@ def fetch_donki_gst(start_date: Optional[str] = None, end_date: Optional[str] =
         "endDate": end_date,
         "api_key": NASA_API_KEY
     }
-    r = requests.get(DONKI_GST_URL, params=params, timeout=20)
-    r.raise_for_status()
-    return r.json()
+    import requests
+
+    t0 = time.perf_counter()
+    try:
+        r = requests.get(DONKI_GST_URL, params=params, timeout=20)
+        r.raise_for_status()
+        return r.json()
+    except Exception:
+        UPSTREAM_ERRORS.inc(("donki",))
+        raise
+    finally:
+        UPSTREAM_DURATION.observe(time.perf_counter() - t0, ("donki",))
 
 def latest_kp_index(events: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
     """
@@ -0,0 +1,202 @@
+"""Ground-station pass prediction for many objects at once.
+
+Two stages:
+
+1. Coarse scan: every requested object is propagated on a shared time grid
+   with chunked array SGP4 and converted to look angles from the observer,
+   giving an ``(objects, times)`` elevation matrix. Contiguous runs above
+   the minimum elevation are the candidate passes.
+2. Refinement: rise/set are bracketed by the two grid samples around each
+   threshold crossing and bisected; culmination is found by bisecting the
+   sign of the elevation rate inside the samples around the coarse peak.
+   All brackets advance together, one ``sgp4_array`` call per object and
+   iteration.
+
+A pass shorter than the scan step whose peak falls between two samples can
+be missed, so the step should stay well below the shortest pass of
+interest (60 s is safe for LEO and a 10° mask).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from sgp4.api import Satrec
+
+from frames import itrf_to_topocentric, teme_to_itrf
+from propagate import propagate_teme_batch
+
+_DAY_S = 86400.0
+_BELOW = -90.0  # elevație atribuită eșecurilor SGP4 (obiect tratat ca invizibil)
+
+
+@dataclass(frozen=True)
+class Observer:
+    lat_deg: float
+    lon_deg: float
+    alt_km: float = 0.0
+
+
+@dataclass
+class Pass:
+    index: int                      # poziția obiectului în lista primită
+    rise_s: Optional[float]         # None = pasul era deja în curs la începutul ferestrei
+    culmination_s: float
+    set_s: Optional[float]          # None = pasul continuă după sfârșitul ferestrei
+    max_elevation_deg: float
+    rise_azimuth_deg: Optional[float]
+    culmination_azimuth_deg: float
+    set_azimuth_deg: Optional[float]
+
+
+def _look_angles(r_teme: np.ndarray, jd0: float, fr: np.ndarray, observer: Observer) -> Tuple[np.ndarray, np.ndarray]:
+    r_itrf, _ = teme_to_itrf(r_teme, np.zeros_like(r_teme), jd0, fr)
+    az, el, _ = itrf_to_topocentric(r_itrf, observer.lat_deg, observer.lon_deg, observer.alt_km)
+    return az, el
+
+
+def _angles_at(
+    satrecs: Sequence[Satrec],
+    obj: np.ndarray,
+    t_s: np.ndarray,
+    jd0: float,
+    fr0: float,
+    observer: Observer,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Azimuth/elevation of ``satrecs[obj[k]]`` at ``t_s[k]`` seconds after the start."""
+    if not len(obj):
+        return np.zeros(0), np.zeros(0)
+    fr = fr0 + t_s / _DAY_S
+    r = np.empty((len(obj), 3))
+    ok = np.empty(len(obj), dtype=bool)
+    order = np.argsort(obj, kind="stable")
+    bounds = np.flatnonzero(np.diff(obj[order])) + 1
+    for group in np.split(order, bounds):
+        err, r_g, _ = satrecs[int(obj[group[0]])].sgp4_array(np.full(len(group), jd0), fr[group])
+        r[group] = r_g
+        ok[group] = err == 0
+    # Conversia de cadru se face o singură dată, pentru toate obiectele
+    az, el = _look_angles(r, jd0, fr, observer)
+    az = np.where(ok, az, 0.0)
+    el = np.where(ok, el, _BELOW)
+    return az, el
+
+
+def _bisect_crossings(satrecs, obj, lo, hi, rising, jd0, fr0, observer, min_el, tol_s):
+    """Shrink ``[lo, hi]`` brackets around threshold crossings to ``tol_s``."""
+    lo, hi = lo.copy(), hi.copy()
+    while len(obj) and np.max(hi - lo) > tol_s:
+        mid = 0.5 * (lo + hi)
+        _, el = _angles_at(satrecs, obj, mid, jd0, fr0, observer)
+        above = el >= min_el
+        # Răsărit: sub prag la lo, peste la hi; apus invers
+        move_hi = above == rising
+        hi = np.where(move_hi, mid, hi)
+        lo = np.where(move_hi, lo, mid)
+    return 0.5 * (lo + hi)
+
+
+def _bisect_peaks(satrecs, obj, lo, hi, jd0, fr0, observer, tol_s):
+    """Locate the elevation maximum inside each ``[lo, hi]`` bracket."""
+    lo, hi = lo.copy(), hi.copy()
+    h = 0.5 * tol_s
+    while len(obj) and np.max(hi - lo) > tol_s:
+        mid = 0.5 * (lo + hi)
+        _, el = _angles_at(satrecs, np.concatenate([obj, obj]),
+                           np.concatenate([mid - h, mid + h]), jd0, fr0, observer)
+        n = len(obj)
+        rising = el[n:] > el[:n]
+        lo = np.where(rising, mid, lo)
+        hi = np.where(rising, hi, mid)
+    return 0.5 * (lo + hi)
+
+
+def predict_passes(
+    satrecs: Sequence[Satrec],
+    observer: Observer,
+    jd: np.ndarray,
+    fr: np.ndarray,
+    min_elevation_deg: float = 10.0,
+    tol_s: float = 1.0,
+    chunk_size: int = 256,
+) -> List[Pass]:
+    """
+    Predict passes above ``min_elevation_deg`` for all ``satrecs`` over the
+    uniform grid ``(jd, fr)`` (as built by ``propagate.time_grid``).
+
+    Times in the result are seconds since the first grid point. Passes are
+    ordered by object, then by time.
+    """
+    jd0 = float(jd[0])
+    fr0 = float(fr[0])
+    t_grid = (np.asarray(jd, dtype=float) - jd0 + np.asarray(fr, dtype=float) - fr0) * _DAY_S
+    n_t = len(t_grid)
+
+    seg_obj: List[np.ndarray] = []
+    seg_start: List[np.ndarray] = []
+    seg_end: List[np.ndarray] = []
+    seg_peak: List[np.ndarray] = []
+    for offset, r, _v, err in propagate_teme_batch(satrecs, jd, fr, chunk_size=chunk_size):
+        _, el = _look_angles(r, jd0, fr, observer)
+        el = np.where(err == 0, el, _BELOW)
+        above = el >= min_elevation_deg
+        if not above.any():
+            continue
+        padded = np.zeros((above.shape[0], n_t + 2), dtype=np.int8)
+        padded[:, 1:-1] = above
+        edges = np.diff(padded, axis=1)
+        starts = np.argwhere(edges == 1)      # (obiect, primul eșantion peste prag)
+        ends = np.argwhere(edges == -1)       # (obiect, primul eșantion sub prag)
+        peaks = np.empty(len(starts), dtype=np.int64)
+        for k, ((o, s), (_, e)) in enumerate(zip(starts, ends)):
+            peaks[k] = s + int(np.argmax(el[o, s:e]))
+        seg_obj.append(starts[:, 0] + offset)
+        seg_start.append(starts[:, 1])
+        seg_end.append(ends[:, 1] - 1)
+        seg_peak.append(peaks)
+
+    if not seg_obj:
+        return []
+    obj = np.concatenate(seg_obj)
+    start = np.concatenate(seg_start)
+    end = np.concatenate(seg_end)
+    peak = np.concatenate(seg_peak)
+    last = n_t - 1
+
+    has_rise = start > 0
+    has_set = end < last
+    rise_t = np.full(len(obj), np.nan)
+    set_t = np.full(len(obj), np.nan)
+    rise_t[has_rise] = _bisect_crossings(
+        satrecs, obj[has_rise], t_grid[start[has_rise] - 1], t_grid[start[has_rise]],
+        True, jd0, fr0, observer, min_elevation_deg, tol_s)
+    set_t[has_set] = _bisect_crossings(
+        satrecs, obj[has_set], t_grid[end[has_set]], t_grid[end[has_set] + 1],
+        False, jd0, fr0, observer, min_elevation_deg, tol_s)
+    culm_t = _bisect_peaks(
+        satrecs, obj, t_grid[np.maximum(peak - 1, 0)], t_grid[np.minimum(peak + 1, last)],
+        jd0, fr0, observer, tol_s)
+
+    # Unghiurile finale într-un singur apel per obiect
+    n = len(obj)
+    times = np.concatenate([np.nan_to_num(rise_t), culm_t, np.nan_to_num(set_t)])
+    az, el = _angles_at(satrecs, np.concatenate([obj, obj, obj]), times, jd0, fr0, observer)
+
+    passes = []
+    for k in range(n):
+        passes.append(Pass(
+            index=int(obj[k]),
+            rise_s=float(rise_t[k]) if has_rise[k] else None,
+            culmination_s=float(culm_t[k]),
+            set_s=float(set_t[k]) if has_set[k] else None,
+            max_elevation_deg=float(el[n + k]),
+            rise_azimuth_deg=float(az[k]) if has_rise[k] else None,
+            culmination_azimuth_deg=float(az[n + k]),
+            set_azimuth_deg=float(az[2 * n + k]) if has_set[k] else None,
+        ))
+    passes.sort(key=lambda p: (p.index, p.culmination_s))
+    return passes
+
+
+__all__ = ["Observer", "Pass", "predict_passes"]
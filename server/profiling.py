@@ -0,0 +1,284 @@
+"""Opt-in per-request profiling.
+
+Configuration (environment variables, read once at startup):
+
+``PROFILE_TOKEN``
+    Enables on-demand profiling. A request carrying ``X-Profile: <token>``
+    (or ``?profile=<token>``) is profiled. Add ``X-Profile-Output: inline``
+    (or ``&profile_output=inline``) to get the hot-function breakdown as the
+    response body instead of the normal payload.
+``PROFILE_SAMPLE_RATE``
+    Fraction (0..1) of all requests profiled continuously in the background.
+``PROFILE_DIR``
+    Where ``<id>.prof`` (pstats) and ``<id>.json`` summaries are written.
+``PROFILE_TOP``
+    Number of functions kept in the summaries (default 30).
+
+When neither a token nor a sample rate is configured, ``install_profiling``
+does not touch the app at all, so there is no per-request overhead.
+
+Sync endpoints run in the threadpool. Before Python 3.12 cProfile only
+sees the thread it was enabled in, so two profilers are used per request:
+one in the event-loop thread (routing, validation, response rendering, and
+the body of ``async def`` endpoints) and one enabled around sync endpoint
+calls in whichever thread executes them; their statistics are merged.
+From 3.12 cProfile runs on ``sys.monitoring``, sees every thread and only
+one profiler may be active per interpreter, so the loop profiler alone
+covers the request. Numbers can include other requests served
+concurrently.
+
+Only one profiler can be active per thread, so at most one request per
+process is profiled at a time: on-demand requests wait for their turn,
+sampled requests arriving while another profile is running are served
+unprofiled.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import cProfile
+import functools
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi.routing import APIRoute
+
+# Parametrii de query care cer profilarea (ignorați de ETag-urile din http_cache)
+PROFILE_QUERY_PARAMS = ("profile", "profile_output")
+
+# Python 3.12+: un singur profiler pe interpretor, care vede toate thread-urile
+_SINGLE_PROFILER = sys.version_info >= (3, 12)
+
+_DEFAULT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "profiles"))
+
+# Profilerul pentru thread-ul care execută endpoint-ul curent (None = neprofilat)
+_ENDPOINT_PROFILER: contextvars.ContextVar[Optional[cProfile.Profile]] = contextvars.ContextVar(
+    "endpoint_profiler", default=None
+)
+
+
+@dataclass(frozen=True)
+class ProfilingConfig:
+    token: Optional[str] = None
+    sample_rate: float = 0.0
+    directory: str = _DEFAULT_DIR
+    top: int = 30
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) or self.sample_rate > 0
+
+    @classmethod
+    def from_env(cls) -> "ProfilingConfig":
+        try:
+            rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0") or 0)
+        except ValueError:
+            rate = 0.0
+        try:
+            top = int(os.getenv("PROFILE_TOP", "30"))
+        except ValueError:
+            top = 30
+        return cls(
+            token=os.getenv("PROFILE_TOKEN") or None,
+            sample_rate=min(max(rate, 0.0), 1.0),
+            directory=os.getenv("PROFILE_DIR") or _DEFAULT_DIR,
+            top=top,
+        )
+
+
+def _wrap_endpoint(endpoint):
+    """Enable the request's endpoint profiler around the call, in the executing thread."""
+    if _SINGLE_PROFILER:
+        # Profilerul buclei acoperă deja thread-ul din pool; un al doilea ar da ValueError
+        return endpoint
+    if asyncio.iscoroutinefunction(endpoint):
+        # Rulează în thread-ul buclei, deja acoperit de profilerul middleware-ului;
+        # un al doilea cProfile acolo ar înlocui (și apoi ar scoate) hook-ul acestuia
+        return endpoint
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        prof = _ENDPOINT_PROFILER.get()
+        if prof is None:
+            return endpoint(*args, **kwargs)
+        prof.enable()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            prof.disable()
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint can be profiled in the thread that runs it."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _wrap_endpoint(endpoint), **kwargs)
+
+
+def summarize(stats: pstats.Stats, top: int) -> Dict[str, List[Dict]]:
+    """Top functions by cumulative and by own time, as JSON-friendly dicts."""
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, _callers) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({func})",
+            "path": filename,
+            "ncalls": nc,
+            "primitive_calls": cc,
+            "tottime_s": round(tt, 6),
+            "cumtime_s": round(ct, 6),
+        })
+    return {
+        "by_cumtime": sorted(rows, key=lambda r: r["cumtime_s"], reverse=True)[:top],
+        "by_tottime": sorted(rows, key=lambda r: r["tottime_s"], reverse=True)[:top],
+    }
+
+
+def _merged_stats(*profilers: cProfile.Profile) -> pstats.Stats:
+    stats = pstats.Stats(stream=io.StringIO())
+    for prof in profilers:
+        prof.create_stats()
+        if prof.stats:
+            stats.add(prof)
+    return stats
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware deciding which requests to profile and emitting the result.
+
+    On-demand requests get an ``X-Profile-Id`` header (the summary and pstats
+    dump are written to the profile directory) or, in inline mode, a JSON
+    body with the breakdown. Sampled requests are only written to disk.
+    """
+
+    def __init__(self, app, config: ProfilingConfig):
+        self.app = app
+        self.config = config
+        # Un singur profil activ pe bucla de evenimente
+        self._busy = asyncio.Lock()
+
+    def _requested(self, scope) -> Tuple[bool, bool]:
+        if not self.config.token:
+            return False, False
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        supplied = headers.get("x-profile")
+        inline = headers.get("x-profile-output", "").lower() == "inline"
+        if supplied is None and scope.get("query_string"):
+            qs = parse_qs(scope["query_string"].decode("latin-1"))
+            supplied = (qs.get("profile") or [None])[0]
+            inline = inline or (qs.get("profile_output") or [""])[0].lower() == "inline"
+        if supplied is None or not hmac.compare_digest(supplied, self.config.token):
+            return False, False
+        return True, inline
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        requested, inline = self._requested(scope)
+        sampled = not requested and self.config.sample_rate > 0 and random.random() < self.config.sample_rate
+        if not (requested or sampled):
+            await self.app(scope, receive, send)
+            return
+        if sampled and self._busy.locked():
+            await self.app(scope, receive, send)
+            return
+
+        async with self._busy:
+            await self._profiled(scope, receive, send, requested, inline)
+
+    async def _profiled(self, scope, receive, send, requested: bool, inline: bool) -> None:
+
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if requested and not inline:
+                    message = dict(message)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-profile-id", profile_id.encode("latin-1"))
+                    ]
+            if inline:
+                # Răspunsul original este înlocuit de rezumatul profilului
+                return
+            await send(message)
+
+        loop_prof = cProfile.Profile()
+        endpoint_prof = None if _SINGLE_PROFILER else cProfile.Profile()
+        token = _ENDPOINT_PROFILER.set(endpoint_prof)
+        t0 = time.perf_counter()
+        loop_prof.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            loop_prof.disable()
+            _ENDPOINT_PROFILER.reset(token)
+        wall = time.perf_counter() - t0
+
+        stats = _merged_stats(*(p for p in (loop_prof, endpoint_prof) if p is not None))
+        route = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+        summary = {
+            "profile_id": profile_id,
+            "method": scope.get("method"),
+            "route": route,
+            "path": scope.get("path"),
+            "status_code": status[0],
+            "wall_time_s": round(wall, 6),
+            "mode": "on_demand" if requested else "sampled",
+            **summarize(stats, self.config.top),
+        }
+        self._write(profile_id, stats, summary)
+
+        if inline:
+            body = json.dumps(summary).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                    (b"x-profile-id", profile_id.encode("latin-1")),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+
+    def _write(self, profile_id: str, stats: pstats.Stats, summary: Dict) -> None:
+        try:
+            os.makedirs(self.config.directory, exist_ok=True)
+            if stats.stats:
+                stats.dump_stats(os.path.join(self.config.directory, f"{profile_id}.prof"))
+            with open(os.path.join(self.config.directory, f"{profile_id}.json"), "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+        except OSError:
+            # Profilarea nu are voie să strice cererea
+            pass
+
+
+def install_profiling(app, config: Optional[ProfilingConfig] = None) -> ProfilingConfig:
+    """
+    Hook profiling into ``app`` if configured. Must run before routes are
+    declared so they are created with ``ProfiledRoute``.
+    """
+    config = config or ProfilingConfig.from_env()
+    if not config.enabled:
+        return config
+    app.router.route_class = ProfiledRoute
+    app.add_middleware(ProfilingMiddleware, config=config)
+    return config
+
+
+__all__ = ["ProfilingConfig", "ProfilingMiddleware", "ProfiledRoute", "install_profiling", "summarize"]
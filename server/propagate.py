@@ -1,29 +1,362 @@
+from __future__ import annotations
+
 import datetime as dt
-from typing import List, Dict
-from skyfield.api import EarthSatellite, wgs84
+import time
+from typing import TYPE_CHECKING, List, Dict, Iterator, Optional, Sequence, Tuple
+
 from skyfield_utils import get_timescale
+from metrics import PROPAGATION_DURATION, PROPAGATION_SAMPLES
+
+if TYPE_CHECKING:
+    import numpy as np
+    from sgp4.api import Satrec
+
+# NumPy, sgp4 și Skyfield sunt importate la primul apel (pornire rapidă a serverului)
+
+FRAMES = ("geodetic", "teme", "gcrs", "itrf")
+
+# Parametrul gravitațional terestru (km^3/s^2) și viteza de rotație a Pământului (rad/s)
+MU_EARTH_KM3_S2 = 398600.4418
+EARTH_ROTATION_RAD_S = 7.292115e-5
+
 
-def propagate_positions(tle_record, start_time_utc: dt.datetime, minutes: int = 120, step_seconds: int = 60) -> List[Dict]:
+def propagate_positions(
+    tle_record,
+    start_time_utc: dt.datetime,
+    minutes: int = 120,
+    step_seconds: int = 60,
+    frame: str = "geodetic",
+) -> List[Dict]:
     """
-    Propagate positions using Skyfield+SGP4 and return geodetic samples.
+    Propagate positions using Skyfield+SGP4.
+
+    ``frame="geodetic"`` returns WGS84 ``lat_deg``/``lon_deg``/``alt_km``
+    samples; ``"teme"``, ``"gcrs"`` or ``"itrf"`` return Cartesian
+    ``r_km``/``v_kms`` in that frame, without any geodetic conversion.
     """
+    if frame != "geodetic":
+        jd, fr, r, v, ok = propagate_states(tle_record, start_time_utc, minutes, step_seconds, frame=frame)
+        return state_samples(start_time_utc, step_seconds, r, v, ok)
+
+    from skyfield.api import EarthSatellite, wgs84
+
+    t0 = time.perf_counter()
     ts = get_timescale()
     sat = EarthSatellite(tle_record.line1, tle_record.line2, tle_record.name, ts)
 
-    samples = []
+    # O singură evaluare vectorizată pe toată grila (în loc de un apel Skyfield per eșantion)
     steps = max(1, int((minutes * 60) // step_seconds))
-    for k in range(steps + 1):
-        t = start_time_utc + dt.timedelta(seconds=k * step_seconds)
-        t_sf = ts.from_datetime(t)
-        geocentric = sat.at(t_sf)
-        sp = wgs84.subpoint(geocentric)
-        lat = float(sp.latitude.degrees)
-        lon = float(sp.longitude.degrees)
-        alt_km = float(sp.elevation.km)
-        samples.append({
+    times = [start_time_utc + dt.timedelta(seconds=k * step_seconds) for k in range(steps + 1)]
+    sp = wgs84.subpoint(sat.at(ts.from_datetimes(times)))
+    lat = sp.latitude.degrees
+    lon = sp.longitude.degrees
+    alt_km = sp.elevation.km
+    samples = [
+        {
             "t": t.isoformat().replace("+00:00", "Z"),
-            "lat_deg": lat,
-            "lon_deg": lon,
-            "alt_km": alt_km
-        })
-    return samples
\ No newline at end of file
+            "lat_deg": float(lat[k]),
+            "lon_deg": float(lon[k]),
+            "alt_km": float(alt_km[k]),
+        }
+        for k, t in enumerate(times)
+    ]
+    PROPAGATION_DURATION.observe(time.perf_counter() - t0, ("positions",))
+    PROPAGATION_SAMPLES.inc(("positions",), len(samples))
+    return samples
+
+
+def convert_teme(r: np.ndarray, v: np.ndarray, jd: np.ndarray, fr: np.ndarray, frame: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    TEME position/velocity (km, km/s), shape ``(n, 3)`` on the grid
+    ``jd + fr``, rotated into ``frame`` (``"teme"``, ``"gcrs"`` or ``"itrf"``).
+    """
+    if frame == "teme":
+        return r, v
+    if frame == "itrf":
+        from frames import teme_to_itrf
+        return teme_to_itrf(r, v, jd, fr)
+    if frame == "gcrs":
+        import numpy as np
+        from skyfield.sgp4lib import TEME
+
+        # Aceeași rotație ca EarthSatellite.at(): TEME -> GCRS prin precesie și nutație
+        rot = TEME.rotation_at(get_timescale().ut1_jd(np.asarray(jd) + np.asarray(fr)))
+        rot = rot.reshape(3, 3, -1)
+        return np.einsum("jin,nj->ni", rot, r), np.einsum("jin,nj->ni", rot, v)
+    raise ValueError(f"Unknown frame '{frame}' (use one of {', '.join(FRAMES)}).")
+
+
+def propagate_states(
+    tle_record,
+    start_time_utc: dt.datetime,
+    minutes: int = 120,
+    step_seconds: int = 60,
+    frame: str = "teme",
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Cartesian states on the ``time_grid`` of the window, straight from
+    array SGP4. Returns ``(jd, fr, r, v, ok)`` with ``r``/``v`` of shape
+    ``(n_times, 3)`` in ``frame`` and ``ok`` the SGP4 success mask.
+    """
+    t0 = time.perf_counter()
+    jd, fr = time_grid(start_time_utc, minutes=minutes, step_seconds=step_seconds)
+    err, r, v = satrec_from_record(tle_record).sgp4_array(jd, fr)
+    r, v = convert_teme(r, v, jd, fr, frame)
+    PROPAGATION_DURATION.observe(time.perf_counter() - t0, ("states",))
+    PROPAGATION_SAMPLES.inc(("states",), len(jd))
+    return jd, fr, r, v, err == 0
+
+
+def state_samples(start_time_utc: dt.datetime, step_seconds: float, r: np.ndarray, v: np.ndarray,
+                  ok: np.ndarray) -> List[Dict]:
+    """JSON samples ``{"t", "r_km", "v_kms"}`` for a uniform grid; failed SGP4 points are skipped."""
+    return [
+        {
+            "t": (start_time_utc + dt.timedelta(seconds=k * step_seconds)).isoformat().replace("+00:00", "Z"),
+            "r_km": r[k].round(6).tolist(),
+            "v_kms": v[k].round(9).tolist(),
+        }
+        for k in range(len(r)) if ok[k]
+    ]
+
+
+def propagate_adaptive(
+    tle_record,
+    start_time_utc: dt.datetime,
+    minutes: int = 120,
+    tolerance_km: float = 1.0,
+    max_points: Optional[int] = None,
+    frame: str = "geodetic",
+    max_refinements: int = 8,
+) -> Tuple[List[Dict], Dict]:
+    """
+    Non-uniform samples whose straight-line interpolation stays within
+    ``tolerance_km`` of the SGP4 trajectory.
+
+    The chord error of a step ``h`` is about ``|a| h^2 / 8``, so sample
+    times equidistribute ``sqrt(|a| / 8 tol)`` over the window. The
+    acceleration comes from an analytic Kepler pilot (two-body ``mu / r^2``
+    from the mean elements, plus the Coriolis term for Earth-fixed output),
+    phased by a single SGP4 call at the start of the window. Steps shrink at perigee and grow at apogee;
+    when that saves less than 10% of the points (near-circular orbits) a
+    uniform grid at the perigee step is used instead.
+
+    Each interval's chord error is then estimated from the SGP4 velocities
+    already at its ends (cubic Hermite midpoint: ``h |v0 - v1| / 8``).
+    Intervals over the tolerance are bisected; only those estimated just
+    under it get an SGP4 midpoint check. With ``max_points`` the initial
+    grid is sized to the budget and the worst intervals are refined first
+    until the budget is spent.
+
+    Returns ``(samples, info)``; ``info["max_error_km"]`` is the largest
+    chord error on the final intervals (measured where checked, estimated
+    elsewhere).
+    """
+    import numpy as np
+    from sgp4.api import jday
+    from frames import itrf_to_geodetic, teme_to_itrf
+
+    if frame not in FRAMES:
+        raise ValueError(f"Unknown frame '{frame}' (use one of {', '.join(FRAMES)}).")
+    t0 = time.perf_counter()
+    model = satrec_from_record(tle_record)
+    start = start_time_utc.astimezone(dt.timezone.utc)
+    jd0, fr0 = jday(start.year, start.month, start.day, start.hour, start.minute,
+                    start.second + start.microsecond * 1e-6)
+    duration = minutes * 60.0
+    # Eroarea se măsoară în cadrul în care clientul interpolează: fix față de Pământ pentru hartă
+    earth_fixed = frame in ("geodetic", "itrf")
+    calls = checks = 0
+
+    def states(t_s):
+        nonlocal calls
+        calls += len(t_s)
+        jd = np.full(len(t_s), jd0)
+        fr = fr0 + t_s / 86400.0
+        err, r, v = model.sgp4_array(jd, fr)
+        if earth_fixed:
+            r, v = teme_to_itrf(r, v, jd, fr)
+        return r, v, err == 0
+
+    def estimate(t, v, ok, idx):
+        # Interpolantul Hermite cubic diferă de coardă la mijloc cu h (v0 - v1) / 8
+        e = (t[idx + 1] - t[idx]) / 8.0 * np.linalg.norm(v[idx] - v[idx + 1], axis=1)
+        # Intervalele cu erori SGP4 nu pot fi evaluate (și nici interpolate de client)
+        return np.where(ok[idx] & ok[idx + 1], e, 0.0)
+
+    # Pilot analitic pe elementele medii (fără SGP4): cel mult 1/64 din perioadă, ca perigeul să fie prins
+    n = model.no_kozai / 60.0                                   # rad/s
+    a = (MU_EARTH_KM3_S2 / n ** 2) ** (1.0 / 3.0)
+    e = model.ecco
+    period_s = 2.0 * np.pi / n
+    pilot_step = min(60.0, period_s / 64.0)
+    t_p = np.linspace(0.0, duration, int(np.ceil(duration / pilot_step)) + 1)
+    # Faza orbitei se ia din starea SGP4 de la început (un apel), ritmul din elementele medii
+    status, r0, v0 = model.sgp4(jd0, fr0)
+    calls += 1
+    if status == 0:
+        r0, v0 = np.asarray(r0), np.asarray(v0)
+        r0_norm = np.linalg.norm(r0)
+        ecc_anomaly0 = np.arctan2(r0 @ v0 / np.sqrt(MU_EARTH_KM3_S2 * a), 1.0 - r0_norm / a)
+        mean_anomaly0 = ecc_anomaly0 - e * np.sin(ecc_anomaly0)
+    else:
+        mean_anomaly0 = model.mo + model.mdot * ((jd0 - model.jdsatepoch) + (fr0 - model.jdsatepochF)) * 1440.0
+    mean_anomaly = mean_anomaly0 + model.mdot * t_p / 60.0
+    ecc_anomaly = mean_anomaly + e * np.sin(mean_anomaly)
+    for _ in range(10):
+        ecc_anomaly -= (ecc_anomaly - e * np.sin(ecc_anomaly) - mean_anomaly) / (1.0 - e * np.cos(ecc_anomaly))
+    radius = a * (1.0 - e * np.cos(ecc_anomaly))
+    accel = MU_EARTH_KM3_S2 / radius ** 2
+    if earth_fixed:
+        accel = accel + 2.0 * EARTH_ROTATION_RAD_S * np.sqrt(MU_EARTH_KM3_S2 * (2.0 / radius - 1.0 / a))
+    # Țintă cu 10% sub toleranță: J2 și rezistența atmosferică curbează puțin peste modelul cu două corpuri
+    density = np.sqrt(accel / (8.0 * 0.9 * tolerance_km))      # eșantioane pe secundă
+    cumulative = np.r_[0.0, np.cumsum((density[1:] + density[:-1]) / 2.0 * np.diff(t_p))]
+    intervals = max(1, int(np.ceil(cumulative[-1])))
+    # Pas uniform echivalent: cel impus de accelerația maximă (perigeul) pe toată fereastra
+    uniform_intervals = max(1, int(np.ceil(duration * density.max())))
+    info = {"tolerance_km": tolerance_km, "pilot_points": len(t_p), "uniform_points_equivalent": uniform_intervals + 1}
+    grid = "adaptive" if intervals < 0.9 * uniform_intervals else "uniform"
+    if grid == "uniform":
+        intervals = uniform_intervals
+    if max_points is not None and intervals + 1 > max_points:
+        # Bugetul limitează grila inițială; ~10% rămâne pentru rafinarea intervalelor celor mai proaste
+        intervals = max(1, min(intervals, int(0.9 * max_points) - 1))
+    if grid == "uniform":
+        t = np.linspace(0.0, duration, intervals + 1)
+    else:
+        t = np.interp(np.linspace(0.0, cumulative[-1], intervals + 1), cumulative, t_p)
+    t = np.round(t, 3)
+    t[0], t[-1] = 0.0, duration
+    t = np.unique(t)
+    info["grid"] = grid
+
+    r, v, ok = states(t)
+    if not ok.any():
+        return [], dict(info, points=0, max_error_km=None, midpoint_checks=0, sgp4_calls=calls)
+    err = estimate(t, v, ok, np.arange(len(t) - 1))
+    # Stările SGP4 de la mijlocul intervalelor verificate, refolosite dacă intervalul se înjumătățește
+    checked = np.zeros(len(err), dtype=bool)
+    r_mid, v_mid, ok_mid = np.zeros((len(err), 3)), np.zeros((len(err), 3)), np.zeros(len(err), dtype=bool)
+    for attempt in range(max_refinements + 1):
+        # Verificare SGP4 doar unde estimarea e aproape de toleranță (sub ea, dar la mai puțin de 5%)
+        near = np.flatnonzero(~checked & (err > 0.95 * tolerance_km) & (err <= tolerance_km))
+        if len(near):
+            checks += len(near)
+            mid = np.round((t[near] + t[near + 1]) / 2.0, 3)
+            r_mid[near], v_mid[near], ok_mid[near] = states(mid)
+            measured = np.linalg.norm(r_mid[near] - (r[near] + r[near + 1]) / 2.0, axis=1)
+            err[near] = np.where(ok[near] & ok[near + 1] & ok_mid[near], measured, 0.0)
+            checked[near] = True
+        bad = np.flatnonzero(err > tolerance_km)
+        if max_points is not None:
+            room = max(max_points - len(t), 0)
+            bad = np.sort(bad[np.argsort(-err[bad], kind="stable")][:room])
+        if not len(bad) or attempt == max_refinements:
+            break
+        # Mijloacele devin eșantioane (cele deja propagate la verificare nu se recalculează)
+        fresh = bad[~checked[bad]]
+        if len(fresh):
+            r_mid[fresh], v_mid[fresh], ok_mid[fresh] = states(np.round((t[fresh] + t[fresh + 1]) / 2.0, 3))
+        mid = np.round((t[bad] + t[bad + 1]) / 2.0, 3)
+        t = np.insert(t, bad + 1, mid)
+        r = np.insert(r, bad + 1, r_mid[bad], axis=0)
+        v = np.insert(v, bad + 1, v_mid[bad], axis=0)
+        ok = np.insert(ok, bad + 1, ok_mid[bad])
+        # Intervalele neatinse își păstrează starea; cele două jumătăți se estimează din nou
+        left = bad + np.arange(len(bad))
+        halves = np.sort(np.r_[left, left + 1])
+        kept = np.setdiff1d(np.arange(len(t) - 1), halves)
+        old = np.setdiff1d(np.arange(len(err)), bad)
+        err_new, checked_new = np.empty(len(t) - 1), np.zeros(len(t) - 1, dtype=bool)
+        r_mid_new, v_mid_new, ok_mid_new = np.zeros((len(t) - 1, 3)), np.zeros((len(t) - 1, 3)), np.zeros(len(t) - 1, dtype=bool)
+        err_new[kept], checked_new[kept] = err[old], checked[old]
+        r_mid_new[kept], v_mid_new[kept], ok_mid_new[kept] = r_mid[old], v_mid[old], ok_mid[old]
+        err_new[halves] = estimate(t, v, ok, halves)
+        err, checked, r_mid, v_mid, ok_mid = err_new, checked_new, r_mid_new, v_mid_new, ok_mid_new
+
+    jd = np.full(len(t), jd0)
+    fr = fr0 + t / 86400.0
+    if frame == "geodetic":
+        lat, lon, alt = itrf_to_geodetic(r)
+        samples = [
+            {"t": _iso_offset(start, t[k]), "lat_deg": float(lat[k]), "lon_deg": float(lon[k]),
+             "alt_km": float(alt[k])}
+            for k in range(len(t)) if ok[k]
+        ]
+    else:
+        if frame == "gcrs":
+            # TEME -> GCRS e aproape constantă pe fereastră: eroarea măsurată în TEME rămâne valabilă
+            r, v = convert_teme(r, v, jd, fr, frame)
+        samples = [
+            {"t": _iso_offset(start, t[k]), "r_km": r[k].round(6).tolist(), "v_kms": v[k].round(9).tolist()}
+            for k in range(len(t)) if ok[k]
+        ]
+    steps = np.diff(t)
+    info.update(
+        points=len(samples),
+        max_error_km=round(float(err.max()), 6) if len(err) else 0.0,
+        min_step_s=round(float(steps.min()), 3) if len(steps) else None,
+        max_step_s=round(float(steps.max()), 3) if len(steps) else None,
+        midpoint_checks=checks,
+        sgp4_calls=calls,
+    )
+    PROPAGATION_DURATION.observe(time.perf_counter() - t0, ("adaptive",))
+    PROPAGATION_SAMPLES.inc(("adaptive",), calls)
+    return samples, info
+
+
+def _iso_offset(start_time_utc: dt.datetime, seconds: float) -> str:
+    return (start_time_utc + dt.timedelta(seconds=float(seconds))).isoformat().replace("+00:00", "Z")
+
+
+def satrec_from_record(tle_record) -> Satrec:
+    """Build a raw SGP4 model straight from a TLE record (no Skyfield wrapper)."""
+    from sgp4.api import Satrec
+
+    return Satrec.twoline2rv(tle_record.line1, tle_record.line2)
+
+
+def time_grid(start_time_utc: dt.datetime, minutes: int = 120, step_seconds: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Julian date arrays ``(jd, fr)`` for the same sampling grid used by
+    ``propagate_positions`` (``steps + 1`` points, ``step_seconds`` apart).
+    """
+    import numpy as np
+    from sgp4.api import jday
+
+    t = start_time_utc.astimezone(dt.timezone.utc)
+    jd0, fr0 = jday(t.year, t.month, t.day, t.hour, t.minute, t.second + t.microsecond * 1e-6)
+    steps = max(1, int((minutes * 60) // step_seconds))
+    offsets_days = np.arange(steps + 1, dtype=float) * (step_seconds / 86400.0)
+    jd = np.full(steps + 1, jd0)
+    fr = fr0 + offsets_days
+    return jd, fr
+
+
+def propagate_teme_batch(
+    satrecs: Sequence[Satrec],
+    jd: np.ndarray,
+    fr: np.ndarray,
+    chunk_size: int = 256,
+) -> Iterator[Tuple[int, np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Propagate many objects over a shared time grid with array SGP4.
+
+    Yields ``(offset, r, v, err)`` per chunk of at most ``chunk_size``
+    objects, where ``r``/``v`` are TEME km and km/s with shape
+    ``(n_chunk, n_times, 3)``. Chunking bounds peak memory so callers can
+    reduce each chunk (min distance, etc.) before the next is computed.
+    """
+    import numpy as np
+    from sgp4.api import SatrecArray
+
+    jd = np.ascontiguousarray(jd, dtype=float)
+    fr = np.ascontiguousarray(fr, dtype=float)
+    for offset in range(0, len(satrecs), chunk_size):
+        t0 = time.perf_counter()
+        chunk = SatrecArray(list(satrecs[offset:offset + chunk_size]))
+        err, r, v = chunk.sgp4(jd, fr)
+        PROPAGATION_DURATION.observe(time.perf_counter() - t0, ("batch",))
+        PROPAGATION_SAMPLES.inc(("batch",), err.size)
+        yield offset, r, v, err
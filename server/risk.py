@@ -4,13 +4,12 @@ import os
 from functools import lru_cache
 from typing import Tuple, List, Dict, Optional
 
-from skyfield.api import EarthSatellite
 from skyfield_utils import get_timescale
 
 # Simplified ORDEM-like grid sample:
 # columns: altitude_km,inclination_deg,size_min_cm,size_max_cm,flux_per_m2_per_year
 _DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
-SAMPLE_FILE = os.path.join(_DATA_DIR, 'ordem_flux_sample.csv')
+SAMPLE_FILE = os.getenv('ORDEM_FLUX_FILE') or os.path.join(_DATA_DIR, 'ordem_flux_sample.csv')
 
 @lru_cache(maxsize=1)
 def _load_flux_table() -> List[Dict]:
@@ -92,6 +91,8 @@ def annual_collision_probability(cross_section_m2: float, years: float, flux_per
     return 1.0 - math.exp(-lam)
 
 def inclination_from_tle(line1: str, line2: str, name: str = "OBJ") -> float:
+    from skyfield.api import EarthSatellite
+
     ts = get_timescale()
     sat = EarthSatellite(line1, line2, name, ts)
     inc_rad = sat.model.inclo
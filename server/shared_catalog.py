@@ -0,0 +1,388 @@
+"""TLE catalog kept in OS shared memory, shared by all uvicorn workers.
+
+Layout
+------
+``<prefix>-ctl``
+    Small control segment: ``generation`` (u64) and ``published_at``
+    (float64, UNIX time). Workers poll it on every catalog access; it is a
+    single aligned 8-byte read.
+``<prefix>-g<generation>``
+    One immutable data segment per generation: a header followed by a NumPy
+    structured array (NORAD id, parsed element array, name, line 1, line 2, source groups)
+    sorted by NORAD id so lookups are a binary search on shared memory.
+
+Publishing writes the complete new segment first, then bumps the generation
+in the control segment, so a worker either sees the old catalog or the new
+one, never a partial one. The previous segment is unlinked afterwards;
+workers that still map it keep a valid view (POSIX semantics) until they
+switch. On Windows a named mapping lives only while some process has a
+handle open (``unlink`` is a no-op), so there the publisher keeps its
+handle to the current segment until the next publish and every worker
+keeps the ``SharedMemory`` of the generation it attached open alongside
+its mapping. Publishers serialise on a file lock (``flock``, or
+``msvcrt.locking`` on Windows), so concurrent loads from different workers
+do not lose each other's updates.
+
+Each worker wraps the attached generation in a ``SharedSnapshot`` (the
+``tle_store.CatalogSnapshot`` interface), so a reader holding it keeps that
+generation even after the worker attaches a newer one. Checking for a new
+generation takes no lock; only attaching one does, once per generation.
+Only per-worker state is the currently attached segment, so memory does not
+grow with the number of workers.
+"""
+from __future__ import annotations
+
+import errno
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple
+
+from tle_store import ELEMENT_FIELDS, CatalogSnapshot, TLERecord, parse_elements
+
+if TYPE_CHECKING:
+    import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: lacăt pe primul octet al fișierului
+    fcntl = None
+    import msvcrt
+
+_CTL = struct.Struct("<Qd")          # generation, published_at
+_HEADER = struct.Struct("<8sQQ")     # magic, generation, count
+_MAGIC = b"TLECAT02"
+_HEADER_SIZE = 64                    # păstrează tabloul aliniat
+
+NAME_LEN = 24
+LINE_LEN = 69
+GROUPS_LEN = 64                      # grupurile sursă, separate prin virgulă
+
+
+def _record_dtype():
+    import numpy as np
+
+    return np.dtype([
+        ("norad", "<i4"),
+        ("elements", "<f8", (len(ELEMENT_FIELDS),)),
+        ("name", f"S{NAME_LEN}"),
+        ("line1", f"S{LINE_LEN}"),
+        ("line2", f"S{LINE_LEN}"),
+        ("groups", f"S{GROUPS_LEN}"),
+    ])
+
+
+def _pack_groups(groups: Tuple[str, ...]) -> bytes:
+    # Doar grupuri întregi: cele care nu mai încap sunt omise
+    out = b""
+    for g in groups:
+        item = (b"," if out else b"") + g.encode("utf-8")
+        if len(out) + len(item) > GROUPS_LEN:
+            break
+        out += item
+    return out
+
+
+def _to_record(row) -> TLERecord:
+    return TLERecord(
+        name=row["name"].decode("utf-8", "replace"),
+        line1=row["line1"].decode("ascii", "replace"),
+        line2=row["line2"].decode("ascii", "replace"),
+        norad_id=int(row["norad"]),
+        groups=tuple(g for g in row["groups"].decode("utf-8", "replace").split(",") if g),
+    )
+
+
+class SharedSnapshot(CatalogSnapshot):
+    """One published generation, read straight from its (read-only) segment rows."""
+
+    def __init__(self, rows, generation: int, loaded_at: Optional[float],
+                 segment: Optional[shared_memory.SharedMemory] = None):
+        super().__init__(None, generation, loaded_at)
+        self.rows = rows
+        # Windows: handle-ul ține segmentul în viață cât timp există snapshot-ul
+        self._segment = segment
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def get(self, norad_id: int) -> Optional[TLERecord]:
+        import numpy as np
+
+        rows = self.rows
+        i = int(np.searchsorted(rows["norad"], norad_id))
+        if i < len(rows) and rows["norad"][i] == norad_id:
+            return _to_record(rows[i])
+        return None
+
+    def ids(self) -> List[int]:
+        return self.rows["norad"].tolist()
+
+    def records(self, limit: Optional[int] = None) -> List[TLERecord]:
+        rows = self.rows if limit is None else self.rows[:limit]
+        return [_to_record(r) for r in rows]
+
+    def element_arrays(self):
+        """``(norad_ids, elements)`` views on shared memory, ``ELEMENT_FIELDS`` columns."""
+        return self.rows["norad"], self.rows["elements"]
+
+
+def _untrack(shm: shared_memory.SharedMemory) -> None:
+    """
+    Stop multiprocessing's resource tracker from unlinking ``shm`` when this
+    process exits; segment lifetime is managed explicitly by the publisher.
+    """
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    except Exception:
+        pass
+
+
+def _unlink(shm: shared_memory.SharedMemory) -> None:
+    # unlink() se de-înregistrează singur din resource tracker; îl înregistrăm
+    # la loc ca să nu apară KeyError în procesul tracker-ului
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.register(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    except Exception:
+        pass
+    shm.unlink()
+
+
+def _map_readonly(shm: shared_memory.SharedMemory) -> mmap.mmap:
+    """
+    A private read-only mapping of ``shm``. NumPy arrays built on it keep it
+    alive, so the segment stays mapped exactly as long as some snapshot or
+    view still uses it (``SharedMemory.close`` would unmap it under them).
+    """
+    if os.name == "nt":
+        return mmap.mmap(-1, shm.size, tagname=shm.name, access=mmap.ACCESS_READ)
+    return mmap.mmap(shm._fd, shm.size, access=mmap.ACCESS_READ)  # type: ignore[attr-defined]
+
+
+# Cât de des se recitește controlul când segmentul generației curente lipsește
+_ATTACH_RETRIES = 20
+
+
+def _open(name: str, create: bool = False, size: int = 0) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+    _untrack(shm)
+    return shm
+
+
+class SharedCatalog:
+    """Generation-versioned TLE catalog in shared memory (see module docstring)."""
+
+    def __init__(self, prefix: str = "nasa-tle"):
+        self.prefix = prefix
+        self._local_lock = threading.Lock()
+        self._attach_lock = threading.Lock()
+        self._lock_path = os.path.join(tempfile.gettempdir(), f"{prefix}.lock")
+        try:
+            self._ctl = _open(f"{prefix}-ctl")
+        except FileNotFoundError:
+            try:
+                self._ctl = _open(f"{prefix}-ctl", create=True, size=_CTL.size)
+                _CTL.pack_into(self._ctl.buf, 0, 0, 0.0)
+            except FileExistsError:
+                self._ctl = _open(f"{prefix}-ctl")
+        self._snapshot: Optional[SharedSnapshot] = None
+        # Windows: handle-ul publicatorului la ultima generație publicată
+        self._published: Optional[shared_memory.SharedMemory] = None
+
+    # -- citire ---------------------------------------------------------------
+
+    def _read_ctl(self) -> Tuple[int, float]:
+        return _CTL.unpack_from(self._ctl.buf, 0)
+
+    @property
+    def generation(self) -> int:
+        return self._read_ctl()[0]
+
+    @property
+    def published_at(self) -> Optional[float]:
+        ts = self._read_ctl()[1]
+        return ts or None
+
+    def _segment_name(self, generation: int) -> str:
+        return f"{self.prefix}-g{generation}"
+
+    def snapshot(self) -> SharedSnapshot:
+        """The current generation (attaching its segment if it changed)."""
+        import numpy as np
+
+        generation, published_at = self._read_ctl()
+        current = self._snapshot
+        if current is not None and current.generation == generation:
+            return current
+        # Publicatorii folosesc alt lacăt: atașarea nu așteaptă după o publicare în curs
+        with self._attach_lock:
+            misses = 0
+            while self._snapshot is None or self._snapshot.generation != generation:
+                segment = None
+                if generation == 0:
+                    rows = np.zeros(0, dtype=_record_dtype())
+                else:
+                    try:
+                        segment = _open(self._segment_name(generation))
+                    except FileNotFoundError:
+                        misses += 1
+                        if misses >= _ATTACH_RETRIES:
+                            if self._snapshot is not None:
+                                # Rămâne la ultima generație atașată
+                                return self._snapshot
+                            raise FileNotFoundError(
+                                f"Shared catalog segment {self._segment_name(generation)} is gone.") from None
+                        # Între timp a fost publicată o generație nouă; recitește controlul
+                        time.sleep(0.001 * misses)
+                        generation, published_at = self._read_ctl()
+                        continue
+                    try:
+                        mapping = _map_readonly(segment)
+                    finally:
+                        if os.name != "nt":
+                            segment.close()
+                            segment = None
+                    _, _, count = _HEADER.unpack_from(mapping, 0)
+                    # Tablou read-only: generațiile publicate sunt imutabile
+                    rows = np.frombuffer(mapping, dtype=_record_dtype(), count=count, offset=_HEADER_SIZE)
+                # Generația veche rămâne mapată cât timp o mai ține un snapshot fixat de un cititor
+                self._snapshot = SharedSnapshot(rows, generation, published_at or None, segment)
+            return self._snapshot
+
+    def rows(self):
+        """Structured array of the current generation."""
+        return self.snapshot().rows
+
+    def __len__(self) -> int:
+        return len(self.snapshot())
+
+    def get(self, norad_id: int) -> Optional[TLERecord]:
+        return self.snapshot().get(norad_id)
+
+    def records(self, limit: Optional[int] = None) -> List[TLERecord]:
+        return self.snapshot().records(limit)
+
+    def element_arrays(self):
+        """``(norad_ids, elements)`` views on shared memory, ``ELEMENT_FIELDS`` columns."""
+        return self.snapshot().element_arrays()
+
+    # -- publicare ------------------------------------------------------------
+
+    def _acquire(self):
+        self._local_lock.acquire()
+        try:
+            handle = open(self._lock_path, "a+")
+        except BaseException:
+            self._local_lock.release()
+            raise
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            return handle
+        handle.seek(0)
+        while True:
+            try:
+                msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                return handle
+            except OSError as e:
+                # LK_LOCK renunță după ~10 s de încercări; publicarea așteaptă mai departe
+                if e.errno != errno.EDEADLOCK:
+                    handle.close()
+                    self._local_lock.release()
+                    raise
+
+    def _release(self, handle) -> None:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        handle.close()
+        self._local_lock.release()
+
+    def publish(self, records: Iterable[TLERecord], merge: bool = False) -> int:
+        """
+        Publish a new generation containing ``records`` (merged over the
+        current catalog when ``merge`` is true). Returns the new generation.
+        """
+        import numpy as np
+
+        handle = self._acquire()
+        try:
+            by_id = {}
+            if merge:
+                current = self.snapshot()
+                if current.generation != self._read_ctl()[0]:
+                    raise FileNotFoundError("The current shared catalog generation is no longer available to merge.")
+                by_id = {r.norad_id: r for r in current.records()}
+            for rec in records:
+                by_id[rec.norad_id] = rec
+
+            dtype = _record_dtype()
+            ordered = sorted(by_id.values(), key=lambda r: r.norad_id)
+            rows = np.zeros(len(ordered), dtype=dtype)
+            nan_elements = (float("nan"),) * len(ELEMENT_FIELDS)
+            for i, rec in enumerate(ordered):
+                try:
+                    elements = parse_elements(rec.line1, rec.line2)
+                except ValueError:
+                    elements = nan_elements
+                rows[i] = (
+                    rec.norad_id,
+                    elements,
+                    rec.name.encode("utf-8")[:NAME_LEN],
+                    rec.line1.encode("ascii", "replace")[:LINE_LEN],
+                    rec.line2.encode("ascii", "replace")[:LINE_LEN],
+                    _pack_groups(rec.groups),
+                )
+
+            old_generation = self._read_ctl()[0]
+            new_generation = old_generation + 1
+            segment = _open(self._segment_name(new_generation), create=True,
+                            size=max(_HEADER_SIZE + rows.nbytes, _HEADER_SIZE + 1))
+            _HEADER.pack_into(segment.buf, 0, _MAGIC, new_generation, len(rows))
+            view = np.ndarray((len(rows),), dtype=dtype, buffer=segment.buf, offset=_HEADER_SIZE)
+            view[:] = rows
+            del view
+
+            # Comutarea atomică: un singur write în segmentul de control
+            _CTL.pack_into(self._ctl.buf, 0, new_generation, time.time())
+
+            if os.name == "nt":
+                # Fără handle deschis segmentul ar dispărea înainte să-l atașeze cineva
+                segment, self._published = self._published, segment
+            if segment is not None:
+                segment.close()
+            if old_generation and os.name != "nt":
+                try:
+                    old = _open(self._segment_name(old_generation))
+                    _unlink(old)
+                    old.close()
+                except FileNotFoundError:
+                    pass
+            return new_generation
+        finally:
+            self._release(handle)
+
+    def destroy(self) -> None:
+        """Unlink the current data segment and the control segment (shutdown/cleanup)."""
+        generation = self._read_ctl()[0]
+        self._snapshot = None
+        if self._published is not None:
+            self._published.close()
+            self._published = None
+        for name in ([self._segment_name(generation)] if generation else []) + [f"{self.prefix}-ctl"]:
+            try:
+                seg = _open(name)
+                _unlink(seg)
+                seg.close()
+            except FileNotFoundError:
+                pass
+
+
+__all__ = ["SharedCatalog", "SharedSnapshot"]
@@ -5,11 +5,8 @@ import os
 from functools import lru_cache
 from typing import List
 
-from skyfield.api import Loader, load
-
 
 _DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'skyfield_cache'))
-_loader = Loader(_DATA_DIR)
 
 
 @lru_cache(maxsize=1)
@@ -19,11 +16,14 @@ def get_timescale():
     We prefer the builtin ephemeris data and cache the resulting instance so the
     expensive initialisation only happens once per process. If builtin data
     is unavailable (older Skyfield) we fall back to the default loader which
-    may use locally cached files.
+    may use locally cached files. Skyfield itself is imported here, on first
+    use, so that importing this module stays cheap.
     """
+    from skyfield.api import Loader, load
+
     errors: List[str] = []
 
-    for loader_instance in (load, _loader):
+    for loader_instance in (load, Loader(_DATA_DIR)):
         for kwargs in ({'builtin': True}, {}):
             try:
                 return loader_instance.timescale(**kwargs)
@@ -0,0 +1,383 @@
+"""Append-only on-disk TLE history, indexed by (NORAD id, epoch).
+
+``TLEStore`` keeps one element set per object; this archive keeps every
+element set ever loaded so that propagation to a past (or far future) time
+can use the set whose epoch is closest to it.
+
+Storage
+-------
+Each element set is one fixed-size binary record (``RECORD_DTYPE``, 44
+bytes: epoch and mean motion as float64, the other elements as float32,
+which still round-trips the fixed TLE columns). A year of daily sets for
+30k objects is about 480 MB. Names and international designators are kept
+once per object in ``objects.json``; lines are rebuilt with
+``tle_store.format_tle_lines``.
+
+``records.<gen>.bin`` holds a prefix sorted by (norad, epoch), described by
+``index.npz`` (generation, sorted count, per-object row offsets), followed
+by records appended since the last compaction. The sorted prefix is memory
+mapped; the appended tail is small and lives in memory, sorted, so recent
+element sets never touch the disk. ``compact()`` (run automatically when
+the tail grows past ``compact_threshold``) merges the tail into a new
+generation file and switches ``index.npz`` atomically.
+
+Lookups bisect the per-object offsets, then the object's epochs: a few
+microseconds whatever the archive size. Rebuilt records are cached (LRU).
+Appends and compactions take an ``fcntl`` lock, so several uvicorn workers
+can share one directory; each of them notices new records on its next
+lookup.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+from tle_store import TLERecord, format_tle_lines, iter_tle_text, parse_elements
+
+try:
+    import fcntl
+except ImportError:  # Windows: lacăt doar în cadrul procesului
+    fcntl = None
+
+RECORD_DTYPE = np.dtype([
+    ("norad", "<u4"),
+    ("epoch_jd", "<f8"),
+    ("mean_motion_rev_day", "<f8"),
+    ("inclination_deg", "<f4"),
+    ("raan_deg", "<f4"),
+    ("eccentricity", "<f4"),
+    ("arg_perigee_deg", "<f4"),
+    ("mean_anomaly_deg", "<f4"),
+    ("bstar", "<f4"),
+    ("ndot", "<f4"),
+])
+
+_JD_UNIX_EPOCH = 2440587.5
+_REFRESH_INTERVAL_S = 1.0
+
+
+def datetime_to_jd(t: dt.datetime) -> float:
+    return _JD_UNIX_EPOCH + t.astimezone(dt.timezone.utc).timestamp() / 86400.0
+
+
+def jd_to_datetime(jd: float) -> dt.datetime:
+    return dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc) + dt.timedelta(days=float(jd) - _JD_UNIX_EPOCH)
+
+
+def _jd_to_year_day(jd: float) -> Tuple[int, float]:
+    # Ziua anului cu fracțiune, ca în coloanele 19-32 ale liniei 1
+    t = jd_to_datetime(jd)
+    jan1 = datetime_to_jd(dt.datetime(t.year, 1, 1, tzinfo=dt.timezone.utc))
+    return t.year, jd - jan1 + 1.0
+
+
+def _sort_rows(rows: np.ndarray) -> np.ndarray:
+    return rows[np.lexsort((rows["epoch_jd"], rows["norad"]))]
+
+
+def _dedupe_sorted(rows: np.ndarray) -> np.ndarray:
+    if len(rows) < 2:
+        return rows
+    keep = np.ones(len(rows), dtype=bool)
+    keep[1:] = (rows["norad"][1:] != rows["norad"][:-1]) | (rows["epoch_jd"][1:] != rows["epoch_jd"][:-1])
+    return rows[keep]
+
+
+def _segment_contains(values: np.ndarray, lo: np.ndarray, hi: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """``x[k] in values[lo[k]:hi[k]]`` (each segment sorted), by a bisection run on all rows at once."""
+    a, b = lo.astype(np.int64), hi.astype(np.int64)
+    while True:
+        active = a < b
+        if not active.any():
+            break
+        mid = (a + b) // 2
+        right = active & (values[np.where(active, mid, 0)] < x)
+        a = np.where(right, mid + 1, a)
+        b = np.where(active & ~right, mid, b)
+    hit = a < hi
+    out = np.zeros(len(x), dtype=bool)
+    out[hit] = values[a[hit]] == x[hit]
+    return out
+
+
+class TLEHistory:
+    def __init__(self, directory: str, compact_threshold: int = 1_000_000, cache_size: int = 4096):
+        self.directory = directory
+        self.compact_threshold = compact_threshold
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._lock_path = os.path.join(directory, "history.lock")
+        self._cache: "OrderedDict[Tuple[int, float], TLERecord]" = OrderedDict()
+        self._cache_size = cache_size
+        self._objects: Dict[int, Dict[str, str]] = {}
+        self._objects_mtime = 0.0
+        self._next_refresh = 0.0
+        self._open()
+
+    # -- stare pe disc ----------------------------------------------------------
+
+    def _data_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"records.{generation}.bin")
+
+    def _open(self) -> None:
+        """(Re)load the index, map the sorted prefix and read the tail."""
+        index_path = os.path.join(self.directory, "index.npz")
+        if os.path.exists(index_path):
+            with np.load(index_path) as idx:
+                self._generation = int(idx["generation"])
+                self._sorted = int(idx["sorted_count"])
+                self._norads = idx["norads"]
+                self._starts = idx["starts"]
+        else:
+            self._generation, self._sorted = 0, 0
+            self._norads = np.zeros(0, dtype="<u4")
+            self._starts = np.zeros(1, dtype=np.int64)
+        path = self._data_path(self._generation)
+        self._prefix = (np.memmap(path, dtype=RECORD_DTYPE, mode="r", shape=(self._sorted,))
+                        if self._sorted else np.zeros(0, dtype=RECORD_DTYPE))
+        # Vedere ndarray simplă: evită costul subclasei memmap la fiecare căutare
+        self._prefix_epochs = self._prefix["epoch_jd"].view(np.ndarray)
+        self._tail = np.zeros(0, dtype=RECORD_DTYPE)
+        self._tail_norads = np.zeros(0, dtype="<u4")
+        self._tail_epochs = np.zeros(0)
+        self._seen = self._sorted
+        self._cache.clear()
+        self._read_tail()
+
+    def _read_tail(self) -> None:
+        path = self._data_path(self._generation)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        total = size // RECORD_DTYPE.itemsize          # o scriere incompletă la final e ignorată
+        if total <= self._seen:
+            return
+        with open(path, "rb") as f:
+            f.seek(self._seen * RECORD_DTYPE.itemsize)
+            new = np.frombuffer(f.read((total - self._seen) * RECORD_DTYPE.itemsize), dtype=RECORD_DTYPE)
+        self._tail = _sort_rows(np.concatenate([self._tail, new]))
+        self._tail_norads = np.ascontiguousarray(self._tail["norad"])
+        self._tail_epochs = np.ascontiguousarray(self._tail["epoch_jd"])
+        self._seen = total
+
+    def _refresh(self, force: bool = False) -> None:
+        """Pick up appends and compactions made by other processes."""
+        now = time.monotonic()
+        if not force and now < self._next_refresh:
+            return
+        self._next_refresh = now + _REFRESH_INTERVAL_S
+        index_path = os.path.join(self.directory, "index.npz")
+        if os.path.exists(index_path):
+            with np.load(index_path) as idx:
+                generation = int(idx["generation"])
+            if generation != self._generation:
+                self._open()
+        self._read_tail()
+        objects_path = os.path.join(self.directory, "objects.json")
+        if os.path.exists(objects_path) and os.path.getmtime(objects_path) != self._objects_mtime:
+            self._objects_mtime = os.path.getmtime(objects_path)
+            with open(objects_path, "r", encoding="utf-8") as f:
+                self._objects = {int(k): v for k, v in json.load(f).items()}
+
+    def _acquire(self):
+        self._lock.acquire()
+        handle = None
+        if fcntl is not None:
+            handle = open(self._lock_path, "a+")
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def _release(self, handle) -> None:
+        if handle is not None:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+        self._lock.release()
+
+    # -- scriere ----------------------------------------------------------------
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self._sorted + len(self._tail)
+
+    @property
+    def object_count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(np.union1d(self._norads, self._tail["norad"]))
+
+    def append(self, records: Iterable[TLERecord]) -> int:
+        """Archive element sets not seen before; returns how many were new."""
+        parsed = []
+        meta: Dict[int, Dict[str, str]] = {}
+        for rec in records:
+            try:
+                el = parse_elements(rec.line1, rec.line2)
+            except ValueError:
+                continue
+            (epoch, inc, raan, ecc, argp, ma, mm, bstar, ndot) = el
+            parsed.append((rec.norad_id, epoch, mm, inc, raan, ecc, argp, ma, bstar, ndot))
+            meta[rec.norad_id] = {"name": rec.name, "intl": rec.line1[9:17].strip()}
+        if not parsed:
+            return 0
+        rows = _dedupe_sorted(_sort_rows(np.array(parsed, dtype=RECORD_DTYPE)))
+
+        handle = self._acquire()
+        try:
+            self._refresh(force=True)
+            rows = rows[~self._contains(rows)]
+            if len(rows):
+                with open(self._data_path(self._generation), "ab") as f:
+                    f.truncate(self._seen * RECORD_DTYPE.itemsize)
+                    f.write(rows.tobytes())
+                self._read_tail()
+            changed = {k: v for k, v in meta.items() if self._objects.get(k) != v}
+            if changed:
+                self._objects.update(changed)
+                self._write_json("objects.json", {str(k): v for k, v in self._objects.items()})
+                self._objects_mtime = os.path.getmtime(os.path.join(self.directory, "objects.json"))
+            if len(self._tail) >= self.compact_threshold:
+                self._compact_locked()
+            return int(len(rows))
+        finally:
+            self._release(handle)
+
+    def append_text(self, tle_text: str) -> int:
+        """Archive every element set in TLE text (several epochs per object allowed)."""
+        return self.append(iter_tle_text(tle_text))
+
+    def _contains(self, rows: np.ndarray) -> np.ndarray:
+        """Which ``(norad, epoch)`` pairs of ``rows`` are already archived."""
+        found = np.zeros(len(rows), dtype=bool)
+        norads, epochs = rows["norad"], rows["epoch_jd"]
+        if len(self._norads):
+            i = np.minimum(np.searchsorted(self._norads, norads), len(self._norads) - 1)
+            has = self._norads[i] == norads
+            lo = np.where(has, self._starts[i], 0)
+            hi = np.where(has, self._starts[i + 1], 0)
+            found |= _segment_contains(self._prefix["epoch_jd"], lo, hi, epochs)
+        if len(self._tail):
+            lo = np.searchsorted(self._tail_norads, norads, "left")
+            hi = np.searchsorted(self._tail_norads, norads, "right")
+            found |= _segment_contains(self._tail_epochs, lo, hi, epochs)
+        return found
+
+    def _write_json(self, name: str, payload) -> None:
+        path = os.path.join(self.directory, name)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp, path)
+
+    def compact(self) -> None:
+        """Merge the appended tail into a new sorted generation."""
+        handle = self._acquire()
+        try:
+            self._refresh(force=True)
+            self._compact_locked()
+        finally:
+            self._release(handle)
+
+    def _compact_locked(self) -> None:
+        if not len(self._tail):
+            return
+        merged = _sort_rows(np.concatenate([np.asarray(self._prefix), self._tail]))
+        norads = merged["norad"]
+        first = np.flatnonzero(np.r_[True, norads[1:] != norads[:-1]])
+        generation = self._generation + 1
+        path = self._data_path(generation)
+        merged.tofile(path)
+        index_path = os.path.join(self.directory, "index.npz")
+        tmp = f"{index_path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, generation=generation, sorted_count=len(merged),
+                 norads=norads[first].copy(), starts=np.append(first, len(merged)).astype(np.int64))
+        os.replace(tmp, index_path)
+        old = self._data_path(self._generation)
+        self._open()
+        if os.path.exists(old):
+            os.unlink(old)  # cititorii care încă îl au mapat își păstrează vederea
+
+    # -- interogări -------------------------------------------------------------
+
+    def _epoch_slices(self, norad: int):
+        """Sorted epoch arrays of ``norad`` in the sorted prefix and in the tail."""
+        # Cheia cu același dtype ca tabloul, altfel searchsorted convertește tot tabloul
+        norad = np.uint32(norad)
+        i = int(np.searchsorted(self._norads, norad))
+        if i < len(self._norads) and self._norads[i] == norad:
+            yield self._prefix_epochs[self._starts[i]:self._starts[i + 1]]
+        if len(self._tail):
+            lo = int(np.searchsorted(self._tail_norads, norad, "left"))
+            hi = int(np.searchsorted(self._tail_norads, norad, "right"))
+            if hi > lo:
+                yield self._tail_epochs[lo:hi]
+
+    def epochs(self, norad_id: int) -> np.ndarray:
+        """All archived epochs (JD) of an object, ascending."""
+        with self._lock:
+            self._refresh()
+            parts = list(self._epoch_slices(norad_id))
+        return np.sort(np.concatenate(parts)) if parts else np.zeros(0)
+
+    def _row(self, norad: int, epoch: float) -> Optional[np.void]:
+        norad = np.uint32(norad)
+        i = int(np.searchsorted(self._norads, norad))
+        if i < len(self._norads) and self._norads[i] == norad:
+            lo, hi = int(self._starts[i]), int(self._starts[i + 1])
+            k = lo + int(np.searchsorted(self._prefix_epochs[lo:hi], epoch))
+            if k < hi and self._prefix_epochs[k] == epoch:
+                return self._prefix[k]
+        lo = int(np.searchsorted(self._tail_norads, norad, "left")) if len(self._tail) else 0
+        hi = int(np.searchsorted(self._tail_norads, norad, "right")) if len(self._tail) else 0
+        k = lo + int(np.searchsorted(self._tail_epochs[lo:hi], epoch)) if hi > lo else hi
+        if k < hi and self._tail_epochs[k] == epoch:
+            return self._tail[k]
+        return None
+
+    def nearest(self, norad_id: int, when: Union[dt.datetime, float]) -> Optional[TLERecord]:
+        """
+        Archived element set of ``norad_id`` whose epoch is closest to
+        ``when`` (datetime or JD), or None if the object has no history.
+        """
+        jd = datetime_to_jd(when) if isinstance(when, dt.datetime) else float(when)
+        with self._lock:
+            self._refresh()
+            best = None
+            for epochs in self._epoch_slices(norad_id):
+                k = int(np.searchsorted(epochs, jd))
+                for j in (k - 1, k):
+                    if 0 <= j < len(epochs) and (best is None or abs(epochs[j] - jd) < abs(best - jd)):
+                        best = float(epochs[j])
+            if best is None:
+                return None
+            key = (norad_id, best)
+            rec = self._cache.get(key)
+            if rec is not None:
+                self._cache.move_to_end(key)
+                return rec
+            row = self._row(norad_id, best)
+            rec = self._to_record(row)
+            self._cache[key] = rec
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+            return rec
+
+    def _to_record(self, row: np.void) -> TLERecord:
+        norad = int(row["norad"])
+        meta = self._objects.get(norad, {})
+        year, day = _jd_to_year_day(float(row["epoch_jd"]))
+        line1, line2 = format_tle_lines(
+            norad, year, day,
+            float(row["inclination_deg"]), float(row["raan_deg"]), float(row["eccentricity"]),
+            float(row["arg_perigee_deg"]), float(row["mean_anomaly_deg"]), float(row["mean_motion_rev_day"]),
+            bstar=float(row["bstar"]), ndot=float(row["ndot"]), intl_designator=meta.get("intl", ""),
+        )
+        return TLERecord(name=meta.get("name", "UNKNOWN"), line1=line1, line2=line2, norad_id=norad)
+
+
+__all__ = ["RECORD_DTYPE", "TLEHistory", "datetime_to_jd", "jd_to_datetime"]
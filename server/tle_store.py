@@ -1,6 +1,12 @@
+import datetime as dt
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import math
 import re
+import threading
+import time
 
 @dataclass
 class TLERecord:
@@ -8,63 +14,431 @@ class TLERecord:
     line1: str
     line2: str
     norad_id: int
+    groups: Tuple[str, ...] = ()    # grupurile CelesTrak din care provine obiectul
+
+# Ordinea coloanelor din tabloul de elemente (vezi parse_elements)
+ELEMENT_FIELDS = (
+    "epoch_jd",
+    "inclination_deg",
+    "raan_deg",
+    "eccentricity",
+    "arg_perigee_deg",
+    "mean_anomaly_deg",
+    "mean_motion_rev_day",
+    "bstar",
+    "ndot",
+)
+
+
+def _parse_tle_exp(field: str) -> float:
+    # " 22906-3" -> 0.22906e-3
+    s = field.strip()
+    if not s:
+        return 0.0
+    sign = -1.0 if s[0] == "-" else 1.0
+    s = s.lstrip("+-")
+    mantissa, exp = s[:-2], s[-2:]
+    return sign * float("0." + mantissa.strip()) * 10 ** int(exp)
+
+
+def tle_epoch_jd(line1: str) -> float:
+    """Julian date of the element set epoch (line 1, columns 19-32)."""
+    yy = int(line1[18:20])
+    year = 2000 + yy if yy < 57 else 1900 + yy
+    day = float(line1[20:32])
+    return dt.date(year, 1, 1).toordinal() + 1721424.5 + day - 1.0
+
+
+def parse_elements(line1: str, line2: str) -> Tuple[float, ...]:
+    """
+    Mean elements from the fixed TLE columns, in ``ELEMENT_FIELDS`` order.
+    Raises ValueError on malformed lines.
+    """
+    return (
+        tle_epoch_jd(line1),
+        float(line2[8:16]),
+        float(line2[17:25]),
+        float("0." + line2[26:33].strip()),
+        float(line2[34:42]),
+        float(line2[43:51]),
+        float(line2[52:63]),
+        _parse_tle_exp(line1[53:61]),
+        float(line1[33:43].replace(" ", "") or 0.0),
+    )
+
+
+def _tle_checksum(line: str) -> int:
+    total = 0
+    for ch in line[:68]:
+        if ch.isdigit():
+            total += int(ch)
+        elif ch == "-":
+            total += 1
+    return total % 10
+
+
+def _tle_exp(value: float) -> str:
+    # Notația TLE cu punct zecimal implicit: 0.12345e-3 -> " 12345-3"
+    if value == 0:
+        return " 00000-0"
+    exp = int(math.floor(math.log10(abs(value)))) + 1
+    mantissa = int(round(abs(value) / 10 ** exp * 1e5))
+    if mantissa >= 100000:
+        mantissa //= 10
+        exp += 1
+    return f"{'-' if value < 0 else ' '}{mantissa:05d}{'-' if exp < 0 else '+'}{abs(exp)}"
+
+
+def format_tle_lines(
+    norad_id: int,
+    epoch_year: int,
+    epoch_day: float,
+    inclination_deg: float,
+    raan_deg: float,
+    eccentricity: float,
+    arg_perigee_deg: float,
+    mean_anomaly_deg: float,
+    mean_motion_rev_day: float,
+    bstar: float = 0.0,
+    ndot: float = 0.0,
+    intl_designator: str = "",
+    element_number: int = 999,
+    rev_number: int = 0,
+) -> tuple:
+    """
+    Build a (line1, line2) pair in the fixed-column TLE format, checksums included.
+    """
+    ndot_str = f"{ndot:.8f}".replace("0.", ".", 1)
+    ndot_str = ndot_str if ndot_str.startswith("-") else " " + ndot_str
+    l1 = (
+        f"1 {norad_id:05d}U {intl_designator:<8.8} {epoch_year % 100:02d}{epoch_day:012.8f} "
+        f"{ndot_str} {_tle_exp(0.0)} {_tle_exp(bstar)} 0 {element_number % 10000:4d}"
+    )
+    ecc_str = f"{eccentricity:.7f}"[2:]
+    l2 = (
+        f"2 {norad_id:05d} {inclination_deg % 180.0 if inclination_deg != 180.0 else 180.0:8.4f} "
+        f"{raan_deg % 360.0:8.4f} {ecc_str} {arg_perigee_deg % 360.0:8.4f} "
+        f"{mean_anomaly_deg % 360.0:8.4f} {mean_motion_rev_day:11.8f}{rev_number % 100000:5d}"
+    )
+    return l1 + str(_tle_checksum(l1)), l2 + str(_tle_checksum(l2))
+
+
+def _extract_norad(line1: str) -> Optional[int]:
+    # Line 1 columns 3-7 = satellite catalog number (NORAD)
+    try:
+        m = re.match(r"1\s+(\d+)", line1)
+        if m:
+            return int(m.group(1))
+        return None
+    except Exception:
+        return None
+
+
+def iter_tle_lines(lines: Iterable[str]) -> Iterator[TLERecord]:
+    """
+    Records of classic TLE lines (blocks of 3 lines: name, line1, line2; the
+    name may be omitted), in order, consuming ``lines`` lazily so a download
+    can be parsed while it streams. Several element sets of the same object
+    (history files) are all yielded.
+    """
+    buf: List[str] = []
+
+    def take() -> Optional[TLERecord]:
+        # Validate typical TLE line starts
+        if len(buf) >= 3 and buf[1].startswith("1 ") and buf[2].startswith("2 "):
+            name, l1, l2 = buf[0], buf[1], buf[2]
+            del buf[:3]
+        elif buf[0].startswith("1 ") and buf[1].startswith("2 "):
+            # Try shift if name omitted
+            name, l1, l2 = "UNKNOWN", buf[0], buf[1]
+            del buf[:2]
+        else:
+            del buf[0]
+            return None
+        norad = _extract_norad(l1)
+        if norad is None:
+            return None
+        return TLERecord(name=name, line1=l1, line2=l2, norad_id=norad)
+
+    for raw in lines:
+        line = raw.strip()
+        if not line:
+            continue
+        buf.append(line)
+        while len(buf) >= 3:
+            rec = take()
+            if rec is not None:
+                yield rec
+    while len(buf) >= 2:
+        rec = take()
+        if rec is not None:
+            yield rec
+
+
+def iter_tle_text(tle_text: str) -> Iterator[TLERecord]:
+    """Records of classic TLE text, in file order (see ``iter_tle_lines``)."""
+    return iter_tle_lines(tle_text.splitlines())
+
+
+def merge_newest(sources: Dict[str, Iterable[TLERecord]]) -> Dict[int, TLERecord]:
+    """
+    Merge records from several named sources (e.g. CelesTrak groups): one
+    record per NORAD id, the one with the newest epoch, tagged with every
+    source the object appeared in.
+    """
+    merged: Dict[int, TLERecord] = {}
+    epochs: Dict[int, float] = {}
+    groups: Dict[int, List[str]] = {}
+    for source, records in sources.items():
+        for rec in records:
+            try:
+                epoch = tle_epoch_jd(rec.line1)
+            except ValueError:
+                epoch = float("-inf")
+            tags = groups.setdefault(rec.norad_id, [])
+            if source not in tags:
+                tags.append(source)
+            if rec.norad_id not in merged or epoch > epochs[rec.norad_id]:
+                merged[rec.norad_id] = rec
+                epochs[rec.norad_id] = epoch
+    for norad, rec in merged.items():
+        rec.groups = tuple(groups[norad])
+    return merged
+
+
+class CatalogSnapshot:
+    """
+    One immutable version of the catalog: the records, their ``generation``
+    and when it was published (``loaded_at``). Loads never modify a
+    snapshot; they build the next one and swap it in, so a reader holding
+    a snapshot keeps a consistent catalog for as long as it needs it.
+    """
+
+    def __init__(self, by_id: Optional[Dict[int, TLERecord]] = None, generation: int = 0,
+                 loaded_at: Optional[float] = None):
+        self._by_id: Dict[int, TLERecord] = by_id if by_id is not None else {}
+        self.generation = generation
+        self.loaded_at = loaded_at
+        self._arrays = None     # element_arrays(), calculate o singură dată per versiune
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def get(self, norad_id: int) -> Optional[TLERecord]:
+        return self._by_id.get(norad_id)
+
+    def ids(self) -> List[int]:
+        return list(self._by_id)
+
+    def records(self, limit: Optional[int] = None) -> List[TLERecord]:
+        records = list(self._by_id.values())
+        return records if limit is None else records[:limit]
+
+    def element_arrays(self):
+        """Read-only ``(norad_ids, elements)`` arrays (see ``TLEStore.element_arrays``)."""
+        if self._arrays is None:
+            import numpy as np
+
+            recs = self.records()
+            ids = np.fromiter((r.norad_id for r in recs), dtype=np.int32, count=len(recs))
+            elements = np.full((len(recs), len(ELEMENT_FIELDS)), np.nan)
+            for i, r in enumerate(recs):
+                try:
+                    elements[i] = parse_elements(r.line1, r.line2)
+                except ValueError:
+                    pass
+            ids.flags.writeable = False
+            elements.flags.writeable = False
+            self._arrays = (ids, elements)
+        return self._arrays
+
+
+class CatalogSnapshotMiddleware:
+    """
+    Pure ASGI middleware that pins one catalog snapshot per HTTP request
+    (see ``TLEStore.pinned``) and reports its generation in the
+    ``X-Catalog-Generation`` response header.
+    """
+
+    def __init__(self, app, store: "TLEStore"):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with self.store.pinned() as box:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    # Generația de la sfârșitul cererii: o încărcare din cerere o avansează
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-catalog-generation", str(box[0].generation).encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
 
 class TLEStore:
-    def __init__(self):
-        self._by_id: Dict[int, TLERecord] = {}
+    """
+    NORAD-indexed TLE catalog, served as immutable ``CatalogSnapshot``
+    versions.
+
+    Every load builds the next snapshot off to the side (copy-on-write) and
+    publishes it with a single reference assignment, so reads never take a
+    lock and never see a half-loaded catalog; a snapshot a reader still
+    holds stays valid until it is dropped. By default snapshots live in
+    this process. With ``shared`` set to a ``shared_catalog.SharedCatalog``
+    they live in shared memory instead: every process built on the same
+    prefix sees the same generations.
+    """
+
+    def __init__(self, shared=None):
+        self._shared = shared
+        self._snapshot = CatalogSnapshot()
+        self._write_lock = threading.Lock()     # doar între scriitori
+        self._pinned: ContextVar[Optional[List[CatalogSnapshot]]] = ContextVar(f"tle_store_pin_{id(self)}",
+                                                                               default=None)
+        self._listeners: List[Callable[[List[TLERecord], List[int]], None]] = []
+
+    @property
+    def shared(self) -> bool:
+        return self._shared is not None
+
+    def _current(self) -> CatalogSnapshot:
+        if self._shared is not None:
+            return self._shared.snapshot()
+        return self._snapshot
+
+    def snapshot(self) -> CatalogSnapshot:
+        """The snapshot pinned for the current context, else the latest published one."""
+        box = self._pinned.get()
+        return box[0] if box is not None else self._current()
+
+    @contextmanager
+    def pinned(self) -> Iterator[List[CatalogSnapshot]]:
+        """
+        Serve every read of this store inside the block (including worker
+        threads that copy the context, like FastAPI's threadpool) from one
+        snapshot. Yields a one-item list holding it; a load made inside the
+        block moves the pin to the snapshot it published.
+        """
+        box = [self._current()]
+        token = self._pinned.set(box)
+        try:
+            yield box
+        finally:
+            self._pinned.reset(token)
+
+    @property
+    def generation(self) -> int:
+        """Generation of the catalog being read (0 before the first load)."""
+        return self.snapshot().generation
+
+    @property
+    def last_loaded(self) -> Optional[float]:
+        return self.snapshot().loaded_at
+
+    def __len__(self) -> int:
+        return len(self.snapshot())
+
+    def add_listener(self, listener: Callable[[List[TLERecord], List[int]], None]) -> None:
+        """
+        Call ``listener(changed, removed)`` after every change made through
+        this store: the records that were added or got a new element set,
+        and the NORAD ids that were dropped. Loads published by other
+        processes on a shared catalog are not reported (watch ``generation``).
+        """
+        self._listeners.append(listener)
+
+    @staticmethod
+    def _diff(base: CatalogSnapshot, parsed: Dict[int, TLERecord],
+              replace: bool) -> Tuple[List[TLERecord], List[int]]:
+        changed = []
+        for i, r in parsed.items():
+            old = base.get(i)
+            if old is None or old.line1 != r.line1 or old.line2 != r.line2:
+                changed.append(r)
+        removed = [i for i in base.ids() if i not in parsed] if replace else []
+        return changed, removed
+
+    def _notify(self, changed: List[TLERecord], removed: List[int]) -> None:
+        if changed or removed:
+            for listener in self._listeners:
+                listener(changed, removed)
 
     def clear(self):
-        self._by_id.clear()
+        """Publish an empty catalog."""
+        self.load_records({}, replace=True)
 
-    def load_from_text(self, tle_text: str) -> int:
+    def _parse_text(self, tle_text: str) -> Dict[int, TLERecord]:
         """
         Parse classic TLE text (blocks of 3 lines: name, line1, line2).
         """
-        lines = [l.strip() for l in tle_text.splitlines() if l.strip()]
-        count = 0
-        i = 0
-        while i + 2 < len(lines):
-            name = lines[i]
-            l1 = lines[i + 1]
-            l2 = lines[i + 2]
-            # Validate typical TLE line starts
-            if not (l1.startswith("1 ") and l2.startswith("2 ")):
-                # Try shift if name omitted
-                if lines[i].startswith("1 ") and lines[i+1].startswith("2 "):
-                    name = "UNKNOWN"
-                    l1 = lines[i]
-                    l2 = lines[i+1]
-                    i += 2
-                else:
-                    i += 1
-                    continue
+        return {rec.norad_id: rec for rec in iter_tle_text(tle_text)}
+
+    def load_from_text(self, tle_text: str, replace: bool = False) -> int:
+        """
+        Parse classic TLE text (blocks of 3 lines: name, line1, line2) and add
+        it to the catalog; with ``replace`` the previous contents are dropped
+        in the same step, so readers never observe an empty catalog.
+        """
+        return self.load_records(self._parse_text(tle_text), replace=replace)
+
+    def load_records(self, parsed: Dict[int, TLERecord], replace: bool = False) -> int:
+        """
+        Publish a new snapshot with the NORAD-indexed records added (see
+        ``load_from_text``). Without ``replace`` an object that is already
+        loaded keeps its source groups in addition to the new ones.
+        """
+        with self._write_lock:
+            base = self._current()
+            if not replace:
+                for norad, rec in parsed.items():
+                    old = base.get(norad) if rec.groups else None
+                    if old is not None and old.groups:
+                        rec.groups = tuple(dict.fromkeys(old.groups + rec.groups))
+            changed, removed = self._diff(base, parsed, replace) if self._listeners else ([], [])
+            if self._shared is not None:
+                self._shared.publish(parsed.values(), merge=not replace)
+                new = self._shared.snapshot()
             else:
-                i += 3
+                # Copy-on-write: versiunea curentă rămâne neatinsă pentru cititorii care o folosesc
+                by_id = dict(parsed) if replace else {**base._by_id, **parsed}
+                new = CatalogSnapshot(by_id, base.generation + 1, time.time())
+                self._snapshot = new        # publicarea: o singură atribuire
+            box = self._pinned.get()
+            if box is not None:
+                box[0] = new
+            self._notify(changed, removed)
+        return len(parsed)
 
-            norad = self._extract_norad(l1)
-            if norad is None:
-                continue
+    def get(self, norad_id: int) -> Optional[TLERecord]:
+        return self.snapshot().get(norad_id)
 
-            rec = TLERecord(name=name, line1=l1, line2=l2, norad_id=norad)
-            self._by_id[norad] = rec
-            count += 1
-        return count
+    def records(self) -> List[TLERecord]:
+        return self.snapshot().records()
 
-    def _extract_norad(self, line1: str) -> Optional[int]:
-        # Line 1 columns 3-7 = satellite catalog number (NORAD)
-        try:
-            m = re.match(r"1\s+(\d+)", line1)
-            if m:
-                return int(m.group(1))
-            return None
-        except Exception:
-            return None
+    def element_arrays(self):
+        """
+        ``(norad_ids, elements)`` read-only NumPy arrays, one row per object,
+        element columns in ``ELEMENT_FIELDS`` order (NaN rows for unparsable
+        lines). Computed once per snapshot; shared stores return views on
+        the shared segment.
+        """
+        return self.snapshot().element_arrays()
 
-    def get(self, norad_id: int) -> Optional[TLERecord]:
-        return self._by_id.get(norad_id)
+    def list_objects(self, limit: int = 100, group: Optional[str] = None) -> List[dict]:
+        snapshot = self.snapshot()
+        records = snapshot.records(limit=limit) if group is None else \
+            [r for r in snapshot.records() if group in r.groups][:limit]
+        return [{"norad_id": rec.norad_id, "name": rec.name, "groups": list(rec.groups)} for rec in records]
 
-    def list_objects(self, limit: int = 100) -> List[dict]:
-        items = []
-        for k, rec in list(self._by_id.items())[:limit]:
-            items.append({"norad_id": rec.norad_id, "name": rec.name})
-        return items
\ No newline at end of file
+    def groups(self) -> Dict[str, int]:
+        """Number of loaded objects per source group."""
+        counts: Dict[str, int] = {}
+        for rec in self.snapshot().records():
+            for g in rec.groups:
+                counts[g] = counts.get(g, 0) + 1
+        return counts
@@ -0,0 +1,582 @@
+"""Standing conjunction watchlist: protected assets screened continuously.
+
+Assets are NORAD ids. For each one the watchlist keeps
+
+* the neighbour set: catalog objects whose perigee/apogee shell comes within
+  ``threshold_km`` of the asset's (the ``debris.shell_overlaps`` test, done
+  on the mean elements of the whole catalog at once), and
+* the closest approach of every neighbour in each time block of the
+  screening window, stored only when it is within ``threshold_km``.
+
+The window covers ``window_minutes`` from the start of the current block
+of ``block_minutes`` (blocks are aligned on UNIX time), so it moves forward
+one block at a time: the oldest block is dropped and only the new one is
+screened for every pair. Catalog loads reach the watchlist through the
+``TLEStore`` listener (or, for loads published by another worker on a
+shared catalog, a diff of the element arrays); only the pairs that touch
+an updated object are screened again over the window, plus the full
+neighbour set of an updated asset. The steady-state cost therefore follows
+the update churn, not the catalog size.
+
+All screening runs on one background thread. Readers get an immutable
+view swapped in after every pass (no lock), and every change of an asset's
+conjunctions is an event with a sequence number that clients can poll or
+long-poll (``events(since, wait_s)`` from a thread, ``wait_events`` from
+the event loop without holding a thread).
+"""
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from collision import approach_pc, satrec_epoch_jd
+from debris import MU_KM3_S2, closest_approaches
+from metrics import WATCHLIST_PAIR_BLOCKS
+from propagate import satrec_from_record, time_grid
+from tle_store import ELEMENT_FIELDS, TLERecord, parse_elements
+
+logger = logging.getLogger(__name__)
+
+_MEAN_MOTION = ELEMENT_FIELDS.index("mean_motion_rev_day")
+_ECCENTRICITY = ELEMENT_FIELDS.index("eccentricity")
+
+
+def orbit_shells(elements: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Perigee and apogee radii (km) for rows of ``ELEMENT_FIELDS`` mean elements (NaN if unparsable)."""
+    elements = np.atleast_2d(elements)
+    n_rad_s = elements[:, _MEAN_MOTION] * 2.0 * math.pi / 86400.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a = np.cbrt(MU_KM3_S2 / (n_rad_s * n_rad_s))
+    ecc = elements[:, _ECCENTRICITY]
+    return a * (1.0 - ecc), a * (1.0 + ecc)
+
+
+@dataclass
+class Encounter:
+    norad_id: int
+    name: str
+    block: int
+    min_distance_km: float
+    tca: float                      # UNIX time
+    relative_velocity_kms: float
+    collision_probability: float
+
+    def to_dict(self) -> Dict:
+        return {
+            "norad_id": self.norad_id,
+            "name": self.name,
+            "min_distance_km": round(self.min_distance_km, 3),
+            "closest_approach_time": dt.datetime.fromtimestamp(self.tca, dt.timezone.utc)
+            .isoformat().replace("+00:00", "Z"),
+            "relative_velocity_kms": round(self.relative_velocity_kms, 3),
+            "collision_probability": self.collision_probability,
+        }
+
+
+@dataclass
+class AssetState:
+    norad_id: int
+    name: str = ""
+    status: str = "pending"         # pending | ok | missing | error
+    error: Optional[str] = None
+    shell: Tuple[float, float] = (math.nan, math.nan)
+    neighbours: Set[int] = field(default_factory=set)
+    # vecin -> bloc -> apropierea din bloc (doar cele sub prag)
+    encounters: Dict[int, Dict[int, Encounter]] = field(default_factory=dict)
+    screened_at: Optional[float] = None
+
+    def conjunctions(self) -> List[Encounter]:
+        """Closest approach per neighbour over the window, by Pc then distance."""
+        best = [min(blocks.values(), key=lambda e: e.min_distance_km)
+                for blocks in self.encounters.values() if blocks]
+        best.sort(key=lambda e: (-e.collision_probability, e.min_distance_km))
+        return best
+
+
+class Watchlist:
+    """Assets screened against a ``TLEStore`` (see module docstring)."""
+
+    def __init__(
+        self,
+        store,
+        threshold_km: float = 50.0,
+        window_minutes: int = 1440,
+        block_minutes: int = 60,
+        step_s: int = 60,
+        hbr_m: float = 10.0,
+        pc_method: str = "foster",
+        path: Optional[str] = None,
+        max_events: int = 1000,
+        clock: Callable[[], float] = time.time,
+    ):
+        if window_minutes % block_minutes:
+            raise ValueError("window_minutes must be a multiple of block_minutes.")
+        self.store = store
+        self.threshold_km = threshold_km
+        self.block_s = block_minutes * 60
+        self.n_blocks = window_minutes // block_minutes
+        self.step_s = step_s
+        self.hbr_km = hbr_m / 1000.0
+        self.pc_method = pc_method
+        self.path = path
+        self._clock = clock
+
+        self._cond = threading.Condition()                  # coada de modificări, evenimente
+        self._work_lock = threading.Lock()                  # o singură trecere de screening odată
+        self._assets: Dict[int, AssetState] = {}
+        self._dirty: Set[int] = set()                       # active de re-evaluat complet
+        self._changed: Set[int] = set()
+        self._removed: Set[int] = set()
+        self._synced_generation: Optional[int] = None
+        self._base = None                                   # snapshot-ul comparat la un catalog partajat
+        self._window: Optional[Tuple[int, int]] = None      # [primul bloc, ultimul bloc + 1)
+        self._models: Dict[int, Tuple[str, str, object]] = {}
+        self._reported: Dict[int, Dict[int, Tuple[float, float, float]]] = {}
+        self._summaries: Dict[int, Dict] = {}               # rezumatul publicat al fiecărui activ
+        self._events: deque = deque(maxlen=max_events)
+        self.seq = 0
+        self._view: Dict = {}
+        self.version = 0                                    # crește la fiecare vedere publicată
+        self._file_mtime: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        # Long-poll-urile asincrone: bucla și evenimentul asyncio de setat la evenimente noi
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+        for norad_id in self._read_assets():
+            self._assets[norad_id] = AssetState(norad_id)
+            self._dirty.add(norad_id)
+        if self.path and os.path.exists(self.path):
+            self._file_mtime = os.stat(self.path).st_mtime_ns
+        self._publish()
+        store.add_listener(self._on_catalog_change)
+
+    # -- active ----------------------------------------------------------------
+
+    def add(self, norad_ids: Iterable[int]) -> List[int]:
+        """Watch ``norad_ids``; returns the ones that were not watched yet (screened in the background)."""
+        self.sync_assets()
+        with self._cond:
+            added = [int(i) for i in dict.fromkeys(norad_ids) if int(i) not in self._assets]
+            for norad_id in added:
+                self._assets[norad_id] = AssetState(norad_id)
+                self._dirty.add(norad_id)
+            if added:
+                self._write_assets()
+                self._publish()
+                self._cond.notify_all()
+        if added:
+            self.start()
+        return added
+
+    def remove(self, norad_id: int) -> bool:
+        self.sync_assets()
+        with self._cond:
+            if self._assets.pop(norad_id, None) is None:
+                return False
+            self._dirty.discard(norad_id)
+            self._reported.pop(norad_id, None)
+            self._summaries.pop(norad_id, None)
+            self._write_assets()
+            self._publish()
+            self._cond.notify_all()
+        return True
+
+    @property
+    def assets(self) -> List[int]:
+        return sorted(self._assets)
+
+    def sync_assets(self) -> None:
+        """Pick up assets added or removed by another process through the ``path`` file."""
+        if not self.path:
+            return
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._file_mtime:
+            return
+        ids = set(self._read_assets())
+        with self._cond:
+            self._file_mtime = mtime
+            added = ids - self._assets.keys()
+            gone = self._assets.keys() - ids
+            for norad_id in added:
+                self._assets[norad_id] = AssetState(norad_id)
+                self._dirty.add(norad_id)
+            for norad_id in gone:
+                del self._assets[norad_id]
+                self._dirty.discard(norad_id)
+                self._reported.pop(norad_id, None)
+                self._summaries.pop(norad_id, None)
+            if added or gone:
+                self._publish()
+                self._cond.notify_all()
+        if added:
+            self.start()
+
+    def _read_assets(self) -> List[int]:
+        if not self.path or not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return [int(i) for i in json.load(f).get("assets", [])]
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable watchlist file %s", self.path)
+            return []
+
+    def _write_assets(self) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.tmp{threading.get_ident()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"assets": sorted(self._assets)}, f)
+        os.replace(tmp, self.path)
+        self._file_mtime = os.stat(self.path).st_mtime_ns
+
+    # -- modificări ale catalogului --------------------------------------------
+
+    def _on_catalog_change(self, changed: List[TLERecord], removed: List[int]) -> None:
+        # Apelat sub lacătul de scriere al catalogului: doar se notează, calculul e pe firul watchlist-ului
+        with self._cond:
+            ids = {r.norad_id for r in changed}
+            self._changed |= ids
+            self._changed.difference_update(removed)
+            self._removed = (self._removed - ids) | set(removed)
+            self._synced_generation = self.store.generation
+            if self._assets:
+                self._cond.notify_all()
+
+    def _shared_diff(self, snapshot) -> None:
+        """A shared catalog republished by another worker: objects whose element rows changed."""
+        ids, elements = snapshot.element_arrays()
+        if self._base is None:
+            changed, removed = set(), set()
+        else:
+            old_ids, old_elements = self._base.element_arrays()
+            pos = np.minimum(np.searchsorted(old_ids, ids), max(len(old_ids) - 1, 0))
+            found = (pos < len(old_ids)) & (old_ids[pos] == ids) if len(old_ids) else np.zeros(len(ids), bool)
+            same = found.copy()
+            same[found] = np.all((old_elements[pos[found]] == elements[found])
+                                 | (np.isnan(old_elements[pos[found]]) & np.isnan(elements[found])), axis=1)
+            changed = set(ids[~same].tolist())
+            removed = set(np.setdiff1d(old_ids, ids).tolist())
+        with self._cond:
+            self._changed = (self._changed | changed) - removed
+            self._removed = (self._removed - changed) | removed
+
+    # -- screening -------------------------------------------------------------
+
+    def _model(self, rec: TLERecord):
+        cached = self._models.get(rec.norad_id)
+        if cached is not None and cached[0] == rec.line1 and cached[1] == rec.line2:
+            return cached[2]
+        model = satrec_from_record(rec)
+        self._models[rec.norad_id] = (rec.line1, rec.line2, model)
+        return model
+
+    def _screen(self, asset: AssetState, rec: TLERecord, neighbours: List[TLERecord],
+                blocks: Iterable[int], reason: str) -> Dict[int, Dict[int, Encounter]]:
+        """Closest approaches of ``neighbours`` per block, only those within the threshold."""
+        out: Dict[int, Dict[int, Encounter]] = {}
+        if not neighbours:
+            return out
+        primary = self._model(rec)
+        models = [self._model(r) for r in neighbours]
+        epochs = [satrec_epoch_jd(m) for m in models]
+        for block in blocks:
+            start = dt.datetime.fromtimestamp(block * self.block_s, dt.timezone.utc)
+            jd, fr = time_grid(start, minutes=self.block_s // 60, step_seconds=self.step_s)
+            approach = closest_approaches(primary, models, jd, fr)
+            WATCHLIST_PAIR_BLOCKS.inc((reason,), len(models))
+            close = np.flatnonzero(approach["valid"] & (approach["min_distance_km"] <= self.threshold_km))
+            if not len(close):
+                continue
+            sub = {k: v[close] for k, v in approach.items()}
+            pc = approach_pc(sub, float(jd[0] + fr[0]), satrec_epoch_jd(primary),
+                             [epochs[k] for k in close], self.hbr_km, method=self.pc_method)
+            for j, k in enumerate(close):
+                out.setdefault(neighbours[k].norad_id, {})[block] = Encounter(
+                    norad_id=neighbours[k].norad_id,
+                    name=neighbours[k].name,
+                    block=block,
+                    min_distance_km=float(sub["min_distance_km"][j]),
+                    tca=block * self.block_s + float(sub["tca_offset_s"][j]),
+                    relative_velocity_kms=float(sub["rel_speed_kms"][j]),
+                    collision_probability=float(pc[j]),
+                )
+        return out
+
+    def _overlapping(self, asset: AssetState, elements: np.ndarray) -> np.ndarray:
+        lo, hi = orbit_shells(elements)
+        p_lo, p_hi = asset.shell
+        return (lo - self.threshold_km <= p_hi) & (hi + self.threshold_km >= p_lo)
+
+    def _full_screen(self, asset: AssetState, snapshot, blocks: List[int]) -> None:
+        """New or updated asset: neighbour set from the whole catalog, then every pair over the window."""
+        rec = snapshot.get(asset.norad_id)
+        asset.encounters, asset.neighbours = {}, set()
+        if rec is None:
+            asset.status, asset.error = "missing", None
+            return
+        asset.name = rec.name
+        try:
+            asset.shell = tuple(float(x[0]) for x in orbit_shells(np.array(parse_elements(rec.line1, rec.line2))))
+            ids, elements = snapshot.element_arrays()
+            mask = self._overlapping(asset, elements) & (ids != asset.norad_id)
+            neighbours = [r for r in (snapshot.get(int(i)) for i in ids[mask]) if r is not None]
+            asset.neighbours = {r.norad_id for r in neighbours}
+            asset.encounters = self._screen(asset, rec, neighbours, blocks, "asset")
+            asset.status, asset.error = "ok", None
+        except ValueError as exc:
+            asset.status, asset.error = "error", str(exc)
+
+    def _update_pairs(self, asset: AssetState, snapshot, changed: List[TLERecord], removed: Set[int],
+                      blocks: List[int]) -> None:
+        """Only the pairs touching updated or removed objects."""
+        for norad_id in removed:
+            asset.neighbours.discard(norad_id)
+            asset.encounters.pop(norad_id, None)
+        if not changed:
+            return
+        elements = np.full((len(changed), len(ELEMENT_FIELDS)), np.nan)
+        for k, r in enumerate(changed):
+            try:
+                elements[k] = parse_elements(r.line1, r.line2)
+            except ValueError:
+                pass
+        overlap = self._overlapping(asset, elements)
+        pairs = []
+        for r, near in zip(changed, overlap):
+            asset.encounters.pop(r.norad_id, None)
+            if near and r.norad_id != asset.norad_id:
+                asset.neighbours.add(r.norad_id)
+                pairs.append(r)
+            else:
+                asset.neighbours.discard(r.norad_id)
+        try:
+            asset.encounters.update(self._screen(asset, snapshot.get(asset.norad_id), pairs, blocks, "update"))
+        except ValueError as exc:
+            asset.status, asset.error = "error", str(exc)
+
+    def _advance(self, asset: AssetState, snapshot, first: int, new_blocks: List[int]) -> None:
+        """Window moved forward: drop past blocks, screen only the new ones."""
+        for blocks in asset.encounters.values():
+            for block in [b for b in blocks if b < first]:
+                del blocks[block]
+        if not new_blocks:
+            return
+        neighbours = [r for r in (snapshot.get(i) for i in sorted(asset.neighbours)) if r is not None]
+        try:
+            for norad_id, blocks in self._screen(asset, snapshot.get(asset.norad_id), neighbours,
+                                                 new_blocks, "advance").items():
+                asset.encounters.setdefault(norad_id, {}).update(blocks)
+        except ValueError as exc:
+            asset.status, asset.error = "error", str(exc)
+
+    def process(self, now: Optional[float] = None) -> int:
+        """
+        One screening pass: pending catalog changes, new assets and window
+        advance. Returns the number of events it produced.
+        """
+        with self._work_lock:
+            now = self._clock() if now is None else now
+            snapshot = self.store.snapshot()
+            # Catalog partajat: și alți worker-i publică, deci se compară mereu cu ultima versiune procesată
+            if self.store.shared and (self._base is None or snapshot.generation != self._base.generation):
+                self._shared_diff(snapshot)
+            with self._cond:
+                assets = dict(self._assets)
+                dirty, self._dirty = self._dirty & set(assets), set()
+                changed_ids, self._changed = self._changed, set()
+                removed, self._removed = self._removed, set()
+                self._synced_generation = snapshot.generation
+            self._base = snapshot if self.store.shared else None
+
+            first = int(now // self.block_s)
+            window = list(range(first, first + self.n_blocks))
+            if self._window is None or self._window[1] <= first:
+                new_blocks, dirty = [], set(assets)                  # fereastră nouă: totul de la zero
+            else:
+                new_blocks = list(range(self._window[1], first + self.n_blocks))
+            self._window = (first, first + self.n_blocks)
+
+            # Un activ cu TLE nou sau reapărut în catalog se reevaluează complet
+            dirty |= {i for i in changed_ids | removed if i in assets}
+            changed = [r for r in (snapshot.get(i) for i in sorted(changed_ids)) if r is not None]
+            for norad_id, asset in assets.items():
+                if norad_id in dirty or asset.status == "missing":
+                    if norad_id in dirty:
+                        self._full_screen(asset, snapshot, window)
+                    continue
+                if asset.status != "ok":
+                    continue
+                self._update_pairs(asset, snapshot, changed, removed, window)
+                self._advance(asset, snapshot, first, new_blocks)
+                asset.screened_at = now
+            for norad_id in dirty & set(assets):
+                assets[norad_id].screened_at = now
+            for norad_id in removed:
+                self._models.pop(norad_id, None)
+
+            with self._cond:
+                produced = self._emit(assets, now)
+                self._publish()
+                self._cond.notify_all()
+                self._wake()
+            return produced
+
+    # -- evenimente și vedere ---------------------------------------------------
+
+    def _emit(self, assets: Dict[int, AssetState], now: float) -> int:
+        produced = 0
+        for norad_id, asset in assets.items():
+            if norad_id not in self._assets:
+                continue
+            current = {e.norad_id: e for e in asset.conjunctions()}
+            before = self._reported.get(norad_id, {})
+            after = {}
+            for other, e in current.items():
+                key = (round(e.min_distance_km, 3), round(e.tca, 0), e.collision_probability)
+                after[other] = key
+                if before.get(other) != key:
+                    produced += self._event(now, norad_id, "new" if other not in before else "updated", e.to_dict())
+            for other in before.keys() - current.keys():
+                produced += self._event(now, norad_id, "cleared", {"norad_id": other})
+            self._reported[norad_id] = after
+            self._summaries[norad_id] = {
+                "norad_id": norad_id,
+                "name": asset.name,
+                "status": asset.status,
+                "error": asset.error,
+                "neighbours": len(asset.neighbours),
+                "screened_at": asset.screened_at,
+                "conjunctions": [e.to_dict() for e in current.values()],
+            }
+        return produced
+
+    def _event(self, now: float, asset: int, kind: str, conjunction: Dict) -> int:
+        self.seq += 1
+        self._events.append({"seq": self.seq, "time": now, "asset": asset, "type": kind,
+                             "conjunction": conjunction})
+        return 1
+
+    def _publish(self) -> None:
+        # Vederea servită cititorilor: înlocuită dintr-o singură atribuire, niciodată modificată
+        window = None
+        if self._window is not None:
+            window = [dt.datetime.fromtimestamp(b * self.block_s, dt.timezone.utc).isoformat().replace("+00:00", "Z")
+                      for b in self._window]
+        self.version += 1
+        self._view = {
+            "version": self.version,
+            "seq": self.seq,
+            "catalog_generation": self._synced_generation,
+            "window": window,
+            "threshold_km": self.threshold_km,
+            # Doar rezumatele făcute de firul de screening: stările activelor pot fi în lucru
+            "assets": [
+                self._summaries.get(norad_id) or {"norad_id": norad_id, "name": "", "status": "pending",
+                                                  "error": None, "neighbours": 0, "screened_at": None,
+                                                  "conjunctions": []}
+                for norad_id in sorted(self._assets)
+            ],
+        }
+
+    def view(self) -> Dict:
+        """Current assets and their conjunctions (served from memory)."""
+        return self._view
+
+    def events(self, since: int = 0, wait_s: float = 0.0) -> Dict:
+        """Events after ``since``, waiting up to ``wait_s`` seconds for the first one."""
+        with self._cond:
+            if wait_s > 0 and self.seq <= since:
+                self._cond.wait_for(lambda: self.seq > since or self._stopping, timeout=wait_s)
+            oldest = self._events[0]["seq"] if self._events else self.seq + 1
+            return {
+                "seq": self.seq,
+                "truncated": since + 1 < oldest and since < self.seq,
+                "events": [e for e in self._events if e["seq"] > since],
+            }
+
+    async def wait_events(self, since: int = 0, wait_s: float = 0.0) -> Dict:
+        """``events`` for the event loop: the long-poll waits on an ``asyncio.Event``, not a thread."""
+        if wait_s > 0:
+            waiter = (asyncio.get_running_loop(), asyncio.Event())
+            with self._cond:
+                if self.seq > since or self._stopping:
+                    waiter[1].set()
+                self._waiters.add(waiter)
+            try:
+                await asyncio.wait_for(waiter[1].wait(), timeout=wait_s)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._cond:
+                    self._waiters.discard(waiter)
+        return self.events(since=since)
+
+    def _wake(self) -> None:
+        # Apelat cu self._cond ținut, din firul de screening
+        for loop, event in self._waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass                                        # bucla s-a închis între timp
+
+    # -- firul de lucru -----------------------------------------------------------
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None or not self._assets:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="watchlist", daemon=True)
+            self._thread.start()
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            self._wake()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def _pending(self) -> bool:
+        if self._dirty or ((self._changed or self._removed) and self._assets):
+            return True
+        if self.store.shared and self._assets and (self._base is None
+                                                   or self.store.generation != self._base.generation):
+            return True
+        return self._window is not None and self._clock() >= (self._window[0] + 1) * self.block_s
+
+    def _run(self) -> None:
+        while True:
+            self.sync_assets()
+            with self._cond:
+                # Trezire la modificări sau la începutul blocului următor
+                while not self._stopping and not self._pending():
+                    self._cond.wait(timeout=1.0 if self.store.shared else 30.0)
+                if self._stopping:
+                    return
+            try:
+                self.process()
+            except Exception:
+                logger.exception("Watchlist screening pass failed")
+                time.sleep(5.0)
+
+
+__all__ = ["AssetState", "Encounter", "Watchlist", "orbit_shells"]